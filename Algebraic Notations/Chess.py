@@ -1,15 +1,22 @@
 """
-This script was supposed to show the moves in algebraic notation in order of the move,
-but due to some bug in the script it isn't working as expected, and I am too lazy to look for it.
-So if anybody is interested they can do it.
+A two-player chess game that shows the moves in algebraic notation, in the
+order they were played, in a scrollable list below the board.
 """
 
+import os
+import sys
+
 import pygame
 import chess
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.frames import PROFILE, FrameScheduler  # noqa: E402
+from chesscore.game import GameBoard, is_pawn_promotion, result_message  # noqa: E402
+from chesscore.history import MoveHistory  # noqa: E402
+from chesscore.render import BoardRenderer  # noqa: E402
 
 pygame.init()
-board = chess.Board()
+board = GameBoard()
 
 # Constants for window dimensions and colors
 WIDTH, HEIGHT = 600, 750
@@ -31,13 +38,10 @@ ALTERNATE_MOVE_COLORS = [(230, 230, 255), (210, 230, 255)]
 WHITE_MOVE_COLOR = (25, 53, 73)
 BLACK_MOVE_COLOR = (38, 44, 58)
 
-# Load chess piece images
-pieces = {f'{color}_{piece}': pygame.image.load(
-    f'pieces/{color}_{piece}.png') for color in ['w', 'b'] for piece in ['p', 'r', 'n', 'b', 'q', 'k']}
-
 # Create screen
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Chess Game")
+renderer = BoardRenderer(screen, (MARGIN, TITLE_HEIGHT), SQ_SIZE, LIGHT_BLUE, DARK_BLUE, BACKGROUND_COLOR)
 
 # Fonts for the title and moves
 title_font = pygame.font.Font(None, 48)
@@ -45,88 +49,26 @@ moves_font = pygame.font.Font(None, 28)
 moves_number_font = pygame.font.Font(None, 24)
 endgame_font = pygame.font.Font(None, 64)
 
-move_list = []
-scroll_offset = 0
+# The moves played so far, one row per ply (see chesscore/history.py)
+move_history = MoveHistory(pygame.Rect(MARGIN, HEIGHT - MOVE_HEIGHT + 30, BOARD_SIZE, MOVE_HEIGHT - 30), 30,
+                           moves_number_font, moves_font, ALTERNATE_MOVE_COLORS,
+                           (WHITE_MOVE_COLOR, BLACK_MOVE_COLOR))
 
 
 def draw_board(selected_square=None):
-    """Draw the chessboard with a possible highlighted square."""
-    for row in range(8):
-        for col in range(8):
-            color = LIGHT_BLUE if (row + col) % 2 == 0 else DARK_BLUE
-            square_rect = pygame.Rect(
-                MARGIN + col * SQ_SIZE, TITLE_HEIGHT + row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-            pygame.draw.rect(screen, color, square_rect)
-
-            # Highlight the selected square
-            if selected_square == chess.square(col, 7 - row):
-                pygame.draw.rect(screen, HIGHLIGHT_COLOR, square_rect, 4)
-
-
-def draw_pieces():
-    """Draw the pieces on the board based on the current board state."""
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            piece_color = 'w' if piece.color else 'b'
-            piece_type = piece.symbol().lower()
-            piece_image = pieces[f'{piece_color}_{piece_type}']
-            x = MARGIN + \
-                chess.square_file(square) * SQ_SIZE + \
-                (SQ_SIZE - piece_image.get_width()) // 2
-            y = TITLE_HEIGHT + (7 - chess.square_rank(square)) * \
-                SQ_SIZE + (SQ_SIZE - piece_image.get_height()) // 2
-            screen.blit(piece_image, pygame.Rect(x, y, SQ_SIZE, SQ_SIZE))
+    """Draw the chessboard and its pieces with a possible highlighted square."""
+    outlines = {selected_square: HIGHLIGHT_COLOR} if selected_square is not None else None
+    renderer.set_board(board, outlines=outlines)
 
 
 def draw_title():
     """Draw the game title at the top of the screen."""
-    title_surface = title_font.render("Chess Game", True, (255, 255, 255))
-    title_rect = title_surface.get_rect(center=(WIDTH // 2, TITLE_HEIGHT // 2))
-    screen.blit(title_surface, title_rect)
+    renderer.text(title_font, "Chess Game", (255, 255, 255), center=(WIDTH // 2, TITLE_HEIGHT // 2))
 
 
 def draw_move_list():
     """Draw the list of moves at the bottom of the screen."""
-    visible_moves = (MOVE_HEIGHT - 30) // 30
-
-    for i in range(len(move_list)):
-        if i >= scroll_offset and i < scroll_offset + visible_moves:
-            move_text = move_list[i]
-            bg_color = ALTERNATE_MOVE_COLORS[i % 2]
-            y_offset = HEIGHT - MOVE_HEIGHT + 30 + (i - scroll_offset) * 30
-
-            pygame.draw.rect(screen, bg_color, pygame.Rect(
-                MARGIN, y_offset, BOARD_SIZE, 30))
-
-            if i % 2 == 0:  # White move
-                move_number_surface = moves_number_font.render(
-                    f"{(i // 2) + 1}.", True, WHITE_MOVE_COLOR)
-                move_surface = moves_font.render(
-                    move_text, True, WHITE_MOVE_COLOR)
-            else:  # Black move
-                move_number_surface = moves_number_font.render(
-                    "", True, BLACK_MOVE_COLOR)
-                move_surface = moves_font.render(
-                    move_text, True, BLACK_MOVE_COLOR)
-
-            screen.blit(move_number_surface, (MARGIN + 10, y_offset + 5))
-            screen.blit(move_surface, (MARGIN + 50, y_offset + 5))
-
-
-def get_square_under_mouse():
-    """Get the square on the board based on mouse position."""
-    mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
-    x, y = [int((v - MARGIN) // SQ_SIZE) for v in mouse_pos]
-    if 0 <= x < 8 and TITLE_HEIGHT <= y * SQ_SIZE + TITLE_HEIGHT < TITLE_HEIGHT + BOARD_SIZE:
-        # Translate GUI to chess coords
-        return chess.square(x, 7 - int((mouse_pos[1] - TITLE_HEIGHT) // SQ_SIZE))
-    return None
-
-
-def is_pawn_promotion(move):
-    """Check if the move is a pawn promotion."""
-    return board.piece_at(move.from_square).piece_type == chess.PAWN and (chess.square_rank(move.to_square) == 0 or chess.square_rank(move.to_square) == 7)
+    move_history.draw(renderer)
 
 
 def pawn_promotion():
@@ -137,29 +79,12 @@ def pawn_promotion():
 
 def check_game_over():
     """Check if the game is over and return the result message."""
-    if board.is_checkmate():
-        if board.turn:
-            return "Checkmate! Black Wins!"
-        else:
-            return "Checkmate! White Win!"
-    elif board.is_stalemate():
-        return "Stalemate! It's a Draw!"
-    elif board.is_insufficient_material():
-        return "Draw due to Insufficient Material!"
-    elif board.is_seventyfive_moves():
-        return "Draw by 75-move Rule!"
-    elif board.is_fivefold_repetition():
-        return "Draw by Repetition!"
-    elif board.is_variant_draw():
-        return "Draw by Variant!"
-    return None
+    return result_message(board)
 
 
 def draw_endgame_message(message):
     """Draw the endgame message when the game ends."""
-    message_surface = endgame_font.render(message, True, (255, 255, 255))
-    message_rect = message_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-    screen.blit(message_surface, message_rect)
+    renderer.text(endgame_font, message, (255, 255, 255), center=(WIDTH // 2, HEIGHT // 2))
 
 
 selected_square = None
@@ -167,54 +92,53 @@ running = True
 game_over_message = None
 
 # Main loop
+scheduler = FrameScheduler()
 while running:
-    screen.fill(BACKGROUND_COLOR)
     draw_title()
     draw_board(selected_square)
-    draw_pieces()
     draw_move_list()
 
     if game_over_message:
         draw_endgame_message(game_over_message)
+    pygame.display.update(renderer.flush())
 
-    for event in pygame.event.get():
+    for event in scheduler.wait():
         if event.type == pygame.QUIT:
             running = False
 
         if not game_over_message:
             if event.type == pygame.MOUSEBUTTONDOWN:
-                square = get_square_under_mouse()
+                square = renderer.square_at(event.pos)
 
                 if square is not None:
                     if selected_square is None:
                         # First click: select piece
-                        # Only select if there's a piece on the square
-                        if board.piece_at(square):
+                        # Only select a piece that has a legal move
+                        if board.legal_moves_from(square):
                             selected_square = square
                     else:
                         # Second click: make move
                         move = chess.Move(selected_square, square)
-                        if is_pawn_promotion(move):
+                        if is_pawn_promotion(board, move):
                             promotion = pawn_promotion()
                             move = chess.Move(
                                 selected_square, square, promotion=promotion)
 
-                        if move in board.legal_moves:
+                        move = board.legal_move(move.from_square, move.to_square, move.promotion)
+                        if move is not None:
                             san_move = board.san(move)
                             board.push(move)
-                            move_list.insert(0, san_move)
+                            move_history.append(san_move)
 
                         selected_square = None
                         game_over_message = check_game_over()
 
         if event.type == pygame.MOUSEBUTTONUP:
             if event.button == 4:  # Scroll up
-                if scroll_offset > 0:
-                    scroll_offset -= 1
+                move_history.scroll(-1)
             elif event.button == 5:  # Scroll down
-                if scroll_offset < len(move_list) - ((MOVE_HEIGHT - 30) // 30):
-                    scroll_offset += 1
-
-    pygame.display.flip()
+                move_history.scroll(1)
 
+if PROFILE:
+    print(scheduler.report())
 pygame.quit()
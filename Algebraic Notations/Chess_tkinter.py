@@ -1,17 +1,25 @@
+import os
+import sys
 import tkinter as tk
+
 import chess
-from PIL import Image, ImageTk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.game import GameBoard  # noqa: E402
+from chesscore.sprites import piece_name, piece_photos  # noqa: E402
+
 
 class ChessApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Chess App")
 
-        self.board = chess.Board()
+        self.board = GameBoard()
         self.canvas = tk.Canvas(root, width=400, height=400)
         self.canvas.pack()
 
-        self.image_cache = {}  # Store images to prevent garbage collection
+        self.image_cache = piece_photos()  # Keep references to prevent garbage collection
+        self.piece_items = {}  # Canvas image item of each occupied square
         self.selected_square = None
 
         self.draw_board()
@@ -32,32 +40,50 @@ class ChessApp:
                 )
 
     def draw_pieces(self):
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                piece_name = piece.symbol().lower()
-                file_path = f"pieces/{'w' if piece.color == chess.WHITE else 'b'}_{piece_name}.png"
-
-                if file_path not in self.image_cache:
-                    image = self.load_image(file_path)
-                    self.image_cache[file_path] = image
-                else:
-                    image = self.image_cache[file_path]
-
-                col, row = chess.square_file(square), 7 - chess.square_rank(square)
-                piece_tag = f"piece_{square}"
-                self.canvas.create_image(
-                    col * 50 + 25,
-                    row * 50 + 25,
-                    image=image,
-                    tags=("pieces", piece_tag),
-                    anchor=tk.CENTER  # Center the image at the specified position
-                )
+        # One image item per occupied square; moves then update just the items they touch
+        self.canvas.delete("pieces")
+        self.piece_items = {}
+        for square, piece in self.board.piece_map().items():
+            self.piece_items[square] = self.canvas.create_image(
+                *self.square_center(square),
+                image=self.piece_image(piece),
+                tags=("pieces",),
+                anchor=tk.CENTER  # Center the image at the specified position
+            )
+
+    def square_center(self, square):
+        col, row = chess.square_file(square), 7 - chess.square_rank(square)
+        return col * 50 + 25, row * 50 + 25
 
-    def load_image(self, file_path):
-        image = Image.open(file_path)
-        image = ImageTk.PhotoImage(image)
-        return image
+    def piece_image(self, piece):
+        return self.image_cache[piece_name(piece)]
+
+    def move_piece_items(self, move):
+        # Called before `move` is pushed. The captured piece's item (behind the
+        # pawn for en passant) is deleted, the moving piece's item and, when
+        # castling, the rook's are moved, and a promoted pawn gets a new image.
+        if self.board.is_en_passant(move):
+            captured = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+        else:
+            captured = move.to_square
+        if captured in self.piece_items:
+            self.canvas.delete(self.piece_items.pop(captured))
+
+        moves = [(move.from_square, move.to_square)]
+        if self.board.is_castling(move):
+            rank = chess.square_rank(move.from_square)
+            if chess.square_file(move.to_square) > chess.square_file(move.from_square):
+                moves.append((chess.square(7, rank), chess.square(5, rank)))
+            else:
+                moves.append((chess.square(0, rank), chess.square(3, rank)))
+        items = [self.piece_items.pop(from_square) for from_square, _ in moves]
+        for item, (_, to_square) in zip(items, moves):
+            self.canvas.coords(item, *self.square_center(to_square))
+            self.piece_items[to_square] = item
+
+        if move.promotion:
+            piece = chess.Piece(move.promotion, self.board.turn)
+            self.canvas.itemconfig(self.piece_items[move.to_square], image=self.piece_image(piece))
 
     def on_click(self, event):
         col = event.x // 50
@@ -65,20 +91,19 @@ class ChessApp:
         square = chess.square(col, row)
 
         if self.selected_square is None:
-            self.selected_square = square
-            self.highlight_legal_moves()
+            if self.board.legal_moves_from(square):
+                self.selected_square = square
+                self.highlight_legal_moves()
         else:
-            moves = [move.to_square for move in self.board.legal_moves if move.from_square == self.selected_square]
-            if square in moves:
-                move = chess.Move(self.selected_square, square)
-                if move in self.board.legal_moves:
-                    print(f"Making move: {move}")
-                    self.remove_piece_from_square(self.selected_square)
-                    self.board.push(move)
-                    self.draw_pieces()
-                    self.display_algebraic_notation(move)
-                else:
-                    print(f"Invalid move: {move}")
+            move = self.board.legal_move(self.selected_square, square)
+            if move is None:
+                # Pawns always promote to a queen
+                move = self.board.legal_move(self.selected_square, square, chess.QUEEN)
+            if move is not None:
+                print(f"Making move: {move}")
+                self.display_algebraic_notation(move)
+                self.move_piece_items(move)
+                self.board.push(move)
             else:
                 print(f"Square {square} is not a legal move from {self.selected_square}")
 
@@ -91,19 +116,15 @@ class ChessApp:
                 self.board.reset()
                 self.draw_pieces()
 
-    def remove_piece_from_square(self, square):
-        # Remove the piece image from the canvas by deleting its tag
-        piece_tag = f"piece_{square}"
-        self.canvas.delete(piece_tag)
-
     def highlight_legal_moves(self):
-        moves = [move.to_square for move in self.board.legal_moves if move.from_square == self.selected_square]
-        for square in moves:
+        targets = {move.to_square for move in self.board.legal_moves_from(self.selected_square)}
+        for square in targets:
             col, row = chess.square_file(square), 7 - chess.square_rank(square)
             self.canvas.create_rectangle(
                 col * 50, row * 50, (col + 1) * 50, (row + 1) * 50,
                 fill="light green", outline="black", tags=("highlight",)
             )
+        self.canvas.tag_raise("pieces")  # Keep the pieces on the highlighted squares visible
 
     def display_algebraic_notation(self, move):
         notation = self.board.san(move)
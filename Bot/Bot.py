@@ -1,10 +1,19 @@
+import os
+import sys
 import pygame
 import chess
-import random
+from book import DEFAULT_PATH as BOOK_PATH
+from tablebase import DIRECTORY as TABLEBASE_DIR
+from worker import BotWorker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.frames import PROFILE, FrameScheduler, post_wakeup  # noqa: E402
+from chesscore.game import GameBoard, is_pawn_promotion, result_message  # noqa: E402
+from chesscore.render import BoardRenderer  # noqa: E402
 
 # Initialize pygame and chess board
 pygame.init()
-board = chess.Board()
+board = GameBoard()
 
 # Constants for window dimensions and colors
 WIDTH, HEIGHT = 600, 750
@@ -19,12 +28,10 @@ DARK_HIGHLIGHT = (185, 202, 67)
 BOT_HIGHLIGHT_COLOR = (255, 0, 0)
 BACKGROUND_COLOR = (48, 46, 43)
 
-# Load chess piece images
-pieces = {f'{color}_{piece}': pygame.image.load(f'pieces/{color}_{piece}.png') for color in ['w', 'b'] for piece in ['p', 'r', 'n', 'b', 'q', 'k']}
-
 # Create screen
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Chess Bot")
+renderer = BoardRenderer(screen, (MARGIN, TITLE_HEIGHT), SQ_SIZE, LIGHT, DARK, BACKGROUND_COLOR)
 
 # Fonts for the title and endgame message
 title_font = pygame.font.Font(None, 48)
@@ -43,57 +50,52 @@ confirmation_active = False
 confirm_restart_rect = None
 cancel_restart_rect = None
 
+# The bot thinks on a background thread (see worker.py and levels.py);
+# transposition table size for the 'hard' search, 16-512 MB is a sensible range,
+# and the number of processes searching in parallel (see parallel.py)
+HASH_MB = 64
+HARD_WORKERS = 1
+# Keep searching while the human thinks, on the reply the bot expects
+PONDER = True
+# The opening book (book.py) and endgame tables (tablebase.py) are used if present
+bot_worker = BotWorker(hash_mb=HASH_MB, workers=HARD_WORKERS, book_path=BOOK_PATH,
+                       tablebase_dir=TABLEBASE_DIR, on_result=post_wakeup, ponder=PONDER)
+bot_thinking = False
+thinking_font = pygame.font.Font(None, 32)
+THINKING_DOT_MS = 400
+# F3 shows the text cache statistics
+debug_font = pygame.font.Font(None, 22)
+show_debug = False
+
 
 def draw_board(selected_square=None, bot_move_square=None):
-    for row in range(8):
-        for col in range(8):
-            color = LIGHT if (row + col) % 2 == 0 else DARK
-            if selected_square == chess.square(col, 7 - row):
-                color = LIGHT_HIGHLIGHT if (
-                    row + col) % 2 == 0 else DARK_HIGHLIGHT
-            if bot_move_square == chess.square(col, 7 - row):
-                color = BOT_HIGHLIGHT_COLOR
-            square_rect = pygame.Rect(
-                MARGIN + col * SQ_SIZE, TITLE_HEIGHT + row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
-            pygame.draw.rect(screen, color, square_rect)
-
-
-def draw_pieces():
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            piece_image = pieces[f'{"w" if piece.color else "b"}_{
-                piece.symbol().lower()}']
-            x = MARGIN + \
-                chess.square_file(square) * SQ_SIZE + \
-                (SQ_SIZE - piece_image.get_width()) // 2
-            y = TITLE_HEIGHT + (7 - chess.square_rank(square)) * \
-                SQ_SIZE + (SQ_SIZE - piece_image.get_height()) // 2
-            screen.blit(piece_image, pygame.Rect(x, y, SQ_SIZE, SQ_SIZE))
+    fills = {}
+    if selected_square is not None:
+        light = (chess.square_file(selected_square) + chess.square_rank(selected_square)) % 2
+        fills[selected_square] = LIGHT_HIGHLIGHT if light else DARK_HIGHLIGHT
+    if bot_move_square is not None:
+        fills[bot_move_square] = BOT_HIGHLIGHT_COLOR
+    renderer.set_board(board, fills)
 
 
 def draw_title():
-    title_surface = title_font.render("Chess Bot", True, (255, 255, 255))
-    title_rect = title_surface.get_rect(center=(WIDTH // 2, TITLE_HEIGHT // 2))
-    screen.blit(title_surface, title_rect)
+    renderer.text(title_font, "Chess Bot", (255, 255, 255), center=(WIDTH // 2, TITLE_HEIGHT // 2))
 
 
-def draw_endgame_message(message):
-    message_surface = endgame_font.render(message, True, (255, 255, 255))
-    message_rect = message_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-    screen.blit(message_surface, message_rect)
+def draw_thinking_indicator():
+    dots = "." * (pygame.time.get_ticks() // THINKING_DOT_MS % 4)
+    renderer.text(thinking_font, f"Bot is thinking{dots}", (200, 200, 200),
+                  midleft=(MARGIN, TITLE_HEIGHT + BOARD_SIZE + 20))
 
 
-def get_square_under_mouse():
-    mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
-    x, y = [int((v - MARGIN) // SQ_SIZE) for v in mouse_pos]
-    if 0 <= x < 8 and TITLE_HEIGHT <= y * SQ_SIZE + TITLE_HEIGHT < TITLE_HEIGHT + BOARD_SIZE:
-        return chess.square(x, 7 - int((mouse_pos[1] - TITLE_HEIGHT) // SQ_SIZE))
-    return None
+def draw_debug_overlay():
+    cache = renderer.text_cache
+    renderer.text(debug_font, f"text cache {len(cache)}/{cache.maxsize}, hit rate {cache.hit_rate:.0%}",
+                  (200, 200, 200), topleft=(5, 5))
 
 
-def is_pawn_promotion(move):
-    return board.piece_at(move.from_square).piece_type == chess.PAWN and (chess.square_rank(move.to_square) == 0 or chess.square_rank(move.to_square) == 7)
+def draw_endgame_message(message):
+    renderer.text(endgame_font, message, (255, 255, 255), center=(WIDTH // 2, HEIGHT // 2))
 
 
 def pawn_promotion():
@@ -101,68 +103,36 @@ def pawn_promotion():
 
 
 def check_game_over():
-    if board.is_checkmate():
-        if game_mode == "pvp":
-            return "Checkmate! Black Wins!" if board.turn else "Checkmate! White Wins!"
-        else:
-            return "Checkmate! Bot Wins!" if board.turn else "Checkmate! You Win!"
-    elif board.is_stalemate():
-        return "Stalemate! It's a Draw!"
-    elif board.is_insufficient_material():
-        return "Draw due to Insufficient Material!"
-    elif board.is_seventyfive_moves():
-        return "Draw by 75-move Rule!"
-    elif board.is_fivefold_repetition():
-        return "Draw by Repetition!"
-    elif board.is_variant_draw():
-        return "Draw by Variant!"
-    return None
+    return result_message(board, game_mode)
 
 
 def draw_mode_selection():
-    screen.fill(BACKGROUND_COLOR)
-    title_surface = title_font.render(
-        "Choose Game Mode", True, (255, 255, 255))
-    title_rect = title_surface.get_rect(center=(WIDTH // 2, HEIGHT // 4))
-    screen.blit(title_surface, title_rect)
-    pvp_surface = endgame_font.render(
-        "Player vs Player", True, (255, 255, 255))
-    pvp_rect = pvp_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-    screen.blit(pvp_surface, pvp_rect)
-    pvb_surface = endgame_font.render("Player vs Bot", True, (255, 255, 255))
-    pvb_rect = pvb_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 100))
-    screen.blit(pvb_surface, pvb_rect)
+    renderer.text(title_font, "Choose Game Mode", (255, 255, 255), center=(WIDTH // 2, HEIGHT // 4))
+    pvp_rect = renderer.text(endgame_font, "Player vs Player", (255, 255, 255),
+                             center=(WIDTH // 2, HEIGHT // 2))
+    pvb_rect = renderer.text(endgame_font, "Player vs Bot", (255, 255, 255),
+                             center=(WIDTH // 2, HEIGHT // 2 + 100))
     return pvp_rect, pvb_rect
 
 
 def draw_difficulty_selection():
-    screen.fill(BACKGROUND_COLOR)
-    title_surface = title_font.render(
-        "Select Bot Difficulty", True, (255, 255, 255))
-    title_rect = title_surface.get_rect(center=(WIDTH // 2, HEIGHT // 4))
-    screen.blit(title_surface, title_rect)
-    easy_surface = endgame_font.render("Easy", True, (255, 255, 255))
-    easy_rect = easy_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 50))
-    screen.blit(easy_surface, easy_rect)
-    medium_surface = endgame_font.render("Medium", True, (255, 255, 255))
-    medium_rect = medium_surface.get_rect(
-        center=(WIDTH // 2, HEIGHT // 2 + 50))
-    screen.blit(medium_surface, medium_rect)
-    hard_surface = endgame_font.render("Hard", True, (255, 255, 255))
-    hard_rect = hard_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 150))
-    screen.blit(hard_surface, hard_rect)
+    renderer.text(title_font, "Select Bot Difficulty", (255, 255, 255), center=(WIDTH // 2, HEIGHT // 4))
+    easy_rect = renderer.text(endgame_font, "Easy", (255, 255, 255), center=(WIDTH // 2, HEIGHT // 2 - 50))
+    medium_rect = renderer.text(endgame_font, "Medium", (255, 255, 255),
+                                center=(WIDTH // 2, HEIGHT // 2 + 50))
+    hard_rect = renderer.text(endgame_font, "Hard", (255, 255, 255), center=(WIDTH // 2, HEIGHT // 2 + 150))
     return easy_rect, medium_rect, hard_rect
 
 
 def draw_restart_button():
-    restart_surface = endgame_font.render("Restart", True, (255, 255, 255))
-    restart_rect = restart_surface.get_rect(center=(WIDTH // 2, HEIGHT - 50))
-    screen.blit(restart_surface, restart_rect)
-    return restart_rect
+    return renderer.text(endgame_font, "Restart", (255, 255, 255), center=(WIDTH // 2, HEIGHT - 50))
 
 
 def reset_game():
-    global board, game_mode, bot_difficulty, show_difficulty_selection, game_over_message, selected_square, confirmation_active
+    global board, game_mode, bot_difficulty, show_difficulty_selection, game_over_message, selected_square, confirmation_active, bot_thinking, bot_last_move
+    bot_worker.new_game()
+    bot_thinking = False
+    bot_last_move = None
     board.reset()
     game_mode = None
     bot_difficulty = None
@@ -176,73 +146,76 @@ def draw_confirmation_box():
     box_width, box_height = 400, 150
     confirmation_box_rect = pygame.Rect(
         WIDTH // 2 - box_width // 2, HEIGHT // 2 - box_height // 2, box_width, box_height)
-    pygame.draw.rect(screen, (50, 50, 50), confirmation_box_rect)
-    pygame.draw.rect(screen, (255, 255, 255), confirmation_box_rect, 3)
-    confirm_text = endgame_font.render("Restart game?", True, (255, 255, 255))
-    screen.blit(confirm_text, (confirmation_box_rect.x +
-                60, confirmation_box_rect.y + 20))
-    yes_surface = endgame_font.render("Yes", True, (255, 255, 255))
-    no_surface = endgame_font.render("No", True, (255, 255, 255))
-    confirm_restart_rect = yes_surface.get_rect(
-        center=(confirmation_box_rect.x + 100, confirmation_box_rect.y + 100))
-    cancel_restart_rect = no_surface.get_rect(
-        center=(confirmation_box_rect.x + 300, confirmation_box_rect.y + 100))
-    screen.blit(yes_surface, confirm_restart_rect)
-    screen.blit(no_surface, cancel_restart_rect)
+
+    def draw_box(screen):
+        pygame.draw.rect(screen, (50, 50, 50), confirmation_box_rect)
+        pygame.draw.rect(screen, (255, 255, 255), confirmation_box_rect, 3)
+
+    renderer.overlay('confirmation box', confirmation_box_rect, draw_box)
+    renderer.text(endgame_font, "Restart game?", (255, 255, 255),
+                  topleft=(confirmation_box_rect.x + 60, confirmation_box_rect.y + 20))
+    confirm_restart_rect = renderer.text(endgame_font, "Yes", (255, 255, 255),
+                                         center=(confirmation_box_rect.x + 100, confirmation_box_rect.y + 100))
+    cancel_restart_rect = renderer.text(endgame_font, "No", (255, 255, 255),
+                                        center=(confirmation_box_rect.x + 300, confirmation_box_rect.y + 100))
     return confirm_restart_rect, cancel_restart_rect
 
 
-''' 
-Main bot logic
-
-The bot has two difficulty levels: 'easy' and 'medium' [for now].
-- In 'easy' mode, the bot makes a random legal move.
-- In 'medium' mode, the bot prioritizes capturing moves. 
-  - If there are capturing moves available, it selects the capture with the highest piece value.
-  - If no capturing moves are available, it makes a random legal move.
-
-'''
-def bot_move(mode):
-    moves = list(board.legal_moves)
-    
-    if mode == 'easy':
-        return random.choice(moves) if moves else None
-    elif mode == 'medium':
-        captures = [move for move in moves if board.is_capture(move)]
-        if captures:
-            piece_values = {chess.PAWN: 1, chess.KNIGHT: 3,
-                            chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 0}
-            captures_by_value = {}
-            for capture in captures:
-                value = piece_values[board.piece_at(
-                    capture.to_square).piece_type]
-                captures_by_value.setdefault(value, []).append(capture)
-            best_captures = captures_by_value[max(captures_by_value.keys())]
-            return random.choice(best_captures)
-        return random.choice(moves)
-    return None
+def print_search_stats(stats):
+    tt_stats = stats['tt']
+    print(f"depth {stats['depth']} score {stats['score']} nodes {stats['nodes']} "
+          f"time {stats['elapsed']:.2f}s nps {stats['nps']} "
+          f"tt hits {tt_stats['hits']} misses {tt_stats['misses']} "
+          f"overwrites {tt_stats['overwrites']} hashfull {tt_stats['hashfull']} "
+          f"tb hits {stats['tb_hits']}")
+    if stats.get('ponder') == 'hit':
+        print(f"ponder hit, saved {stats['saved']:.2f}s; {bot_worker.ponder_report()}")
+    elif stats.get('ponder') == 'miss':
+        print(f"ponder miss; {bot_worker.ponder_report()}")
 
 
+scheduler = FrameScheduler()
 while running:
-    screen.fill(BACKGROUND_COLOR)
-
     if game_mode is None:
         pvp_rect, pvb_rect = draw_mode_selection()
     elif show_difficulty_selection:
         easy_rect, medium_rect, hard_rect = draw_difficulty_selection()
     else:
         draw_title()
-        draw_board(selected_square, bot_last_move)
-        draw_pieces()
+        draw_board(selected_square, bot_last_move.to_square if bot_last_move else None)
         if game_over_message:
             draw_endgame_message(game_over_message)
+        if bot_thinking:
+            draw_thinking_indicator()
         restart_rect = draw_restart_button()
         if confirmation_active:
             confirm_restart_rect, cancel_restart_rect = draw_confirmation_box()
-
-    for event in pygame.event.get():
+    if show_debug:
+        draw_debug_overlay()
+    pygame.display.update(renderer.flush())
+
+    # Only the thinking dots change by themselves; a finished bot move posts a wakeup
+    timeout = None
+    if bot_thinking:
+        timeout = (THINKING_DOT_MS - pygame.time.get_ticks() % THINKING_DOT_MS) / 1000
+    events = scheduler.wait(timeout)
+
+    if bot_thinking:
+        result = bot_worker.poll()
+        if result is not None:
+            bot_thinking = False
+            bot_last_move, stats = result
+            if stats:
+                print_search_stats(stats)
+            if bot_last_move:
+                board.push(bot_last_move)
+            game_over_message = check_game_over()
+
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            show_debug = not show_debug
         if event.type == pygame.MOUSEBUTTONDOWN:
             mouse_pos = pygame.mouse.get_pos()
             if game_mode is None:
@@ -269,30 +242,31 @@ while running:
                         reset_game()
                     elif cancel_restart_rect and cancel_restart_rect.collidepoint(mouse_pos):
                         confirmation_active = False
-                square = get_square_under_mouse()
-                if square is not None:
+                square = renderer.square_at(event.pos)
+                if square is not None and not bot_thinking:
                     if selected_square is None:
-                        if board.piece_at(square):
+                        if board.legal_moves_from(square):
                             selected_square = square
                     else:
                         move = chess.Move(selected_square, square)
-                        if is_pawn_promotion(move):
+                        if is_pawn_promotion(board, move):
                             move = chess.Move(
                                 selected_square, square, promotion=pawn_promotion())
-                        if move in board.legal_moves:
+                        move = board.legal_move(move.from_square, move.to_square, move.promotion)
+                        if move is not None:
                             board.push(move)
-                            pygame.display.flip()
                             selected_square = None
                             game_over_message = check_game_over()
                             if not game_over_message and game_mode == 'pvb':
-                                bot_last_move = bot_move(bot_difficulty)
-                                if bot_last_move:
-                                    board.push(bot_last_move)
-                                game_over_message = check_game_over()
+                                bot_worker.request(board, bot_difficulty)
+                                bot_thinking = True
                         else:
                             selected_square = None
 
-    pygame.display.flip()
-
 
+if PROFILE:
+    print(scheduler.report())
+if PONDER:
+    print(bot_worker.ponder_report())
+bot_worker.close()
 pygame.quit()
@@ -0,0 +1,299 @@
+"""
+Batch analysis of PGN archives with the bot's search.
+
+    python Bot/analyze.py games.pgn --out analysis.jsonl --depth 4
+    python Bot/analyze.py games.pgn --out annotated.pgn --nodes 20000 --workers 8
+    python Bot/analyze.py games.pgn --out analysis.jsonl --resume
+
+The PGN file is streamed: `read_pgn` yields one game's text at a time, so
+files of any size are read in constant memory. Each game is one task for a
+process pool (see parallel.py) whose workers search every position of the
+game at a fixed depth or node count (fixed limits make the results
+reproducible and independent of machine load). At most `--queue` games
+are in flight; the reader waits for the oldest one to finish before it
+reads another, which bounds memory and keeps the results in input order.
+
+The output is JSON lines, one object per game with its headers and for every
+move the evaluation after it (centipawns or moves to mate, from White's
+side), the engine's best move in the position before it, the loss against
+that best move and a blunder flag (a loss of `--blunder` centipawns or
+more), or PGN with the same as `[%eval ...]` comments and ?/?? marks.
+
+Every `--checkpoint` games, and when the run ends or is interrupted with
+Ctrl-C, the byte offset reached in the input and the size of the output are
+written next to the output. `--resume` continues from there, after cutting
+off anything written after the checkpoint. Progress with positions per
+second goes to stderr.
+
+Variants other than standard chess and games that fail to parse are
+skipped and counted.
+"""
+
+import argparse
+import collections
+import io
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+import chess
+import chess.pgn
+
+from engine import Engine, MATE_BOUND, MATE_SCORE, MAX_DEPTH, mate_in
+from parallel import process_pool, worker_state
+from tablebase import DIRECTORY as TABLEBASE_DIR, Tablebases
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.game import GameBoard  # noqa: E402
+
+# Losses are measured with scores clamped to this, so a missed mate counts
+# like losing a large material advantage rather than 100000 centipawns
+LOSS_CAP = 1000
+MISTAKE = 100
+
+
+def read_pgn(path, offset=0):
+    """Yield (pgn text, offset after it) for every game of a PGN file, from byte `offset` on."""
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        lines = []
+        in_moves = False
+        for line in file:
+            # A tag line after movetext starts the next game
+            if in_moves and line.startswith(b'['):
+                yield b''.join(lines).decode('utf-8', 'replace'), offset
+                lines = []
+                in_moves = False
+            lines.append(line)
+            offset += len(line)
+            if line.strip() and not line.startswith(b'['):
+                in_moves = True
+        if any(line.strip() for line in lines):
+            yield b''.join(lines).decode('utf-8', 'replace'), offset
+
+
+def parse_game(text):
+    """The game in `text` or None if it is unusable (parse errors, a variant, no moves)."""
+    game = chess.pgn.read_game(io.StringIO(text))
+    if game is None or game.errors or game.headers.get('Variant', 'Standard').lower() not in ('standard', 'chess'):
+        return None
+    if game.next() is None:
+        return None
+    return game
+
+
+def _init_worker(hash_mb, tablebase_dir):
+    # Ctrl-C is handled by the main process, which checkpoints before it exits
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    tablebases = Tablebases(tablebase_dir) if tablebase_dir else None
+    worker_state['engine'] = Engine(hash_mb=hash_mb, tablebases=tablebases)
+
+
+def _analyze(fen, moves, depth, nodes):
+    """[(score, best move)] for the position before every move and the final one.
+
+    Scores are from the side to move's point of view; a checkmate or
+    stalemate at the end has the score of its result and no best move.
+    """
+    engine = worker_state['engine']
+    engine.tt.clear()
+    engine.orderer.clear()
+    board = GameBoard(fen)
+    results = []
+    for uci in moves + [None]:
+        if not any(board.generate_legal_moves()):
+            results.append((-MATE_SCORE if board.is_check() else 0, None))
+        else:
+            move = engine.search(board, depth=depth, nodes=nodes)
+            results.append((engine.score, move.uci()))
+        if uci is not None:
+            board.push_uci(uci)
+    return results
+
+
+def white_score(score, turn):
+    return score if turn == chess.WHITE else -score
+
+
+def clamp(score):
+    return max(-LOSS_CAP, min(LOSS_CAP, score))
+
+
+def annotate(game, results, blunder):
+    """Per-move analysis of `game` from the worker's results, as JSON-ready dicts."""
+    moves = []
+    board = game.board()
+    for ply, node in enumerate(game.mainline()):
+        score, best = results[ply]
+        after, _ = results[ply + 1]
+        # Both from the mover's side: what the best move keeps against what was played
+        loss = max(0, clamp(score) - clamp(-after))
+        evaluation = white_score(-after, board.turn)
+        # Counted from the side to move after the move, 0 for a move that mates
+        mate = mate_in(after)
+        if mate is not None:
+            mate = white_score(mate, not board.turn)
+        moves.append({
+            'ply': ply + 1,
+            'move': board.san(node.move),
+            'eval': evaluation if abs(evaluation) < MATE_BOUND else None,
+            'mate': mate,
+            'best': board.san(chess.Move.from_uci(best)),
+            'loss': loss,
+            'blunder': loss >= blunder,
+        })
+        board.push(node.move)
+    return moves
+
+
+def pgn_comment(move):
+    if move['mate'] is not None:
+        evaluation = f"#{move['mate']}"
+    elif move['eval'] is not None:
+        evaluation = f"{move['eval'] / 100:.2f}"
+    else:
+        return f"best {move['best']}" if move['loss'] else ''
+    comment = f"[%eval {evaluation}]"
+    if move['loss']:
+        comment += f" best {move['best']}"
+    return comment
+
+
+def format_pgn(game, moves, blunder):
+    for node, move in zip(game.mainline(), moves):
+        node.comment = pgn_comment(move)
+        if move['blunder']:
+            node.nags.add(chess.pgn.NAG_BLUNDER)
+        elif move['loss'] >= min(MISTAKE, blunder):
+            node.nags.add(chess.pgn.NAG_MISTAKE)
+    return str(game) + '\n\n'
+
+
+def format_json(index, game, moves):
+    return json.dumps({'game': index, 'headers': dict(game.headers), 'moves': moves}) + '\n'
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_checkpoint(path, checkpoint):
+    # Written aside and renamed, so a crash never leaves half a checkpoint
+    with open(path + '.tmp', 'w') as file:
+        json.dump(checkpoint, file)
+    os.replace(path + '.tmp', path)
+
+
+def run(args):
+    checkpoint_path = args.out + '.checkpoint'
+    state = {'input': os.path.abspath(args.pgn), 'offset': 0, 'output_bytes': 0,
+             'games': 0, 'skipped': 0, 'positions': 0}
+    if args.resume:
+        saved = load_checkpoint(checkpoint_path)
+        if saved is None:
+            sys.exit(f"no checkpoint at {checkpoint_path}")
+        if saved['input'] != state['input']:
+            sys.exit(f"the checkpoint is for {saved['input']}")
+        state = saved
+        with open(args.out, 'ab') as output:
+            output.truncate(state['output_bytes'])
+        print(f"resuming after {state['games']} games at byte {state['offset']}", file=sys.stderr)
+
+    tablebase_dir = args.tablebases if args.tablebases and os.path.isdir(args.tablebases) else None
+    depth = args.depth or (MAX_DEPTH if args.nodes else 4)
+    pending = collections.deque()
+    games = read_pgn(args.pgn, state['offset'])
+    start = last_report = time.perf_counter()
+    positions_at_start = state['positions']
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+        rate = (state['positions'] - positions_at_start) / elapsed if elapsed > 0 else 0.0
+        print(f"{'done: ' if final else ''}{state['games']} games, {state['skipped']} skipped, "
+              f"{state['positions']} positions, {rate:.1f} positions/s, {len(pending)} in flight",
+              file=sys.stderr)
+
+    with process_pool(args.workers, _init_worker, (args.hash, tablebase_dir)) as executor, \
+            open(args.out, 'a', encoding='utf-8') as output:
+        exhausted = False
+        interrupted = False
+        try:
+            while pending or not exhausted:
+                # Fill the window; the generator is only advanced while there is room
+                while not exhausted and len(pending) < args.queue:
+                    if args.max_games is not None and state['games'] + state['skipped'] + len(pending) >= args.max_games:
+                        exhausted = True
+                        break
+                    try:
+                        text, end = next(games)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    game = parse_game(text)
+                    if game is None:
+                        pending.append((None, None, end))
+                        continue
+                    moves = [move.uci() for move in game.mainline_moves()]
+                    future = executor.submit(_analyze, game.board().fen(), moves, depth, args.nodes)
+                    pending.append((game, future, end))
+                if not pending:
+                    break
+
+                # Results are written in input order, so the oldest game is waited for
+                game, future, end = pending.popleft()
+                if game is None:
+                    state.update(skipped=state['skipped'] + 1, offset=end)
+                else:
+                    results = future.result()
+                    moves = annotate(game, results, args.blunder)
+                    index = state['games'] + state['skipped']
+                    output.write(format_pgn(game, moves, args.blunder) if args.format == 'pgn'
+                                 else format_json(index, game, moves))
+                    # One update, so an interrupt never leaves the counts and the output size apart
+                    state.update(games=state['games'] + 1, positions=state['positions'] + len(results),
+                                 offset=end, output_bytes=output.tell())
+                if (state['games'] + state['skipped']) % args.checkpoint == 0:
+                    save_checkpoint(checkpoint_path, state)
+                if time.perf_counter() - last_report >= args.report_every:
+                    last_report = time.perf_counter()
+                    report()
+        except KeyboardInterrupt:
+            # Everything written so far is kept; the games in flight are analysed again on --resume
+            interrupted = True
+            executor.shutdown(wait=False, cancel_futures=True)
+        save_checkpoint(checkpoint_path, state)
+    report(final=True)
+    if interrupted:
+        print("interrupted, continue with --resume", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse the games of a PGN file with the bot's search.")
+    parser.add_argument('pgn')
+    parser.add_argument('--out', required=True, help="output file, .pgn for annotated PGN, else JSON lines")
+    parser.add_argument('--format', choices=('jsonl', 'pgn'), help="default: from the output's extension")
+    parser.add_argument('--depth', type=int, help="search depth per position (default 4)")
+    parser.add_argument('--nodes', type=int, help="node limit per position instead of a depth")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes (default: all cores)")
+    parser.add_argument('--queue', type=int, help="games in flight at most (default: 4 per worker)")
+    parser.add_argument('--hash', type=int, default=16, help="transposition table per worker, MB")
+    parser.add_argument('--blunder', type=int, default=200, help="centipawns lost that make a blunder")
+    parser.add_argument('--max-games', type=int)
+    parser.add_argument('--checkpoint', type=int, default=100, help="games between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from the output's checkpoint")
+    parser.add_argument('--report-every', type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument('--tablebases', default=TABLEBASE_DIR)
+    args = parser.parse_args()
+    # python-chess logs every broken game; they are counted as skipped instead
+    logging.getLogger('chess.pgn').setLevel(logging.CRITICAL)
+    args.format = args.format or ('pgn' if args.out.endswith('.pgn') else 'jsonl')
+    args.queue = args.queue or 4 * args.workers
+    if os.path.exists(args.out) and not args.resume:
+        parser.error(f"{args.out} exists, use --resume to continue it or remove it")
+    run(args)
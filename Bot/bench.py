@@ -0,0 +1,271 @@
+"""
+Benchmark suite for the bot and the pygame frontends.
+
+    python Bot/bench.py [--quick] [--baseline KEY]
+    python Bot/bench.py --compare BASE [HEAD] [--threshold 10]
+    python Bot/bench.py --list
+
+A run measures:
+
+- perft/*: leaf counts of the perft suite (perft.py) at fixed depths,
+  checked against the published totals, and the move generator's speed;
+- move/*: time for the bot to pick a move at every difficulty level over
+  the suite's positions, the 'hard' search limited to a fixed number of
+  nodes instead of its time budget so the work is the same every run;
+- game_over/*: cost of the frontends' game-over check (chesscore.game) in
+  positions along a game;
+- render/*: frame time of the dirty-rectangle render path
+  (chesscore/render.py) with SDL's dummy video driver, for frames with a
+  move, a selection, and nothing changed, and of a full repaint.
+
+Results are stored in a JSON file keyed by the commit (`git rev-parse
+--short HEAD`, "+dirty" when the tree has changes). Comparing two keys lists
+every metric's change and flags those that got worse by more than the
+threshold percentage; the exit status is 1 when there is such a
+regression. Timings are the best of several repeats, which is the least
+noisy estimate on a shared machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from engine import Engine
+from levels import LEVELS, choose_move
+from perft import SUITE
+from position import Position
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from chesscore.game import GameBoard, result_message  # noqa: E402
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results.json')
+DEFAULT_THRESHOLD = 10.0
+SEARCH_NODES = 20000
+
+
+def best_of(repeats, function, *args):
+    """(smallest elapsed seconds, result) of `repeats` calls."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def metric(value, unit, better):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def bench_perft(metrics, depth, repeats):
+    failures = nodes_total = 0
+    time_total = 0.0
+    for name, fen, expected in SUITE:
+        depth_here = min(depth, len(expected))
+        elapsed, nodes = best_of(repeats, Position(fen).perft, depth_here)
+        failures += nodes != expected[depth_here - 1]
+        nodes_total += nodes
+        time_total += elapsed
+        metrics[f'perft/{name}/d{depth_here}/nps'] = metric(round(nodes / elapsed), 'nodes/s', 'higher')
+    metrics['perft/failures'] = metric(failures, 'positions', 'lower')
+    metrics['perft/total/nps'] = metric(round(nodes_total / time_total), 'nodes/s', 'higher')
+
+
+def bench_moves(metrics, repeats, nodes):
+    engine = Engine(hash_mb=16)
+    for level in LEVELS:
+        overrides = {'movetime': None, 'nodes': nodes} if level == 'hard' else None
+        times = []
+        searched = 0
+        for _, fen, _ in SUITE:
+            board = GameBoard(fen)
+            best = None
+            for _ in range(repeats):
+                engine.tt.clear()
+                engine.orderer.clear()
+                random.seed(0)
+                start = time.perf_counter()
+                choose_move(engine, board, level, overrides=overrides)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            times.append(best)
+            if level == 'hard':
+                searched += engine.nodes
+        metrics[f'move/{level}/mean_ms'] = metric(round(statistics.mean(times) * 1000, 3), 'ms', 'lower')
+        if level == 'hard':
+            metrics['move/hard/nps'] = metric(round(searched / sum(times)), 'nodes/s', 'higher')
+
+
+def sample_game(seed=0, plies=120):
+    """Positions along a random game, as GameBoards with their move stacks."""
+    rng = random.Random(seed)
+    board = GameBoard()
+    boards = []
+    while len(board.move_stack) < plies and not board.is_game_over():
+        board.push(rng.choice(list(board.legal_moves)))
+        boards.append(board.copy())
+    return boards
+
+
+def bench_game_over(metrics, repeats):
+    boards = sample_game()
+
+    def check_all():
+        for board in boards:
+            result_message(board, 'pvb')
+
+    elapsed, _ = best_of(repeats, check_all)
+    metrics['game_over/check_us'] = metric(round(elapsed / len(boards) * 1e6, 2), 'us', 'lower')
+
+
+def bench_render(metrics, repeats):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    try:
+        import pygame
+    except ImportError:
+        print("render: pygame is not installed, skipped")
+        return
+    from chesscore.render import BoardRenderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((600, 750))
+    font = pygame.font.Font(None, 48)
+    renderer = BoardRenderer(screen, (44, 50), 64, (235, 236, 208), (115, 149, 82), (48, 46, 43))
+    boards = sample_game(plies=60)
+    frames = []
+    for before, after in zip(boards, boards[1:]):
+        move = after.peek()
+        frames.append(('select', before, move.from_square))
+        frames.append(('move', after, None))
+        frames.extend(('idle', after, None) for _ in range(5))
+
+    def frame(board, selected):
+        renderer.text(font, "Chess Bot", (255, 255, 255), center=(300, 25))
+        renderer.set_board(board, {selected: (245, 246, 130)} if selected is not None else None)
+        pygame.display.update(renderer.flush())
+
+    timings = {}
+    for _ in range(repeats):
+        renderer.invalidate()
+        frame(boards[0], None)
+        totals = {}
+        for kind, board, selected in frames:
+            start = time.perf_counter()
+            frame(board, selected)
+            totals.setdefault(kind, []).append(time.perf_counter() - start)
+        renderer.invalidate()
+        start = time.perf_counter()
+        frame(boards[-1], None)
+        totals['full'] = [time.perf_counter() - start]
+        for kind, times in totals.items():
+            mean = statistics.mean(times)
+            timings[kind] = min(timings.get(kind, mean), mean)
+    for kind, seconds in timings.items():
+        metrics[f'render/{kind}_ms'] = metric(round(seconds * 1000, 4), 'ms', 'lower')
+    pygame.quit()
+
+
+def commit_key():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    key = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    if git('status', '--porcelain', '--untracked-files=no'):
+        key += '+dirty'
+    return key
+
+
+def load(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save(path, results):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=1, sort_keys=True)
+
+
+def run(quick=False):
+    repeats = 2 if quick else 5
+    metrics = {}
+    for name, bench, args in (('perft', bench_perft, (2 if quick else 3, repeats)),
+                              ('move', bench_moves, (1 if quick else 3, SEARCH_NODES // 4 if quick else SEARCH_NODES)),
+                              ('game_over', bench_game_over, (repeats,)),
+                              ('render', bench_render, (repeats,))):
+        start = time.perf_counter()
+        bench(metrics, *args)
+        print(f"{name:10} {time.perf_counter() - start:6.1f}s")
+    return metrics
+
+
+def compare(base, head, threshold):
+    """Print the change of every metric; returns the names of regressions."""
+    regressions = []
+    for name in sorted(set(base['metrics']) | set(head['metrics'])):
+        old = base['metrics'].get(name)
+        new = head['metrics'].get(name)
+        if old is None or new is None:
+            print(f"{name:34} {'only in ' + ('head' if old is None else 'base'):>34}")
+            continue
+        if old['value']:
+            change = (new['value'] - old['value']) / abs(old['value']) * 100
+        else:
+            change = 0.0 if new['value'] == old['value'] else float('inf')
+        worse = change > threshold if old['better'] == 'lower' else change < -threshold
+        if old['better'] == 'lower' and not old['value'] and new['value']:
+            worse = True
+        if worse:
+            regressions.append(name)
+        print(f"{name:34} {old['value']:>14} -> {new['value']:<14} {old['unit']:9} {change:+7.1f}%"
+              f"{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bot and the render path.")
+    parser.add_argument('--quick', action='store_true', help="fewer repeats and shallower work")
+    parser.add_argument('--results', default=RESULTS_PATH, help="JSON file of stored runs")
+    parser.add_argument('--key', help="store the run under this key instead of the commit")
+    parser.add_argument('--baseline', metavar='KEY', help="compare the new run with a stored one")
+    parser.add_argument('--compare', nargs='+', metavar='KEY', help="compare two stored runs (BASE [HEAD])")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"percent change counted as a regression (default {DEFAULT_THRESHOLD:g})")
+    parser.add_argument('--list', action='store_true', help="list stored runs")
+    args = parser.parse_args()
+
+    results = load(args.results)
+    if args.list:
+        for key, run_result in results.items():
+            print(f"{key:16} {run_result['date']}  {len(run_result['metrics'])} metrics")
+        sys.exit(0)
+
+    if args.compare:
+        base_key = args.compare[0]
+        head_key = args.compare[1] if len(args.compare) > 1 else commit_key()
+    else:
+        head_key = args.key or commit_key()
+        results[head_key] = {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                             'machine': platform.platform(), 'metrics': run(args.quick)}
+        save(args.results, results)
+        print(f"stored as {head_key} in {args.results}")
+        base_key = args.baseline
+
+    if base_key:
+        missing = [key for key in (base_key, head_key) if key not in results]
+        if missing:
+            sys.exit(f"no stored run for {', '.join(missing)}")
+        print(f"\n{base_key} -> {head_key}, threshold {args.threshold:g}%")
+        regressions = compare(results[base_key], results[head_key], args.threshold)
+        print(f"{len(regressions)} regression(s)" + (": " + ", ".join(regressions) if regressions else ""))
+        sys.exit(1 if regressions else 0)
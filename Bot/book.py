@@ -0,0 +1,90 @@
+"""
+Polyglot opening book lookup.
+
+A Polyglot .bin file is a flat array of 16-byte big-endian entries
+(key, move, weight, learn) sorted by the position's Zobrist key. The file is
+memory-mapped rather than read, so opening even a 100+ MB book is instant
+and costs no memory of its own; a probe is a binary search over the mapping
+(O(log n) entries touched) followed by a scan of the matching run.
+"""
+
+import mmap
+import os
+import random
+import struct
+
+import chess
+
+import zobrist
+
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+# The bot's own book, used by the levels that enable it if the file exists
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+
+# Polyglot encodes castling as the king capturing its own rook
+CASTLING_MOVES = {(chess.E1, chess.H1): chess.G1, (chess.E1, chess.A1): chess.C1,
+                  (chess.E8, chess.H8): chess.G8, (chess.E8, chess.A8): chess.C8}
+
+
+def decode_polyglot_move(board, raw):
+    to_square = raw & 0o77
+    from_square = raw >> 6 & 0o77
+    promotion = raw >> 12 & 7
+    if board.piece_type_at(from_square) == chess.KING and (from_square, to_square) in CASTLING_MOVES:
+        to_square = CASTLING_MOVES[from_square, to_square]
+    return chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = 0
+        self.map = None
+        length = self.file.seek(0, 2)
+        if length:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = length // ENTRY.size
+
+    def _first_index(self, key):
+        """Index of the first entry whose key is not smaller than `key`."""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.map, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, board):
+        """Legal book moves for `board` as (move, weight) pairs."""
+        key = zobrist.hash_board(board)
+        found = []
+        index = self._first_index(key)
+        while index < self.size:
+            entry_key, raw, weight, _ = ENTRY.unpack_from(self.map, index * ENTRY.size)
+            if entry_key != key:
+                break
+            move = decode_polyglot_move(board, raw)
+            if board.is_legal(move):
+                found.append((move, weight))
+            index += 1
+        return found
+
+    def choose(self, board, rng=random):
+        """A book move picked at random in proportion to its weight, or None."""
+        entries = self.entries(board)
+        if not entries:
+            return None
+        moves = [move for move, _ in entries]
+        weights = [weight for _, weight in entries]
+        if not any(weights):
+            return rng.choice(moves)
+        return rng.choices(moves, weights)[0]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
@@ -0,0 +1,360 @@
+"""
+Search engine behind the bot's 'hard' difficulty.
+
+Negamax with alpha-beta pruning, driven by iterative deepening. Every
+iteration searches one ply deeper than the last; when the time or node
+budget runs out the move from the deepest finished iteration is played.
+Positions reached again through a different move order are answered from
+the transposition table (see tt.py), keyed by incrementally updated Zobrist
+hashes (see zobrist.py). A position that already occurred in the game or
+on the current line is scored as a draw, looked up in the position's
+repetition counts. Moves are searched in the order given by
+ordering.py so that cutoffs come early, and leaves are scored by the
+incremental evaluation in evaluation.py after a quiescence search: at
+the horizon the side to move may stand pat on the static score or go on
+capturing (and promoting), so a leaf is never scored in the middle of an
+exchange. A side in check there cannot stand pat and tries every
+evasion, so a mate just past the horizon is still found. Captures whose
+static exchange evaluation (`Position.see`) loses material are pruned
+there unsearched. With endgame tablebases loaded (see tablebase.py)
+positions they cover are scored exactly, and a covered root is answered
+with the tablebase move without searching.
+
+The tree is walked on a `Position` (position.py) with 16-bit moves; the
+`chess.Board` passed to `search` is only converted at the root and the
+result is handed back as a `chess.Move`.
+"""
+
+import sys
+import time
+from tt import TranspositionTable, EXACT, LOWER, UPPER
+from ordering import MoveOrderer, mvv_lva
+from evaluation import evaluate
+from position import Position, decode_move
+
+
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+MAX_DEPTH = 64
+
+# The clock is only read every this many nodes (must be a power of two minus one)
+CHECK_EVERY = 1023
+
+
+def tablebase_score(value, ply):
+    """Search score of a tablebase value (signed distance to mate in plies)."""
+    if value > 0:
+        return MATE_SCORE - ply - value
+    if value < 0:
+        return -MATE_SCORE + ply - value - 1
+    return 0
+
+
+def mate_in(score):
+    """Moves to mate of a mate score, negative when getting mated; None for other scores."""
+    if score >= MATE_BOUND:
+        return (MATE_SCORE - score + 1) // 2
+    if score <= -MATE_BOUND:
+        return -((MATE_SCORE + score) // 2)
+    return None
+
+
+def score_to_tt(score, ply):
+    """Mate scores are stored relative to the node, not to the root."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class SearchAborted(Exception):
+    """Raised inside the tree when the budget is spent, unwinds to the root."""
+
+
+class Engine:
+    def __init__(self, hash_mb=16, ordering=True, tt=None, tablebases=None, quiescence=True, see_pruning=True):
+        self.tt = tt if tt is not None else TranspositionTable(hash_mb)
+        self.tablebases = tablebases
+        self.orderer = MoveOrderer()
+        self.ordering = ordering
+        self.quiescence = quiescence
+        self.see_pruning = see_pruning
+        self.position = None
+        self.nodes = 0
+        # Of `nodes`, those visited by the quiescence search, and the captures SEE pruned there
+        self.qnodes = 0
+        self.see_pruned = 0
+        self.depth = 0
+        self.score = 0
+        self.elapsed = 0.0
+        self.pv = []
+        self.deadline = None
+        self.node_limit = sys.maxsize
+        self.stop = None
+        self.tb_hits = 0
+
+    @property
+    def nps(self):
+        """Nodes searched per second during the last search."""
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def search(self, board, movetime=None, nodes=None, depth=MAX_DEPTH, on_iteration=None, stop=None,
+               first_depth=1):
+        """Return the best move found within the given budget.
+
+        `movetime` is in seconds, `nodes` caps the number of visited nodes
+        and `depth` the iteration count. `on_iteration` is called after
+        every finished iteration with the engine itself. Setting the
+        optional `stop` event (threading or multiprocessing) ends the
+        search early with the best move so far. `first_depth` lets helper
+        searches of a parallel search skip the shallow iterations.
+        """
+        position = Position.from_board(board)
+        moves = position.legal_moves()
+        if not moves:
+            return None
+
+        start = time.perf_counter()
+        self.nodes = 0
+        self.qnodes = 0
+        self.see_pruned = 0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.tb_hits = 0
+        if self.tablebases is not None:
+            move, value = self.tablebases.best_move(board)
+            if move is not None:
+                self.tb_hits = 1
+                self.score = tablebase_score(value, 0)
+                self.pv = [move]
+                self.elapsed = time.perf_counter() - start
+                return move
+
+        self.position = position
+        self.tt.new_search()
+        self.orderer.new_search()
+        if self.ordering:
+            moves = self.orderer.order(position, moves)
+        self.deadline = start + movetime if movetime is not None else None
+        self.node_limit = nodes if nodes is not None else sys.maxsize
+        self.stop = stop
+
+        best_move = moves[0]
+        for current_depth in range(min(first_depth, depth), depth + 1):
+            try:
+                score, move = self._search_root(moves, current_depth)
+            except SearchAborted as aborted:
+                # Moves are re-ordered so the previous best is searched first,
+                # a better move found before the abort is therefore trustworthy.
+                if aborted.args and aborted.args[0] is not None:
+                    best_move = aborted.args[0]
+                break
+            finally:
+                self.elapsed = time.perf_counter() - start
+
+            best_move = move
+            self.depth = current_depth
+            self.score = score
+            self.pv = self._principal_variation(current_depth)
+            moves.remove(move)
+            moves.insert(0, move)
+            if on_iteration:
+                on_iteration(self)
+            if abs(score) >= MATE_BOUND:
+                break
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                break
+            if self.stop is not None and self.stop.is_set():
+                break
+
+        return decode_move(best_move)
+
+    def _search_root(self, moves, depth):
+        position = self.position
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        for move in moves:
+            position.make(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            except SearchAborted:
+                raise SearchAborted(best_move)
+            position.unmake(move)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.tt.store(position.key, best_move, alpha, depth, EXACT)
+        return alpha, best_move
+
+    def _negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & CHECK_EVERY == 0 or self.nodes >= self.node_limit:
+            self._check_budget()
+
+        position = self.position
+        if position.halfmove >= 100 or position.is_repetition() or position.is_insufficient_material():
+            return 0
+        tablebases = self.tablebases
+        if tablebases is not None and position.occupied.bit_count() <= tablebases.max_pieces:
+            value = tablebases.probe_position(position)
+            if value is not None:
+                self.tb_hits += 1
+                return tablebase_score(value, ply)
+        if depth <= 0:
+            if self.quiescence:
+                return self._quiesce(alpha, beta, ply)
+            return evaluate(position)
+
+        key = position.key
+        hash_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            hash_move, score, entry_depth, bound = entry
+            if entry_depth >= depth:
+                score = score_from_tt(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if position.is_check() else 0
+        if self.ordering:
+            moves = self.orderer.order(position, moves, hash_move, ply)
+        elif hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+
+        original_alpha = alpha
+        best = -INFINITY
+        best_move = 0
+        for move in moves:
+            position.make(move)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            position.unmake(move)
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if self.ordering:
+                            self.orderer.cutoff(position, move, depth, ply)
+                        break
+
+        if best >= beta:
+            bound = LOWER
+        elif best > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.tt.store(key, best_move, score_to_tt(best, ply), depth, bound)
+        return best
+
+    def _quiesce(self, alpha, beta, ply):
+        """Captures and promotions only, until the position is quiet; every evasion when in check."""
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes & CHECK_EVERY == 0 or self.nodes >= self.node_limit:
+            self._check_budget()
+
+        position = self.position
+        in_check = position.is_check()
+        if in_check:
+            # No standing pat: the static score means nothing while the king is attacked
+            moves = position.legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            best = -INFINITY
+        else:
+            best = evaluate(position)
+            if best >= beta:
+                return best
+            if best > alpha:
+                alpha = best
+            moves = position.pseudo_legal_moves(captures_only=True)
+        moves.sort(key=lambda move: mvv_lva(position, move), reverse=True)
+        for move in moves:
+            if not in_check and self.see_pruning and position.see(move) < 0:
+                self.see_pruned += 1
+                continue
+            position.make(move)
+            if not in_check and not position.was_legal():
+                position.unmake(move)
+                continue
+            score = -self._quiesce(-beta, -alpha, ply + 1)
+            position.unmake(move)
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def _check_budget(self):
+        if self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+        if self.stop is not None and self.stop.is_set():
+            raise SearchAborted()
+
+    def _principal_variation(self, depth):
+        """Follow best moves stored in the transposition table from the root."""
+        position = self.position
+        pv = []
+        seen = set()
+        while len(pv) < depth and position.key not in seen:
+            seen.add(position.key)
+            entry = self.tt.probe(position.key)
+            if entry is None or not entry[0] or not position.is_legal(entry[0]):
+                break
+            pv.append(entry[0])
+            position.make(entry[0])
+        for move in reversed(pv):
+            position.unmake(move)
+        return [decode_move(move) for move in pv]
+
+
+if __name__ == "__main__":
+    import chess
+
+    # Node counts at a fixed depth with the leaves scored statically, with a
+    # quiescence search trying every capture and with losing captures pruned by SEE
+    POSITIONS = [
+        "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        "2r2rk1/pp1bqppp/2n1pn2/3p4/2PP4/P1NBPN2/1P3PPP/R2Q1RK1 w - - 0 12",
+    ]
+    DEPTH = 4
+    CONFIGS = (('static leaves', False, False), ('quiescence', True, False), ('quiescence + SEE', True, True))
+
+    totals = {name: [0, 0, 0.0] for name, _, _ in CONFIGS}
+    for fen in POSITIONS:
+        print(fen)
+        for name, quiescence, see_pruning in CONFIGS:
+            engine = Engine(quiescence=quiescence, see_pruning=see_pruning)
+            move = engine.search(chess.Board(fen), depth=DEPTH)
+            totals[name][0] += engine.nodes
+            totals[name][1] += engine.qnodes
+            totals[name][2] += engine.elapsed
+            print(f"  {name:17} {engine.nodes:8} nodes, {engine.qnodes:8} quiescence, "
+                  f"{engine.see_pruned:6} pruned by SEE, {engine.elapsed:6.2f}s, "
+                  f"{move.uci()} score {engine.score}")
+    print(f"total at depth {DEPTH}:")
+    for name, (nodes, qnodes, elapsed) in totals.items():
+        print(f"  {name:17} {nodes:8} nodes, {qnodes:8} quiescence, {elapsed:6.2f}s")
+    plain, pruned = totals['quiescence'][1], totals['quiescence + SEE'][1]
+    print(f"SEE pruning: {100 * (plain - pruned) / plain:.0f}% fewer quiescence nodes")
@@ -0,0 +1,186 @@
+"""
+Tapered material + piece-square evaluation.
+
+Every piece is worth its material value plus a bonus for the square it
+stands on, with separate midgame and endgame tables. The two scores are
+blended by game phase (how much non-pawn material is left).
+
+The engine's `Position` (position.py) keeps the white-minus-black
+midgame/endgame sums and the phase up to date as moves are made and unmade,
+so `evaluate` is a handful of arithmetic operations instead of a scan over
+all 64 squares. `evaluate_board` does the full scan and is kept as the
+reference.
+"""
+
+import chess
+
+MG_VALUES = {chess.PAWN: 82, chess.KNIGHT: 337, chess.BISHOP: 365,
+             chess.ROOK: 477, chess.QUEEN: 1025, chess.KING: 0}
+EG_VALUES = {chess.PAWN: 94, chess.KNIGHT: 281, chess.BISHOP: 297,
+             chess.ROOK: 512, chess.QUEEN: 936, chess.KING: 0}
+
+# Phase weight of each piece; 24 is the full opening set
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Tables are written from white's point of view, rank 8 on the first line
+MG_PST = {
+    chess.PAWN: [
+         0,   0,   0,   0,   0,   0,   0,   0,
+        50,  50,  50,  50,  50,  50,  50,  50,
+        10,  10,  20,  30,  30,  20,  10,  10,
+         5,   5,  10,  25,  25,  10,   5,   5,
+         0,   0,   0,  20,  20,   0,   0,   0,
+         5,  -5, -10,   0,   0, -10,  -5,   5,
+         5,  10,  10, -20, -20,  10,  10,   5,
+         0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    chess.KNIGHT: [
+       -50, -40, -30, -30, -30, -30, -40, -50,
+       -40, -20,   0,   0,   0,   0, -20, -40,
+       -30,   0,  10,  15,  15,  10,   0, -30,
+       -30,   5,  15,  20,  20,  15,   5, -30,
+       -30,   0,  15,  20,  20,  15,   0, -30,
+       -30,   5,  10,  15,  15,  10,   5, -30,
+       -40, -20,   0,   5,   5,   0, -20, -40,
+       -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+       -20, -10, -10, -10, -10, -10, -10, -20,
+       -10,   0,   0,   0,   0,   0,   0, -10,
+       -10,   0,   5,  10,  10,   5,   0, -10,
+       -10,   5,   5,  10,  10,   5,   5, -10,
+       -10,   0,  10,  10,  10,  10,   0, -10,
+       -10,  10,  10,  10,  10,  10,  10, -10,
+       -10,   5,   0,   0,   0,   0,   5, -10,
+       -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+         0,   0,   0,   0,   0,   0,   0,   0,
+         5,  10,  10,  10,  10,  10,  10,   5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+         0,   0,   0,   5,   5,   0,   0,   0,
+    ],
+    chess.QUEEN: [
+       -20, -10, -10,  -5,  -5, -10, -10, -20,
+       -10,   0,   0,   0,   0,   0,   0, -10,
+       -10,   0,   5,   5,   5,   5,   0, -10,
+        -5,   0,   5,   5,   5,   5,   0,  -5,
+         0,   0,   5,   5,   5,   5,   0,  -5,
+       -10,   5,   5,   5,   5,   5,   0, -10,
+       -10,   0,   5,   0,   0,   0,   0, -10,
+       -20, -10, -10,  -5,  -5, -10, -10, -20,
+    ],
+    chess.KING: [
+       -30, -40, -40, -50, -50, -40, -40, -30,
+       -30, -40, -40, -50, -50, -40, -40, -30,
+       -30, -40, -40, -50, -50, -40, -40, -30,
+       -30, -40, -40, -50, -50, -40, -40, -30,
+       -20, -30, -30, -40, -40, -30, -30, -20,
+       -10, -20, -20, -20, -20, -20, -20, -10,
+        20,  20,   0,   0,   0,   0,  20,  20,
+        20,  30,  10,   0,   0,  10,  30,  20,
+    ],
+}
+
+EG_PST = dict(MG_PST)
+EG_PST[chess.PAWN] = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    80,  80,  80,  80,  80,  80,  80,  80,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    30,  30,  30,  30,  30,  30,  30,  30,
+    20,  20,  20,  20,  20,  20,  20,  20,
+    10,  10,  10,  10,  10,  10,  10,  10,
+     5,   5,   5,   5,   5,   5,   5,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+EG_PST[chess.KING] = [
+   -50, -40, -30, -20, -20, -30, -40, -50,
+   -30, -20, -10,   0,   0, -10, -20, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -30,   0,   0,   0,   0, -30, -30,
+   -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+
+def _signed_tables(values, pst):
+    # TABLE[color][piece_type][square], positive for white and negative for black
+    white = [[0] * 64] + [[values[pt] + pst[pt][square ^ 56] for square in chess.SQUARES]
+                          for pt in chess.PIECE_TYPES]
+    black = [[0] * 64] + [[-(values[pt] + pst[pt][square]) for square in chess.SQUARES]
+                          for pt in chess.PIECE_TYPES]
+    return [black, white]
+
+
+MG_TABLE = _signed_tables(MG_VALUES, MG_PST)
+EG_TABLE = _signed_tables(EG_VALUES, EG_PST)
+
+
+def taper(mg, eg, phase):
+    """Blend white-minus-black midgame and endgame scores by phase."""
+    phase = min(phase, MAX_PHASE)
+    return (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def evaluate_board(board):
+    """Evaluate by scanning every square, from the side to move's point of view."""
+    mg = eg = phase = 0
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece:
+            mg += MG_TABLE[piece.color][piece.piece_type][square]
+            eg += EG_TABLE[piece.color][piece.piece_type][square]
+            phase += PHASE_WEIGHTS[piece.piece_type]
+    score = taper(mg, eg, phase)
+    return score if board.turn == chess.WHITE else -score
+
+
+def evaluate(position):
+    """Score a `Position` from its incrementally updated sums, side to move's view."""
+    score = taper(position.mg, position.eg, position.phase)
+    return score if position.turn else -score
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from position import Position
+
+    random.seed(0)
+    positions = []
+    for _ in range(50):
+        board = chess.Board()
+        position = Position()
+        for _ in range(random.randint(10, 80)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            move = random.choice(moves)
+            position.make(move)
+            board.push(chess.Move(move & 63, move >> 6 & 63, (move >> 12) or None))
+            assert evaluate(position) == evaluate_board(board), board.fen()
+        positions.append((board, position))
+
+    ROUNDS = 200
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for board, position in positions:
+            evaluate_board(board)
+    full = (time.perf_counter() - start) / (ROUNDS * len(positions))
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for board, position in positions:
+            evaluate(position)
+    incremental = (time.perf_counter() - start) / (ROUNDS * len(positions))
+
+    print(f"full re-evaluation:   {full * 1e6:8.2f} us per leaf")
+    print(f"incremental evaluate: {incremental * 1e6:8.2f} us per leaf "
+          f"({full / incremental:.0f}x faster)")
@@ -0,0 +1,65 @@
+"""
+Bot difficulty levels.
+
+- 'easy': a random legal move.
+- 'medium': prioritizes capturing moves.
+  - Captures that lose material once the exchange on the square is played
+    out (static exchange evaluation, see `Position.see`) are left out.
+  - If there are other capturing moves available, it selects the best one by
+    MVV-LVA (most valuable victim, then least valuable attacker, see
+    ordering.py).
+  - If no such capturing moves are available, it makes a random legal move.
+- 'hard': an alpha-beta search (see engine.py), playing the best move found
+  within the level's `movetime` seconds / `nodes` nodes.
+
+A level with `book` set plays from the opening book (see book.py), when one
+is available, for the first `book_depth` plies of the game.
+"""
+
+import random
+
+from engine import MAX_DEPTH
+from position import Position, decode_move
+
+LEVELS = {
+    'easy': {'book': False},
+    'medium': {'book': True, 'book_depth': 8},
+    'hard': {'movetime': 2.0, 'nodes': None, 'book': True, 'book_depth': 24},
+}
+
+
+def choose_move(engine, board, level, stop=None, book=None, overrides=None, on_iteration=None):
+    """Pick the bot's move for `board` at difficulty `level`.
+
+    Returns (move, source) with source one of 'book', 'random', 'capture' or
+    'search'; move is None when there is no legal move. `stop` is an optional
+    event that makes a running search return early, `book` an optional
+    `OpeningBook`, `overrides` replaces some of the level's settings (e.g.
+    `{'movetime': 0.1}`, or `{'depth': 6}` to limit the iterations) and
+    `on_iteration` is passed on to the search.
+    """
+    settings = dict(LEVELS[level], **overrides) if overrides else LEVELS[level]
+    if book is not None and settings.get('book') and board.ply() < settings.get('book_depth', 0):
+        move = book.choose(board)
+        if move is not None:
+            return move, 'book'
+
+    orderer = engine.orderer
+    position = Position.from_board(board)
+    moves = orderer.order(position)
+    if not moves:
+        return None, None
+
+    if level == 'easy':
+        return decode_move(random.choice(moves)), 'random'
+    elif level == 'medium':
+        captures = [move for move in moves if not orderer.is_quiet(position, move) and position.see(move) >= 0]
+        if captures:
+            best_score = orderer.score(position, captures[0])
+            best_captures = [move for move in captures if orderer.score(position, move) == best_score]
+            return decode_move(random.choice(best_captures)), 'capture'
+        return decode_move(random.choice(moves)), 'random'
+    move = engine.search(board, movetime=settings.get('movetime'), nodes=settings.get('nodes'),
+                         depth=settings.get('depth') or MAX_DEPTH, on_iteration=on_iteration, stop=stop)
+    return move, 'search'
+
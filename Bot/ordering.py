@@ -0,0 +1,113 @@
+"""
+Move ordering shared by every difficulty level and the search.
+
+Moves are sorted by a single integer score:
+- the hash move from the transposition table comes first,
+- then captures and promotions, most valuable victim / least valuable attacker,
+- then the two killer moves of the current ply (quiet moves that caused a
+  beta cutoff in a sibling node),
+- then the remaining quiet moves by their history score.
+
+The better the ordering, the sooner alpha-beta finds a cutoff and the fewer
+nodes it visits; run this module to compare node counts with and without it.
+"""
+
+import chess
+
+from position import PAWN
+
+MAX_PLY = 128
+
+HASH_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORES = (1 << 27, (1 << 27) - 1)
+HISTORY_MAX = 1 << 20
+
+
+def mvv_lva(position, move):
+    """Capture score: victim value first, the cheaper attacker breaks ties."""
+    mailbox = position.mailbox
+    to = move >> 6 & 63
+    victim = mailbox[to] & 7
+    attacker = mailbox[move & 63] & 7
+    if not victim and attacker == PAWN and to == position.ep != 0:
+        victim = PAWN
+    return (victim + (move >> 12)) * 8 - attacker
+
+
+class MoveOrderer:
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 4096)
+
+    def clear(self):
+        """Forget everything learned, e.g. when a new game starts."""
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.history = [0] * (2 * 4096)
+
+    def new_search(self):
+        """Killers only make sense within one search, history is kept but aged."""
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.history = [value >> 2 for value in self.history]
+
+    def is_quiet(self, position, move):
+        return not move >> 12 and not position.is_capture(move)
+
+    def score(self, position, move, hash_move=0, ply=0):
+        if move == hash_move:
+            return HASH_SCORE
+        if move >> 12 or position.is_capture(move):
+            return CAPTURE_SCORE + mvv_lva(position, move)
+        killers = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        if move == killers[0]:
+            return KILLER_SCORES[0]
+        if move == killers[1]:
+            return KILLER_SCORES[1]
+        # The low 12 bits of a move are its from/to squares
+        return self.history[position.turn << 12 | move & 4095]
+
+    def order(self, position, moves=None, hash_move=0, ply=0):
+        """Return `moves` (all legal moves by default) best first."""
+        if moves is None:
+            moves = position.legal_moves()
+        score = self.score
+        return sorted(moves, key=lambda move: score(position, move, hash_move, ply), reverse=True)
+
+    def cutoff(self, position, move, depth, ply):
+        """Reward a quiet move that failed high; `position` is the one before it."""
+        if not self.is_quiet(position, move):
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        index = position.turn << 12 | move & 4095
+        self.history[index] += depth * depth
+        if self.history[index] > HISTORY_MAX:
+            self.history = [value >> 1 for value in self.history]
+
+
+if __name__ == "__main__":
+    from engine import Engine
+
+    POSITIONS = [
+        chess.STARTING_FEN,
+        "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    ]
+    DEPTH = 4
+
+    for fen in POSITIONS:
+        counts = []
+        for ordering in (False, True):
+            engine = Engine(ordering=ordering)
+            engine.search(chess.Board(fen), depth=DEPTH)
+            counts.append((engine.nodes, engine.elapsed))
+        (plain, plain_time), (ordered, ordered_time) = counts
+        print(f"{fen}\n  depth {DEPTH}: {plain} nodes ({plain_time:.2f}s) unordered, "
+              f"{ordered} nodes ({ordered_time:.2f}s) ordered, "
+              f"{100 * (plain - ordered) / plain:.0f}% fewer")
@@ -0,0 +1,198 @@
+"""
+Lazy SMP: the same search run by several processes sharing one
+transposition table.
+
+The search is pure Python, so threads cannot run it in parallel; instead a
+`ProcessPoolExecutor` holds one engine per worker, all attached to a
+transposition table in `multiprocessing.shared_memory`. Every worker
+searches the whole tree from the root, odd ones starting one ply deeper,
+and they speed each other up through the entries they store. The answer is
+taken from the worker that completed the deepest iteration.
+
+`ParallelSearch` has the same interface as `Engine` (search, depth, score,
+nodes, nps, tt, orderer), so the bot can use either. Run this module to
+measure time-to-depth speedup against a single worker.
+
+`process_pool` makes the pools of this module and of the scripts that
+fan work out to processes (analyze.py, server.py, tournament.py): each
+worker process keeps what its initializer sets up, such as its engine, in
+`worker_state`. The worker processes import the main module when the
+platform starts them with 'spawn' (Windows, macOS), so no such script may
+do work at import time.
+"""
+
+import concurrent.futures
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import chess
+
+from engine import Engine, MAX_DEPTH
+from ordering import MoveOrderer
+from tablebase import Tablebases
+from tt import TranspositionTable, table_bytes
+
+# State of each worker process of a `process_pool`, set up once by its initializer
+worker_state = {}
+
+
+def _ping():
+    return True
+
+
+def process_pool(workers, initializer, initargs=(), mp_context=None):
+    """A ProcessPoolExecutor of `workers` processes, each set up by `initializer(*initargs)`."""
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                                                      initializer=initializer, initargs=initargs)
+    # Start every process now rather than in the middle of the first task
+    for future in [executor.submit(_ping) for _ in range(workers)]:
+        future.result()
+    return executor
+
+
+def _init_worker(shm_name, stop, tablebase_dir):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    worker_state['shm'] = shm
+    tablebases = Tablebases(tablebase_dir) if tablebase_dir else None
+    worker_state['engine'] = Engine(tt=TranspositionTable(buffer=shm.buf), tablebases=tablebases)
+    worker_state['stop'] = stop
+
+
+def _search(fen, moves, movetime, nodes, depth, worker_id, age, orderer_generation):
+    engine = worker_state['engine']
+    # Killers and history are per process; they are forgotten when the parent's orderer was cleared
+    if worker_state.get('orderer_generation') != orderer_generation:
+        engine.orderer.clear()
+        worker_state['orderer_generation'] = orderer_generation
+    board = chess.Board(fen)
+    for uci in moves:
+        board.push_uci(uci)
+    # Age must agree across processes or they evict each other's fresh entries
+    engine.tt.age = age - 1
+    move = engine.search(board, movetime=movetime, nodes=nodes, depth=depth,
+                         stop=worker_state['stop'], first_depth=1 + worker_id % 2)
+    tt = engine.tt
+    stats = (tt.hits, tt.misses, tt.stores, tt.overwrites, engine.tb_hits)
+    tt.hits = tt.misses = tt.stores = tt.overwrites = 0
+    return (worker_id, move.uci() if move else None, engine.depth, engine.score,
+            engine.nodes, [m.uci() for m in engine.pv], stats)
+
+
+class SharedOrderer(MoveOrderer):
+    """The parent's move orderer, whose `clear` also reaches the workers' engines on their next search."""
+
+    def __init__(self):
+        super().__init__()
+        self.generation = 0
+
+    def clear(self):
+        super().clear()
+        self.generation += 1
+
+
+class ParallelSearch:
+    def __init__(self, workers=4, hash_mb=64, mp_context=None, tablebase_dir=None):
+        self.workers = workers
+        context = mp_context or multiprocessing.get_context()
+        self.shm = shared_memory.SharedMemory(create=True, size=table_bytes(hash_mb))
+        self.tt = TranspositionTable(buffer=self.shm.buf)
+        self.tt.clear()
+        self.orderer = SharedOrderer()
+        self.stop = context.Event()
+        self.executor = process_pool(workers, _init_worker, (self.shm.name, self.stop, tablebase_dir), context)
+
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.elapsed = 0.0
+        self.pv = []
+        self.tb_hits = 0
+        self.first_finished = 0.0
+        self.worker_nodes = []
+
+    @property
+    def nps(self):
+        """Nodes searched per second by all workers together."""
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def search(self, board, movetime=None, nodes=None, depth=MAX_DEPTH, on_iteration=None, stop=None):
+        """Best move for `board`, see `Engine.search`; `nodes` is per worker.
+
+        The workers don't report their iterations, `on_iteration` is called
+        once with the combined result.
+        """
+        start = time.perf_counter()
+        self.stop.clear()
+        self.tt.new_search()
+        root = board.root()
+        moves = [move.uci() for move in board.move_stack]
+        futures = [self.executor.submit(_search, root.fen(), moves, movetime, nodes, depth,
+                                        worker_id, self.tt.age, self.orderer.generation)
+                   for worker_id in range(self.workers)]
+
+        # The first worker to return has finished its budget or reached the
+        # requested depth; the rest are told to stop and report back.
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=0.05,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            if done or (stop is not None and stop.is_set()):
+                break
+        self.first_finished = time.perf_counter() - start
+        self.stop.set()
+        results = sorted(future.result() for future in futures)
+        self.elapsed = time.perf_counter() - start
+
+        best = max(results, key=lambda result: (result[2], -result[0]))
+        _, uci, self.depth, self.score, _, self.pv, _ = best
+        self.pv = [chess.Move.from_uci(move) for move in self.pv]
+        self.worker_nodes = [result[4] for result in results]
+        self.nodes = sum(self.worker_nodes)
+        self.tb_hits = 0
+        for result in results:
+            hits, misses, stores, overwrites, tb_hits = result[6]
+            self.tb_hits += tb_hits
+            self.tt.hits += hits
+            self.tt.misses += misses
+            self.tt.stores += stores
+            self.tt.overwrites += overwrites
+        if on_iteration and uci:
+            on_iteration(self)
+        return chess.Move.from_uci(uci) if uci else None
+
+    def close(self):
+        self.stop.set()
+        self.executor.shutdown(wait=True)
+        self.tt.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    POSITIONS = [
+        chess.STARTING_FEN,
+        "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    ]
+    DEPTH = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    baseline = None
+    for workers in counts:
+        search = ParallelSearch(workers=workers, hash_mb=64)
+        total = 0.0
+        nodes = 0
+        for fen in POSITIONS:
+            search.tt.clear()
+            search.search(chess.Board(fen), depth=DEPTH)
+            total += search.first_finished
+            nodes += search.nodes
+        search.close()
+        baseline = baseline or total
+        print(f"{workers:2} workers: time to depth {DEPTH} {total:6.2f}s, "
+              f"speedup {baseline / total:4.2f}x, {nodes / total:8.0f} nps total")
@@ -0,0 +1,137 @@
+"""
+Perft suite for position.py, checked against python-chess.
+
+For each test position the number of leaf nodes at every depth is counted by
+`Position.perft` and by a plain python-chess walk, both must agree with each
+other and with the published totals. The speed of both is reported so the
+advantage of the bitboard position can be tracked. Perft counts the last
+ply without making the moves; the search does make them, so the make/unmake
+rate of both is reported separately.
+
+    python Bot/perft.py [max depth] [--verify]
+
+--verify additionally walks the tree with python-chess alongside and compares
+the legal move sets, FEN, Zobrist key and evaluation at every node.
+"""
+
+import sys
+import time
+import chess
+
+import zobrist
+from evaluation import evaluate_board, taper
+from position import Position, encode_move
+
+# (name, fen, leaf counts for depth 1, 2, ...)
+SUITE = [
+    ("start", chess.STARTING_FEN, [20, 400, 8902, 197281]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862]),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467]),
+    ("talkchess", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890]),
+]
+
+
+def board_perft(board, depth):
+    """Reference perft on a chess.Board."""
+    if depth == 1:
+        return board.legal_moves.count()
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += board_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def walk_position(position, depth):
+    """Make and unmake every move of the tree, like the search does."""
+    nodes = 0
+    for move in position.legal_moves():
+        position.make(move)
+        nodes += 1 if depth == 1 else 1 + walk_position(position, depth - 1)
+        position.unmake(move)
+    return nodes
+
+
+def walk_board(board, depth):
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += 1 if depth == 1 else 1 + walk_board(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def verify(position, board, depth):
+    """Walk both trees together and fail on the first disagreement."""
+    assert position.fen().split()[:3] == board.fen().split()[:3], (position.fen(), board.fen())
+    assert position.key == zobrist.hash_board(board), board.fen()
+    score = taper(position.mg, position.eg, position.phase)
+    assert evaluate_board(board) == (score if board.turn else -score), board.fen()
+    assert position.is_check() == board.is_check(), board.fen()
+    moves = sorted(position.legal_moves())
+    assert moves == sorted(encode_move(move) for move in board.legal_moves), board.fen()
+    if depth == 0:
+        return
+    for move in moves:
+        position.make(move)
+        board.push(chess.Move(move & 63, move >> 6 & 63, (move >> 12) or None))
+        verify(position, board, depth - 1)
+        board.pop()
+        position.unmake(move)
+
+
+def run(max_depth=None, check=False):
+    total_fast = total_slow = 0.0
+    total_nodes = 0
+    failures = 0
+    for name, fen, expected in SUITE:
+        depths = expected if max_depth is None else expected[:max_depth]
+        position = Position(fen)
+        board = chess.Board(fen)
+        if check:
+            verify(position, board, min(len(depths), 3) - 1)
+        for depth, count in enumerate(depths, 1):
+            start = time.perf_counter()
+            fast = position.perft(depth)
+            fast_time = time.perf_counter() - start
+            start = time.perf_counter()
+            slow = board_perft(board, depth)
+            slow_time = time.perf_counter() - start
+            ok = fast == slow == count
+            failures += not ok
+            total_fast += fast_time
+            total_slow += slow_time
+            total_nodes += fast
+            print(f"{name:11} depth {depth}: {fast:8} nodes  {'ok  ' if ok else 'FAIL'} "
+                  f"position {fast / max(fast_time, 1e-9):9.0f} nps   "
+                  f"python-chess {slow / max(slow_time, 1e-9):9.0f} nps")
+        assert position.fen() == Position(fen).fen(), "make/unmake did not restore the position"
+
+    print(f"\nperft: {total_nodes} nodes, position {total_nodes / total_fast:.0f} nps, "
+          f"python-chess {total_nodes / total_slow:.0f} nps, "
+          f"{total_slow / total_fast:.1f}x faster")
+
+    fast_time = slow_time = 0.0
+    made = 0
+    for name, fen, expected in SUITE:
+        start = time.perf_counter()
+        made += walk_position(Position(fen), 3)
+        fast_time += time.perf_counter() - start
+        start = time.perf_counter()
+        walk_board(chess.Board(fen), 3)
+        slow_time += time.perf_counter() - start
+    print(f"make/unmake: {made} moves, position {made / fast_time:.0f} per second, "
+          f"python-chess push/pop {made / slow_time:.0f} per second, "
+          f"{slow_time / fast_time:.1f}x faster")
+    return failures
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    sys.exit(1 if run(int(args[0]) if args else None, '--verify' in sys.argv) else 0)
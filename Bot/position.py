@@ -0,0 +1,801 @@
+"""
+Compact bitboard position for the engine's hot path.
+
+python-chess is used everywhere at the UI boundary, but inside the search a
+`chess.Board` costs a `Move` object per move and a growing move stack. A
+`Position` instead keeps
+
+- one integer bitboard per piece code and per colour, plus a 64-entry mailbox,
+- side to move, castling rights (4 bits), en passant square and clocks,
+- the Polyglot Zobrist key and the tapered evaluation sums (see
+  evaluation.py), both updated incrementally,
+- how often each key has occurred in the game and on the current line
+  (`repetitions`), so spotting a repeated position is one dict lookup
+  instead of a walk back through the history,
+
+and an undo stack preallocated for MAX_PLY moves, so `make`/`unmake` only
+assign into existing slots.
+
+Moves are 16-bit ints: from | to << 6 | promotion piece type << 12, the same
+for every position, so they convert to and from `chess.Move` without a board.
+Castling is the king's two-square move and en passant is a pawn capture onto
+the en passant square, both recognised while making the move.
+
+Knight, king and pawn attacks come from precomputed tables; sliding attacks
+use kindergarten bitboards: the occupancy of a rank, file or diagonal is
+squeezed into a 6-bit index (by shifting, or by multiplying to gather the
+line onto one rank) that selects a precomputed attack set.
+"""
+
+import chess
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY
+
+from zobrist import PIECE_KEYS, TURN_KEY, EP_KEYS, hash_board
+from evaluation import MG_TABLE, EG_TABLE, MG_VALUES, PHASE_WEIGHTS
+
+WHITE, BLACK = 1, 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+
+# Piece code on the mailbox: piece type, plus 8 for white; 0 is an empty square
+WHITE_PIECE = 8
+
+M64 = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+C2_H7 = 0x0080402010080400
+
+MAX_PLY = 1024
+
+# Castling right bits and the squares whose king/rook keep them alive
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[chess.E1] = 15 & ~(CASTLE_WK | CASTLE_WQ)
+CASTLE_MASK[chess.H1] = 15 & ~CASTLE_WK
+CASTLE_MASK[chess.A1] = 15 & ~CASTLE_WQ
+CASTLE_MASK[chess.E8] = 15 & ~(CASTLE_BK | CASTLE_BQ)
+CASTLE_MASK[chess.H8] = 15 & ~CASTLE_BK
+CASTLE_MASK[chess.A8] = 15 & ~CASTLE_BQ
+CASTLE_KEYS = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights & 1 << _bit:
+            CASTLE_KEYS[_rights] ^= POLYGLOT_RANDOM_ARRAY[768 + _bit]
+
+# Rook from/to squares indexed by the king's destination when castling
+CASTLE_ROOKS = {chess.G1: (chess.H1, chess.F1), chess.C1: (chess.A1, chess.D1),
+                chess.G8: (chess.H8, chess.F8), chess.C8: (chess.A8, chess.D8)}
+
+PROMOTIONS = (QUEEN, KNIGHT, ROOK, BISHOP)
+
+# Piece values for static exchange evaluation: the evaluation's midgame
+# material, and a king that outweighs any exchange
+SEE_VALUES = [0] + [MG_VALUES[piece_type] for piece_type in range(PAWN, KING)] + [20000]
+
+
+def _step_attacks(deltas):
+    table = []
+    for square in range(64):
+        bb = 0
+        for df, dr in deltas:
+            f, r = (square & 7) + df, (square >> 3) + dr
+            if 0 <= f < 8 and 0 <= r < 8:
+                bb |= 1 << (r * 8 + f)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_attacks([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_attacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+# PAWN_ATTACKS[color][square]: squares a pawn of `color` on `square` attacks
+PAWN_ATTACKS = [_step_attacks([(-1, -1), (1, -1)]), _step_attacks([(-1, 1), (1, 1)])]
+
+
+def _ray_attacks(square, occupied, deltas):
+    bb = 0
+    for df, dr in deltas:
+        f, r = (square & 7) + df, (square >> 3) + dr
+        while 0 <= f < 8 and 0 <= r < 8:
+            bit = 1 << (r * 8 + f)
+            bb |= bit
+            if occupied & bit:
+                break
+            f, r = f + df, r + dr
+    return bb
+
+
+def _line_mask(square, deltas):
+    return _ray_attacks(square, 0, deltas) | 1 << square
+
+
+def _subsets(mask):
+    subset = 0
+    while True:
+        yield subset
+        subset = (subset - mask) & mask
+        if not subset:
+            return
+
+
+def _kindergarten_table(square, mask, deltas, index):
+    table = [None] * 64
+    for occupied in _subsets(mask):
+        attacks = _ray_attacks(square, occupied, deltas)
+        i = index(square, occupied)
+        assert table[i] is None or table[i] == attacks
+        table[i] = attacks
+    return [attacks or 0 for attacks in table]
+
+
+RANK_DELTAS = [(1, 0), (-1, 0)]
+FILE_DELTAS = [(0, 1), (0, -1)]
+DIAG_DELTAS = [(1, 1), (-1, -1)]
+ANTI_DELTAS = [(1, -1), (-1, 1)]
+
+DIAG_MASKS = [_line_mask(sq, DIAG_DELTAS) for sq in range(64)]
+ANTI_MASKS = [_line_mask(sq, ANTI_DELTAS) for sq in range(64)]
+
+
+def _rank_index(square, occupied):
+    return (occupied >> ((square & 56) + 1)) & 63
+
+
+def _file_index(square, occupied):
+    return (((occupied >> (square & 7)) & FILE_A) * C2_H7 & M64) >> 58
+
+
+def _diag_index(square, occupied):
+    return ((occupied & DIAG_MASKS[square]) * FILE_B & M64) >> 58
+
+
+def _anti_index(square, occupied):
+    return ((occupied & ANTI_MASKS[square]) * FILE_B & M64) >> 58
+
+
+# A rank's attacks are the first rank's moved up, with the same index
+RANK_ATTACKS = [_kindergarten_table(sq, _line_mask(sq, RANK_DELTAS), RANK_DELTAS, _rank_index) for sq in range(8)]
+RANK_ATTACKS += [[attacks << (sq & 56) for attacks in RANK_ATTACKS[sq & 7]] for sq in range(8, 64)]
+FILE_ATTACKS = [_kindergarten_table(sq, _line_mask(sq, FILE_DELTAS), FILE_DELTAS, _file_index) for sq in range(64)]
+DIAG_ATTACKS = [_kindergarten_table(sq, DIAG_MASKS[sq], DIAG_DELTAS, _diag_index) for sq in range(64)]
+ANTI_ATTACKS = [_kindergarten_table(sq, ANTI_MASKS[sq], ANTI_DELTAS, _anti_index) for sq in range(64)]
+
+
+def rook_attacks(square, occupied):
+    return (RANK_ATTACKS[square][(occupied >> ((square & 56) + 1)) & 63] |
+            FILE_ATTACKS[square][(((occupied >> (square & 7)) & FILE_A) * C2_H7 & M64) >> 58])
+
+
+def bishop_attacks(square, occupied):
+    return (DIAG_ATTACKS[square][((occupied & DIAG_MASKS[square]) * FILE_B & M64) >> 58] |
+            ANTI_ATTACKS[square][((occupied & ANTI_MASKS[square]) * FILE_B & M64) >> 58])
+
+
+def _between_table():
+    between = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        for df, dr in RANK_DELTAS + FILE_DELTAS + DIAG_DELTAS + ANTI_DELTAS:
+            f, r = (a & 7) + df, (a >> 3) + dr
+            ray = 0
+            while 0 <= f < 8 and 0 <= r < 8:
+                between[a][r * 8 + f] = ray
+                ray |= 1 << (r * 8 + f)
+                f, r = f + df, r + dr
+    return between
+
+
+# BETWEEN[a][b]: squares strictly between two squares on a common line
+BETWEEN = _between_table()
+
+
+def encode_move(move):
+    """chess.Move -> 16-bit move (0 stands for no move)."""
+    if move is None:
+        return 0
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code):
+    """16-bit move -> chess.Move, None for 0."""
+    if not code:
+        return None
+    return chess.Move(code & 63, code >> 6 & 63, (code >> 12) or None)
+
+
+def move_uci(code):
+    return decode_move(code).uci() if code else "0000"
+
+
+def history_counts(board):
+    """Key counts of the positions of `board`'s game that can still repeat.
+
+    Positions before the last capture or pawn move cannot come back, so only
+    the last `halfmove_clock` plies are replayed.
+    """
+    board = board.copy()
+    key = hash_board(board)
+    counts = {key: 1}
+    for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+        board.pop()
+        key = hash_board(board)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+class Position:
+    __slots__ = ('bitboards', 'colors', 'occupied', 'mailbox', 'turn', 'castling',
+                 'ep', 'halfmove', 'fullmove', 'key', 'mg', 'eg', 'phase', 'ply',
+                 'undo_captured', 'undo_castling', 'undo_ep', 'undo_halfmove',
+                 'undo_key', 'undo_mg', 'undo_eg', 'undo_phase', 'repetitions')
+
+    def __init__(self, fen=chess.STARTING_FEN):
+        self.bitboards = [0] * 16
+        self.colors = [0, 0]
+        self.mailbox = [0] * 64
+        self.undo_captured = [0] * MAX_PLY
+        self.undo_castling = [0] * MAX_PLY
+        self.undo_ep = [0] * MAX_PLY
+        self.undo_halfmove = [0] * MAX_PLY
+        self.undo_key = [0] * MAX_PLY
+        self.undo_mg = [0] * MAX_PLY
+        self.undo_eg = [0] * MAX_PLY
+        self.undo_phase = [0] * MAX_PLY
+        self.set_fen(fen)
+
+    # -- conversion at the UI boundary -------------------------------------
+
+    @classmethod
+    def from_board(cls, board):
+        """Convert a `chess.Board`, counting the positions of its game so far."""
+        position = cls(board.fen())
+        table = getattr(board, 'repetitions', None)
+        if table is not None and table.in_sync(board):
+            position.repetitions = dict(table.counts)
+        else:
+            position.repetitions = history_counts(board)
+        return position
+
+    def to_board(self):
+        return chess.Board(self.fen())
+
+    def set_fen(self, fen):
+        """Load a position from FEN, dropping the undo history."""
+        parts = fen.split()
+        placement, turn = parts[0], parts[1] if len(parts) > 1 else 'w'
+        castling = parts[2] if len(parts) > 2 else '-'
+        ep = parts[3] if len(parts) > 3 else '-'
+
+        for i in range(16):
+            self.bitboards[i] = 0
+        self.colors[0] = self.colors[1] = 0
+        for i in range(64):
+            self.mailbox[i] = 0
+        rank, file = 7, 0
+        for char in placement:
+            if char == '/':
+                rank, file = rank - 1, 0
+            elif char.isdigit():
+                file += int(char)
+            else:
+                piece = chess.Piece.from_symbol(char)
+                self._put(piece.piece_type + (WHITE_PIECE if piece.color else 0), rank * 8 + file)
+                file += 1
+
+        self.turn = WHITE if turn == 'w' else BLACK
+        self.castling = 0
+        for char, right in (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ)):
+            if char in castling:
+                self.castling |= right
+        self.ep = 0
+        if ep != '-':
+            square = chess.parse_square(ep)
+            if PAWN_ATTACKS[1 - self.turn][square] & self.bitboards[PAWN + (WHITE_PIECE if self.turn else 0)]:
+                self.ep = square
+        self.halfmove = int(parts[4]) if len(parts) > 4 else 0
+        self.fullmove = int(parts[5]) if len(parts) > 5 else 1
+        self.ply = 0
+        self._refresh()
+        self.repetitions = {self.key: 1}
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = '', 0
+            for file in range(8):
+                code = self.mailbox[rank * 8 + file]
+                if code:
+                    if empty:
+                        row, empty = row + str(empty), 0
+                    symbol = chess.PIECE_SYMBOLS[code & 7]
+                    row += symbol.upper() if code & WHITE_PIECE else symbol
+                else:
+                    empty += 1
+            rows.append(row + (str(empty) if empty else ''))
+        castling = ''.join(char for char, right in
+                           (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ))
+                           if self.castling & right) or '-'
+        ep = chess.SQUARE_NAMES[self.ep] if self.ep else '-'
+        return (f"{'/'.join(rows)} {'w' if self.turn else 'b'} {castling} {ep} "
+                f"{self.halfmove} {self.fullmove}")
+
+    def _put(self, code, square):
+        bit = 1 << square
+        self.bitboards[code] |= bit
+        self.colors[1 if code & WHITE_PIECE else 0] |= bit
+        self.mailbox[square] = code
+
+    def _refresh(self):
+        """Recompute occupancy, key and evaluation sums from the pieces."""
+        self.occupied = self.colors[0] | self.colors[1]
+        key = mg = eg = phase = 0
+        for square, code in enumerate(self.mailbox):
+            if code:
+                color, piece_type = code >> 3, code & 7
+                key ^= PIECE_KEYS[color][piece_type][square]
+                mg += MG_TABLE[color][piece_type][square]
+                eg += EG_TABLE[color][piece_type][square]
+                phase += PHASE_WEIGHTS[piece_type]
+        key ^= CASTLE_KEYS[self.castling]
+        if self.ep:
+            key ^= EP_KEYS[self.ep & 7]
+        if self.turn:
+            key ^= TURN_KEY
+        self.key, self.mg, self.eg, self.phase = key, mg, eg, phase
+
+    # -- queries ------------------------------------------------------------
+
+    def piece_type_at(self, square):
+        return self.mailbox[square] & 7
+
+    def color_at(self, square):
+        code = self.mailbox[square]
+        return code >> 3 if code else None
+
+    def is_capture(self, move):
+        to = move >> 6 & 63
+        return bool(self.mailbox[to]) or (to == self.ep != 0 and self.mailbox[move & 63] & 7 == PAWN)
+
+    def attackers(self, color, square, occupied=None):
+        """Bitboard of `color` pieces attacking `square`."""
+        if occupied is None:
+            occupied = self.occupied
+        bb = self.bitboards
+        base = WHITE_PIECE if color else 0
+        queens = bb[base + QUEEN]
+        return ((PAWN_ATTACKS[1 - color][square] & bb[base + PAWN]) |
+                (KNIGHT_ATTACKS[square] & bb[base + KNIGHT]) |
+                (KING_ATTACKS[square] & bb[base + KING]) |
+                (bishop_attacks(square, occupied) & (bb[base + BISHOP] | queens)) |
+                (rook_attacks(square, occupied) & (bb[base + ROOK] | queens))) & occupied
+
+    def see(self, move):
+        """Static exchange evaluation: material won by `move` once all captures on its square are played out.
+
+        Both sides recapture with their least valuable attacker and may stop
+        whenever going on would lose material. Removing each capturer from
+        the occupancy uncovers the sliders behind it (x-rays). Pins are
+        ignored, and a king only recaptures onto an undefended square.
+        """
+        frm = move & 63
+        to = move >> 6 & 63
+        promotion = move >> 12
+        mailbox = self.mailbox
+        bb = self.bitboards
+        colors = self.colors
+        attacker = mailbox[frm] & 7
+        occupied = self.occupied ^ (1 << frm)
+        captured = mailbox[to] & 7
+        if not captured and attacker == PAWN and to == self.ep != 0:
+            captured = PAWN
+            occupied ^= 1 << (to - 8 if self.turn else to + 8)
+        gains = [SEE_VALUES[captured]]
+        # Value of the piece standing on the square, the next one to be taken
+        on_square = SEE_VALUES[attacker]
+        if promotion:
+            gains[0] += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+            on_square = SEE_VALUES[promotion]
+
+        diagonal = bb[BISHOP] | bb[BISHOP + WHITE_PIECE] | bb[QUEEN] | bb[QUEEN + WHITE_PIECE]
+        straight = bb[ROOK] | bb[ROOK + WHITE_PIECE] | bb[QUEEN] | bb[QUEEN + WHITE_PIECE]
+        attackers = (self.attackers(1, to, occupied) | self.attackers(0, to, occupied)) & occupied
+        color = 1 - self.turn
+        while True:
+            ours = attackers & colors[color]
+            if not ours:
+                break
+            base = WHITE_PIECE if color else 0
+            for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+                candidates = ours & bb[base + piece_type]
+                if candidates:
+                    break
+            if piece_type == KING and attackers & colors[1 - color]:
+                break
+            gains.append(on_square - gains[-1])
+            on_square = SEE_VALUES[piece_type]
+            occupied ^= candidates & -candidates
+            attackers |= (bishop_attacks(to, occupied) & diagonal) | (rook_attacks(to, occupied) & straight)
+            attackers &= occupied
+            color = 1 - color
+
+        # Each side picks the better of stopping and capturing, from the last capture back
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+
+    def is_attacked(self, color, square):
+        """True if `color` attacks `square`."""
+        bb = self.bitboards
+        base = WHITE_PIECE if color else 0
+        if PAWN_ATTACKS[1 - color][square] & bb[base + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[square] & bb[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[square] & bb[base + KING]:
+            return True
+        occupied = self.occupied
+        queens = bb[base + QUEEN]
+        if bishop_attacks(square, occupied) & (bb[base + BISHOP] | queens):
+            return True
+        return bool(rook_attacks(square, occupied) & (bb[base + ROOK] | queens))
+
+    def king_square(self, color):
+        return self.bitboards[KING + (WHITE_PIECE if color else 0)].bit_length() - 1
+
+    def is_check(self):
+        """Is the side to move in check?"""
+        return self.is_attacked(1 - self.turn, self.king_square(self.turn))
+
+    def was_legal(self):
+        """After `make`: did the side that just moved leave its king safe?"""
+        return not self.is_attacked(self.turn, self.king_square(1 - self.turn))
+
+    def is_repetition(self):
+        """Has the current position occurred before, in the game or the search?"""
+        return self.repetitions[self.key] > 1
+
+    def is_insufficient_material(self):
+        bb = self.bitboards
+        if bb[PAWN] | bb[PAWN + 8] | bb[ROOK] | bb[ROOK + 8] | bb[QUEEN] | bb[QUEEN + 8]:
+            return False
+        minors = bb[KNIGHT] | bb[KNIGHT + 8] | bb[BISHOP] | bb[BISHOP + 8]
+        if minors & (minors - 1) == 0:
+            return True
+        bishops = bb[BISHOP] | bb[BISHOP + 8]
+        dark = 0xAA55AA55AA55AA55
+        return minors == bishops and (bishops & dark == 0 or bishops & ~dark == 0)
+
+    # -- move generation -------------------------------------------------------
+
+    def pseudo_legal_moves(self, captures_only=False):
+        """Moves that obey piece movement but may leave the own king in check.
+
+        With `captures_only` quiet moves are skipped, queen promotions are kept.
+        """
+        moves = []
+        append = moves.append
+        us = self.turn
+        bb = self.bitboards
+        base = WHITE_PIECE if us else 0
+        own = self.colors[us]
+        opp = self.colors[1 - us]
+        occupied = self.occupied
+        targets = opp if captures_only else ~own & M64
+
+        # Pawns
+        pawns = bb[base + PAWN]
+        if us:
+            single = (pawns << 8) & ~occupied & M64
+            double = ((single & RANK_3) << 8) & ~occupied
+            left = (pawns << 7) & ~FILE_H & opp
+            right = (pawns << 9) & ~FILE_A & opp
+            forward, promotion_rank = 8, RANK_8
+        else:
+            single = (pawns >> 8) & ~occupied
+            double = ((single & RANK_6) >> 8) & ~occupied
+            left = (pawns >> 9) & ~FILE_H & opp
+            right = (pawns >> 7) & ~FILE_A & opp
+            forward, promotion_rank = -8, RANK_1
+        for step, dests in ((forward, single), (forward - 1, left), (forward + 1, right)):
+            quiet = step == forward
+            while dests:
+                lsb = dests & -dests
+                to = lsb.bit_length() - 1
+                dests ^= lsb
+                move = (to - step) | to << 6
+                if lsb & promotion_rank:
+                    if captures_only and quiet:
+                        append(move | QUEEN << 12)
+                    else:
+                        for piece_type in PROMOTIONS:
+                            append(move | piece_type << 12)
+                elif not (captures_only and quiet):
+                    append(move)
+        if not captures_only:
+            while double:
+                lsb = double & -double
+                to = lsb.bit_length() - 1
+                double ^= lsb
+                append((to - 2 * forward) | to << 6)
+        if self.ep:
+            attackers = PAWN_ATTACKS[1 - us][self.ep] & pawns
+            while attackers:
+                lsb = attackers & -attackers
+                attackers ^= lsb
+                append((lsb.bit_length() - 1) | self.ep << 6)
+
+        # Pieces
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            pieces = bb[base + piece_type]
+            while pieces:
+                lsb = pieces & -pieces
+                frm = lsb.bit_length() - 1
+                pieces ^= lsb
+                if piece_type == KNIGHT:
+                    dests = KNIGHT_ATTACKS[frm]
+                elif piece_type == BISHOP:
+                    dests = bishop_attacks(frm, occupied)
+                elif piece_type == ROOK:
+                    dests = rook_attacks(frm, occupied)
+                elif piece_type == QUEEN:
+                    dests = bishop_attacks(frm, occupied) | rook_attacks(frm, occupied)
+                else:
+                    dests = KING_ATTACKS[frm]
+                dests &= targets
+                while dests:
+                    lsb = dests & -dests
+                    dests ^= lsb
+                    append(frm | (lsb.bit_length() - 1) << 6)
+
+        # Castling: path empty, king not in check and not passing an attacked square
+        if not captures_only and self.castling:
+            them = 1 - us
+            if us:
+                if (self.castling & CASTLE_WK and not occupied & 0x60 and
+                        not self.is_attacked(them, chess.E1) and not self.is_attacked(them, chess.F1)):
+                    append(chess.E1 | chess.G1 << 6)
+                if (self.castling & CASTLE_WQ and not occupied & 0x0E and
+                        not self.is_attacked(them, chess.E1) and not self.is_attacked(them, chess.D1)):
+                    append(chess.E1 | chess.C1 << 6)
+            else:
+                if (self.castling & CASTLE_BK and not occupied & (0x60 << 56) and
+                        not self.is_attacked(them, chess.E8) and not self.is_attacked(them, chess.F8)):
+                    append(chess.E8 | chess.G8 << 6)
+                if (self.castling & CASTLE_BQ and not occupied & (0x0E << 56) and
+                        not self.is_attacked(them, chess.E8) and not self.is_attacked(them, chess.D8)):
+                    append(chess.E8 | chess.C8 << 6)
+        return moves
+
+    def pinned(self, color):
+        """Pieces of `color` pinned to their king by an enemy slider."""
+        king = self.king_square(color)
+        bb = self.bitboards
+        base = 0 if color else WHITE_PIECE
+        queens = bb[base + QUEEN]
+        snipers = ((rook_attacks(king, 0) & (bb[base + ROOK] | queens)) |
+                   (bishop_attacks(king, 0) & (bb[base + BISHOP] | queens)))
+        pinned = 0
+        occupied = self.occupied
+        while snipers:
+            lsb = snipers & -snipers
+            snipers ^= lsb
+            blockers = BETWEEN[king][lsb.bit_length() - 1] & occupied
+            if blockers and blockers & (blockers - 1) == 0:
+                pinned |= blockers & self.colors[color]
+        return pinned
+
+    def legal_moves(self):
+        """All legal moves; only king moves, pinned pieces, en passant and
+        check evasions are verified by making them."""
+        us = self.turn
+        king = self.king_square(us)
+        in_check = self.is_attacked(1 - us, king)
+        pinned = self.pinned(us)
+        ep = self.ep
+        mailbox = self.mailbox
+        moves = []
+        for move in self.pseudo_legal_moves():
+            frm = move & 63
+            if (in_check or frm == king or pinned >> frm & 1 or
+                    (ep and move >> 6 & 63 == ep and mailbox[frm] & 7 == PAWN)):
+                self.make(move)
+                if self.was_legal():
+                    moves.append(move)
+                self.unmake(move)
+            else:
+                moves.append(move)
+        return moves
+
+    def is_legal(self, move):
+        """Check a move from outside the generator, e.g. a hash move."""
+        return move in self.pseudo_legal_moves() and self._leaves_king_safe(move)
+
+    def _leaves_king_safe(self, move):
+        self.make(move)
+        legal = self.was_legal()
+        self.unmake(move)
+        return legal
+
+    # -- make / unmake ---------------------------------------------------------
+
+    def make(self, move):
+        frm = move & 63
+        to = move >> 6 & 63
+        promotion = move >> 12
+        mailbox = self.mailbox
+        bb = self.bitboards
+        colors = self.colors
+        us = self.turn
+        them = 1 - us
+        code = mailbox[frm]
+        piece_type = code & 7
+        captured = mailbox[to]
+        from_bit = 1 << frm
+        to_bit = 1 << to
+
+        ply = self.ply
+        self.undo_captured[ply] = captured
+        self.undo_castling[ply] = self.castling
+        self.undo_ep[ply] = self.ep
+        self.undo_halfmove[ply] = self.halfmove
+        self.undo_key[ply] = self.key
+        self.undo_mg[ply] = self.mg
+        self.undo_eg[ply] = self.eg
+        self.undo_phase[ply] = self.phase
+        self.ply = ply + 1
+
+        key = self.key ^ TURN_KEY ^ CASTLE_KEYS[self.castling]
+        if self.ep:
+            key ^= EP_KEYS[self.ep & 7]
+        own_keys = PIECE_KEYS[us]
+        mg_own = MG_TABLE[us]
+        eg_own = EG_TABLE[us]
+        mg, eg = self.mg, self.eg
+
+        if captured:
+            captured_type = captured & 7
+            bb[captured] ^= to_bit
+            colors[them] ^= to_bit
+            key ^= PIECE_KEYS[them][captured_type][to]
+            mg -= MG_TABLE[them][captured_type][to]
+            eg -= EG_TABLE[them][captured_type][to]
+            self.phase -= PHASE_WEIGHTS[captured_type]
+
+        # Move the piece, swapping in the promoted piece if any
+        bb[code] ^= from_bit
+        placed = promotion or piece_type
+        placed_code = placed | (code & WHITE_PIECE)
+        bb[placed_code] ^= to_bit
+        colors[us] ^= from_bit | to_bit
+        mailbox[frm] = 0
+        mailbox[to] = placed_code
+        key ^= own_keys[piece_type][frm] ^ own_keys[placed][to]
+        mg += mg_own[placed][to] - mg_own[piece_type][frm]
+        eg += eg_own[placed][to] - eg_own[piece_type][frm]
+        if promotion:
+            self.phase += PHASE_WEIGHTS[promotion]
+
+        new_ep = 0
+        if piece_type == PAWN:
+            self.halfmove = 0
+            if to == self.ep and to:
+                captured_square = to - 8 if us else to + 8
+                captured_code = PAWN | (0 if us else WHITE_PIECE)
+                captured_bit = 1 << captured_square
+                bb[captured_code] ^= captured_bit
+                colors[them] ^= captured_bit
+                mailbox[captured_square] = 0
+                key ^= PIECE_KEYS[them][PAWN][captured_square]
+                mg -= MG_TABLE[them][PAWN][captured_square]
+                eg -= EG_TABLE[them][PAWN][captured_square]
+            elif to - frm == 16 or frm - to == 16:
+                ep_square = (frm + to) >> 1
+                # Only remember en passant squares that can actually be used
+                if PAWN_ATTACKS[us][ep_square] & bb[PAWN | (0 if us else WHITE_PIECE)]:
+                    new_ep = ep_square
+                    key ^= EP_KEYS[ep_square & 7]
+        elif captured:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+            if piece_type == KING and (to - frm == 2 or frm - to == 2):
+                rook_from, rook_to = CASTLE_ROOKS[to]
+                rook_code = ROOK | (code & WHITE_PIECE)
+                rook_bits = 1 << rook_from | 1 << rook_to
+                bb[rook_code] ^= rook_bits
+                colors[us] ^= rook_bits
+                mailbox[rook_from] = 0
+                mailbox[rook_to] = rook_code
+                key ^= own_keys[ROOK][rook_from] ^ own_keys[ROOK][rook_to]
+                mg += mg_own[ROOK][rook_to] - mg_own[ROOK][rook_from]
+                eg += eg_own[ROOK][rook_to] - eg_own[ROOK][rook_from]
+
+        self.castling &= CASTLE_MASK[frm] & CASTLE_MASK[to]
+        self.ep = new_ep
+        if not us:
+            self.fullmove += 1
+        self.turn = them
+        self.occupied = colors[0] | colors[1]
+        key ^= CASTLE_KEYS[self.castling]
+        self.key = key
+        self.mg, self.eg = mg, eg
+        repetitions = self.repetitions
+        repetitions[key] = repetitions.get(key, 0) + 1
+
+    def unmake(self, move):
+        repetitions = self.repetitions
+        key = self.key
+        count = repetitions[key] - 1
+        # Dropped at zero, so the table holds only the game and the current line
+        if count:
+            repetitions[key] = count
+        else:
+            del repetitions[key]
+        ply = self.ply - 1
+        self.ply = ply
+        frm = move & 63
+        to = move >> 6 & 63
+        mailbox = self.mailbox
+        bb = self.bitboards
+        colors = self.colors
+        them = self.turn
+        us = 1 - them
+        self.turn = us
+        if not us:
+            self.fullmove -= 1
+
+        placed_code = mailbox[to]
+        code = PAWN | (placed_code & WHITE_PIECE) if move >> 12 else placed_code
+        captured = self.undo_captured[ply]
+        from_bit = 1 << frm
+        to_bit = 1 << to
+
+        bb[placed_code] ^= to_bit
+        bb[code] ^= from_bit
+        colors[us] ^= from_bit | to_bit
+        mailbox[frm] = code
+        mailbox[to] = captured
+        if captured:
+            bb[captured] ^= to_bit
+            colors[them] ^= to_bit
+
+        piece_type = code & 7
+        ep = self.undo_ep[ply]
+        if piece_type == PAWN and to == ep and ep:
+            captured_square = to - 8 if us else to + 8
+            captured_code = PAWN | (0 if us else WHITE_PIECE)
+            captured_bit = 1 << captured_square
+            bb[captured_code] ^= captured_bit
+            colors[them] ^= captured_bit
+            mailbox[captured_square] = captured_code
+        elif piece_type == KING and (to - frm == 2 or frm - to == 2):
+            rook_from, rook_to = CASTLE_ROOKS[to]
+            rook_code = ROOK | (code & WHITE_PIECE)
+            rook_bits = 1 << rook_from | 1 << rook_to
+            bb[rook_code] ^= rook_bits
+            colors[us] ^= rook_bits
+            mailbox[rook_to] = 0
+            mailbox[rook_from] = rook_code
+
+        self.occupied = colors[0] | colors[1]
+        self.castling = self.undo_castling[ply]
+        self.ep = ep
+        self.halfmove = self.undo_halfmove[ply]
+        self.key = self.undo_key[ply]
+        self.mg = self.undo_mg[ply]
+        self.eg = self.undo_eg[ply]
+        self.phase = self.undo_phase[ply]
+
+    def perft(self, depth):
+        """Count leaf nodes of the legal move tree `depth` plies deep."""
+        moves = self.legal_moves()
+        if depth <= 1:
+            return len(moves) if depth == 1 else 1
+        nodes = 0
+        for move in moves:
+            self.make(move)
+            nodes += self.perft(depth - 1)
+            self.unmake(move)
+        return nodes
@@ -0,0 +1,397 @@
+"""
+Headless game server hosting many human-vs-bot games at once.
+
+    python Bot/server.py serve [--port 8765] [--workers 8]
+    python Bot/server.py load --games 200 [--level hard] [--budget 20]
+
+`serve` listens on a local TCP port. Clients talk JSON, one object per line;
+one connection can hold any number of games:
+
+    {"cmd": "new", "level": "hard", "color": "white", "budget": 60, "increment": 0}
+        -> {"event": "new", "game": 7, "fen": ...}
+    {"cmd": "move", "game": 7, "move": "e2e4"}
+        -> {"event": "bot_move", "game": 7, "move": "e7e5", "fen": ..., "latency_ms": 812.5}
+    {"cmd": "close", "game": 7}
+    {"cmd": "stats"}
+        -> {"event": "stats", "games": 180, "queue": 3, "searching": 8, "p50_ms": ..., ...}
+
+`color` is the human's side; when it is black the bot's first move follows
+the "new" reply. A move that ends the game comes with "result" and
+"termination". Errors are answered with {"event": "error", "message": ...}.
+
+Every game is a `Game` object; nothing about a game lives in globals. The
+bot's moves are searched in one `ProcessPoolExecutor` shared by all games.
+A game waits for at most one bot move at a time, so the request queue,
+served in order by one dispatcher per worker, takes the games in turn and
+none can starve another. Each game has its own time budget for the bot
+(`budget` seconds plus `increment` per move, like a chess clock), which
+every search gets a share of, so a long game doesn't take more than its
+part of the pool. A request whose game is closed meanwhile is skipped.
+
+The server logs the games in flight, the queue depth, the busy workers and
+the p50/p99 move latency (from the human's move arriving to the bot's
+reply being sent) every `--report-every` seconds; "stats" returns the
+same. `load` plays many games at once against a running server, the human
+side moving at random after a random think time, and prints the latencies
+it saw and the server's stats, e.g. to find how many games one machine can
+host at a given latency.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import signal
+import sys
+import time
+
+import chess
+
+from book import DEFAULT_PATH as BOOK_PATH, OpeningBook
+from engine import Engine
+from levels import LEVELS, choose_move
+from parallel import process_pool, worker_state
+from tablebase import DIRECTORY as TABLEBASE_DIR, Tablebases
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.game import GameBoard, outcome  # noqa: E402
+
+# Share of the remaining budget a search gets, and the least it gets once
+# the budget is spent
+MOVES_TO_GO = 30
+MIN_MOVETIME = 0.05
+# Move latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+
+def _init_worker(hash_mb, book_path, tablebase_dir):
+    # Ctrl-C is for the server process, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    tablebases = Tablebases(tablebase_dir) if tablebase_dir else None
+    worker_state['engine'] = Engine(hash_mb=hash_mb, tablebases=tablebases)
+    worker_state['book'] = OpeningBook(book_path) if book_path else None
+
+
+def _bot_move(fen, moves, level, movetime):
+    """(move, seconds spent, nodes) for the position after `moves` from `fen`."""
+    engine = worker_state['engine']
+    board = GameBoard(fen)
+    for uci in moves:
+        board.push_uci(uci)
+    start = time.perf_counter()
+    move, source = choose_move(engine, board, level, book=worker_state['book'], overrides={'movetime': movetime})
+    return move.uci() if move else None, time.perf_counter() - start, engine.nodes if source == 'search' else 0
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Game:
+    def __init__(self, game_id, writer, level, bot_color, budget, increment):
+        self.id = game_id
+        self.writer = writer
+        self.board = GameBoard()
+        self.level = level
+        self.bot_color = bot_color
+        self.clock = budget
+        self.increment = increment
+        # When the bot was asked to move, for the latency
+        self.asked = None
+        self.closed = False
+
+    def movetime(self):
+        """The bot's share of its remaining budget for the next move."""
+        return max(MIN_MOVETIME, self.clock / MOVES_TO_GO + self.increment)
+
+    def result(self):
+        """{'result', 'termination'} once the game is over, else None."""
+        end = outcome(self.board)
+        if end is None:
+            return None
+        return {'result': end.result(), 'termination': end.termination.name.lower()}
+
+
+class GameServer:
+    def __init__(self, workers, hash_mb=32, book_path=None, tablebase_dir=None):
+        self.workers = workers
+        self.executor = process_pool(workers, _init_worker, (hash_mb, book_path, tablebase_dir))
+        self.games = {}
+        self.next_id = 1
+        self.queue = asyncio.Queue()
+        self.searching = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.moves = 0
+        self.nodes = 0
+        self.started = time.perf_counter()
+
+    async def serve(self, host, port, report_every):
+        dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self._connection, host, port, limit=1 << 16)
+        print(f"serving on {host}:{port} with {self.workers} workers", file=sys.stderr)
+        try:
+            async with server:
+                while True:
+                    await asyncio.sleep(report_every)
+                    self.log()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def log(self):
+        stats = self.stats()
+        print(f"{stats['games']} games, queue {stats['queue']}, searching {stats['searching']}, "
+              f"p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, {stats['moves_per_s']} moves/s",
+              file=sys.stderr)
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+        p50, p99 = percentile(ordered, 0.5), percentile(ordered, 0.99)
+        elapsed = time.perf_counter() - self.started
+        return {
+            'event': 'stats', 'games': len(self.games), 'queue': self.queue.qsize(),
+            'searching': self.searching, 'workers': self.workers, 'moves': self.moves, 'nodes': self.nodes,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+            'moves_per_s': round(self.moves / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    async def _connection(self, reader, writer):
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.send(writer, {'event': 'error', 'message': "not JSON"})
+                    continue
+                reply = self.handle(message, writer, owned)
+                if reply is not None:
+                    self.send(writer, reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in owned:
+                self.close(game_id)
+            writer.close()
+
+    def send(self, writer, message):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b'\n')
+
+    def handle(self, message, writer, owned):
+        """Carry out one client message; returns the reply, if any."""
+        command = message.get('cmd') if isinstance(message, dict) else None
+        if command == 'stats':
+            return self.stats()
+        if command == 'new':
+            return self.new_game(message, writer, owned)
+        if command in ('move', 'close'):
+            game = self.games.get(message.get('game'))
+            if game is None or game.id not in owned:
+                return {'event': 'error', 'game': message.get('game'), 'message': "no such game"}
+            if command == 'close':
+                self.close(game.id)
+                owned.discard(game.id)
+                return None
+            return self.human_move(game, message.get('move'))
+        return {'event': 'error', 'message': f"unknown command {command!r}"}
+
+    def new_game(self, message, writer, owned):
+        level = message.get('level', 'hard')
+        if level not in LEVELS:
+            return {'event': 'error', 'message': f"unknown level {level!r}"}
+        try:
+            budget = float(message.get('budget', 60))
+            increment = float(message.get('increment', 0))
+        except (TypeError, ValueError):
+            return {'event': 'error', 'message': "budget and increment are seconds"}
+        human = chess.BLACK if message.get('color') == 'black' else chess.WHITE
+        game = Game(self.next_id, writer, level, not human, budget, increment)
+        self.next_id += 1
+        self.games[game.id] = game
+        owned.add(game.id)
+        self.send(writer, {'event': 'new', 'game': game.id, 'fen': game.board.fen()})
+        if game.bot_color == chess.WHITE:
+            self.ask_bot(game)
+        return None
+
+    def human_move(self, game, uci):
+        board = game.board
+        if board.turn == game.bot_color or game.asked is not None:
+            return {'event': 'error', 'game': game.id, 'message': "not your turn"}
+        try:
+            move = chess.Move.from_uci(uci)
+        except (TypeError, ValueError):
+            move = None
+        if move is None or not board.is_legal(move):
+            return {'event': 'error', 'game': game.id, 'message': f"illegal move {uci!r}"}
+        board.push(move)
+        result = game.result()
+        if result is not None:
+            self.close(game.id)
+            return dict(event='over', game=game.id, **result)
+        self.ask_bot(game)
+        return None
+
+    def ask_bot(self, game):
+        game.asked = time.perf_counter()
+        self.queue.put_nowait(game)
+
+    def close(self, game_id):
+        game = self.games.pop(game_id, None)
+        if game is not None:
+            game.closed = True
+
+    async def _dispatch(self):
+        """Feed the queued bot moves to the pool; one of these runs per worker."""
+        loop = asyncio.get_running_loop()
+        while True:
+            game = await self.queue.get()
+            if game.closed:
+                continue
+            board = game.board
+            moves = [move.uci() for move in board.move_stack]
+            self.searching += 1
+            try:
+                uci, elapsed, nodes = await loop.run_in_executor(
+                    self.executor, _bot_move, board.root().fen(), moves, game.level, game.movetime())
+            except Exception as error:
+                # A dead worker breaks the pool, but the game is all this dispatcher can end
+                self.send(game.writer, {'event': 'error', 'game': game.id, 'message': f"bot failed: {error!r}"})
+                self.close(game.id)
+                continue
+            finally:
+                self.searching -= 1
+            if game.closed:
+                continue
+            game.clock += game.increment - elapsed
+            board.push_uci(uci)
+            latency = time.perf_counter() - game.asked
+            game.asked = None
+            self.latencies.append(latency)
+            self.moves += 1
+            self.nodes += nodes
+            reply = {'event': 'bot_move', 'game': game.id, 'move': uci, 'fen': board.fen(),
+                     'latency_ms': round(latency * 1000, 1), 'budget': round(game.clock, 3)}
+            result = game.result()
+            if result is not None:
+                reply.update(result)
+                self.close(game.id)
+            self.send(game.writer, reply)
+
+
+async def play_one(host, port, level, budget, plies, think, rng, latencies):
+    """Play one game against the server, the human side moving at random."""
+    reader, writer = await asyncio.open_connection(host, port)
+    human = rng.choice([chess.WHITE, chess.BLACK])
+    board = chess.Board()
+    writer.write(json.dumps({'cmd': 'new', 'level': level, 'color': 'white' if human else 'black',
+                             'budget': budget}).encode() + b'\n')
+    game_id = None
+    sent = None
+    try:
+        while True:
+            message = json.loads(await reader.readline())
+            if message['event'] == 'new':
+                game_id = message['game']
+            elif message['event'] == 'bot_move':
+                latencies.append(time.perf_counter() - sent if sent is not None else message['latency_ms'] / 1000)
+                board.push_uci(message['move'])
+            elif message['event'] == 'over':
+                break
+            else:
+                raise RuntimeError(message)
+            if 'result' in message or board.ply() >= plies:
+                break
+            if board.turn == human:
+                await asyncio.sleep(rng.uniform(*think))
+                move = rng.choice(list(board.legal_moves))
+                board.push(move)
+                sent = time.perf_counter()
+                writer.write(json.dumps({'cmd': 'move', 'game': game_id, 'move': move.uci()}).encode() + b'\n')
+        writer.write(json.dumps({'cmd': 'close', 'game': game_id}).encode() + b'\n')
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"cmd": "stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+async def load(args):
+    rng = random.Random(args.seed)
+    latencies = []
+    start = time.perf_counter()
+
+    async def staggered(index):
+        # Spread the starts so the games don't all ask at the same moment
+        await asyncio.sleep(rng.uniform(0, args.ramp))
+        await play_one(args.host, args.port, args.level, args.budget, args.plies, args.think,
+                       random.Random(rng.random()), latencies)
+
+    await asyncio.gather(*(staggered(index) for index in range(args.games)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    line = f"{args.games} games, {len(latencies)} bot moves in {elapsed:.1f}s"
+    if ordered:
+        line += (f", client-side latency p50 {percentile(ordered, 0.5) * 1000:.1f} ms, "
+                 f"p99 {percentile(ordered, 0.99) * 1000:.1f} ms, max {ordered[-1] * 1000:.1f} ms")
+    print(line)
+    print("server:", json.dumps(await server_stats(args.host, args.port)))
+
+
+def serve(args):
+    book_path = args.book if args.book and os.path.exists(args.book) else None
+    tablebase_dir = args.tablebases if args.tablebases and os.path.isdir(args.tablebases) else None
+
+    async def main():
+        server = GameServer(args.workers, args.hash, book_path, tablebase_dir)
+        await server.serve(args.host, args.port, args.report_every)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many human-vs-bot games at once, or load-test a server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="run the server")
+    serve_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes (default: all cores)")
+    serve_parser.add_argument('--hash', type=int, default=32, help="transposition table per worker, MB")
+    serve_parser.add_argument('--report-every', type=float, default=10.0, help="seconds between stats lines")
+    serve_parser.add_argument('--book', default=BOOK_PATH)
+    serve_parser.add_argument('--tablebases', default=TABLEBASE_DIR)
+    load_parser = commands.add_parser('load', help="play many games against a running server")
+    load_parser.add_argument('--games', type=int, default=100)
+    load_parser.add_argument('--level', choices=list(LEVELS), default='hard')
+    load_parser.add_argument('--budget', type=float, default=20.0, help="the bot's seconds per game")
+    load_parser.add_argument('--plies', type=int, default=40, help="plies after which a game is left")
+    load_parser.add_argument('--think', type=float, nargs=2, default=(0.5, 3.0), metavar=('MIN', 'MAX'),
+                             help="seconds the random human thinks per move")
+    load_parser.add_argument('--ramp', type=float, default=5.0, help="seconds over which the games start")
+    load_parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args)
+    else:
+        asyncio.run(load(args))
@@ -0,0 +1,458 @@
+"""
+Endgame tablebases for up to 4 pieces, generated locally by retrograde analysis.
+
+A table covers one material signature such as "KQvK" or "KRvKP" (stronger
+side first) with either side to move. Every position has a perfect index
+
+    index = side to move << 6n | square of piece n-1 << 6(n-1) | ... | square of piece 0
+
+with the pieces in signature order (white king, white pieces, black king,
+black pieces). Each index holds one signed byte from the side to move's
+point of view, which is both its win/draw/loss and its distance to mate:
+0 is a draw (or an impossible position), +d a win that mates in d plies,
+-(d + 1) a loss that gets mated in d plies. Positions with the colours the
+other way round are looked up on the vertically mirrored board.
+
+Generation works backwards from the checkmates one ply at a time: a
+position with a move into a lost position is won, a position whose every
+move leads into won positions is lost, and whatever is left at the end is
+drawn. Captures and promotions leave the table and take their value from the
+smaller tables, so those have to exist first (`generation_order`). Tables
+are written to `<directory>/<signature>.tb` and memory-mapped for probing,
+so they cost no memory until touched. En passant is not modelled: positions
+with castling rights or a legal en passant capture are never probed.
+
+    python Bot/tablebase.py [--dir DIR] [--four] [--check N] [SIGNATURE ...]
+
+generates all 3-piece tables (plus every 4-piece one with --four, which
+takes a long while in pure Python) or just the given signatures, and with
+--check plays N random positions out perfectly to verify the distances.
+"""
+
+import mmap
+import os
+import sys
+import time
+from array import array
+
+import chess
+
+from position import (KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, WHITE_PIECE,
+                      bishop_attacks, rook_attacks)
+
+MAGIC = b'PYTB\x01'
+HEADER = 16
+MAX_DISTANCE = 126
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+
+PIECE_ORDER = 'KQRBNP'
+STRENGTH = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+
+# Material that can never mate needs no table
+TRIVIAL_DRAWS = {'KvK', 'KBvK', 'KNvK'}
+
+ALL_3 = ['KQvK', 'KRvK', 'KPvK']
+ALL_4 = ['KQQvK', 'KQRvK', 'KQBvK', 'KQNvK', 'KRRvK', 'KRBvK', 'KRNvK', 'KBBvK', 'KBNvK', 'KNNvK',
+         'KQvKQ', 'KQvKR', 'KQvKB', 'KQvKN', 'KRvKR', 'KRvKB', 'KRvKN', 'KBvKB', 'KBvKN', 'KNvKN',
+         'KQPvK', 'KRPvK', 'KBPvK', 'KNPvK', 'KQvKP', 'KRvKP', 'KBvKP', 'KNvKP', 'KPPvK', 'KPvKP']
+
+
+def signature_of(white, black):
+    """Canonical signature of two lists of piece letters, and whether colours are swapped."""
+    white = ''.join(sorted(white, key=PIECE_ORDER.index))
+    black = ''.join(sorted(black, key=PIECE_ORDER.index))
+    white_strength = (len(white), sorted((STRENGTH[letter] for letter in white), reverse=True))
+    black_strength = (len(black), sorted((STRENGTH[letter] for letter in black), reverse=True))
+    if black_strength > white_strength:
+        return f'{black}v{white}', True
+    return f'{white}v{black}', False
+
+
+def parse_signature(signature):
+    """'KQvKR' -> [(WHITE, 'K'), (WHITE, 'Q'), (BLACK, 'K'), (BLACK, 'R')]"""
+    white, black = signature.split('v')
+    return [(chess.WHITE, letter) for letter in white] + [(chess.BLACK, letter) for letter in black]
+
+
+def generation_order(signatures):
+    """Fewer pieces first, then fewer pawns, so captures and promotions find their table."""
+    return sorted(signatures, key=lambda signature: (len(signature) - 1, signature.count('P')))
+
+
+def _attacks(letter, color, square, occupied):
+    if letter == 'K':
+        return KING_ATTACKS[square]
+    if letter == 'N':
+        return KNIGHT_ATTACKS[square]
+    if letter == 'P':
+        return PAWN_ATTACKS[color][square]
+    if letter == 'B':
+        return bishop_attacks(square, occupied)
+    if letter == 'R':
+        return rook_attacks(square, occupied)
+    return bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+
+
+def _attacked(square, pieces, squares, by_color, occupied, captured=-1):
+    bit = 1 << square
+    for i, (color, letter) in enumerate(pieces):
+        if color == by_color and i != captured and _attacks(letter, color, squares[i], occupied) & bit:
+            return True
+    return False
+
+
+class Table:
+    def __init__(self, signature, data, offset=0):
+        self.signature = signature
+        self.pieces = parse_signature(signature)
+        self.n = len(self.pieces)
+        self.data = data
+        self.offset = offset
+
+    def value(self, index):
+        value = self.data[self.offset + index]
+        return value - 256 if value > 127 else value
+
+
+class Tablebases:
+    """Every table found in `directory`, memory-mapped."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+        self.max_pieces = 0
+        self.probes = 0
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.tb'):
+                    self._open(os.path.join(directory, name))
+
+    def __len__(self):
+        return len(self.tables)
+
+    def _open(self, path):
+        file = open(path, 'rb')
+        if file.seek(0, 2) <= HEADER:
+            file.close()
+            return
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC:
+            data.close()
+            file.close()
+            return
+        signature = data[len(MAGIC):HEADER].rstrip(b'\0').decode()
+        self.files.append((file, data))
+        self.add(Table(signature, data, HEADER))
+
+    def add(self, table):
+        self.tables[table.signature] = table
+        self.max_pieces = max(self.max_pieces, table.n)
+
+    def close(self):
+        self.tables = {}
+        self.max_pieces = 0
+        for file, data in self.files:
+            data.close()
+            file.close()
+        self.files = []
+
+    def probe_pieces(self, placed, turn):
+        """Table value of a list of (color, letter, square) with `turn` to move.
+
+        None when no table covers the material.
+        """
+        signature, mirrored = signature_of([letter for color, letter, _ in placed if color],
+                                           [letter for color, letter, _ in placed if not color])
+        if signature in TRIVIAL_DRAWS:
+            return 0
+        table = self.tables.get(signature)
+        if table is None:
+            return None
+        if mirrored:
+            placed = [(not color, letter, square ^ 56) for color, letter, square in placed]
+            turn = not turn
+        # Fill the table's slots in order; identical pieces may go either way round
+        index = int(turn) << 6 * table.n
+        free = list(placed)
+        for slot, (color, letter) in enumerate(table.pieces):
+            for i, piece in enumerate(free):
+                if piece[0] == color and piece[1] == letter:
+                    index |= piece[2] << 6 * slot
+                    del free[i]
+                    break
+        self.probes += 1
+        return table.value(index)
+
+    def probe(self, board):
+        """Table value of a `chess.Board`, None if it is not covered."""
+        if chess.popcount(board.occupied) > self.max_pieces:
+            return None
+        if board.castling_rights or board.has_legal_en_passant():
+            return None
+        placed = [(piece.color, piece.symbol().upper(), square)
+                  for square, piece in board.piece_map().items()]
+        return self.probe_pieces(placed, board.turn)
+
+    def probe_position(self, position):
+        """Table value of a `Position`, None if it is not covered."""
+        occupied = position.occupied
+        if occupied.bit_count() > self.max_pieces or position.castling or position.ep:
+            return None
+        mailbox = position.mailbox
+        placed = []
+        while occupied:
+            lsb = occupied & -occupied
+            occupied ^= lsb
+            square = lsb.bit_length() - 1
+            code = mailbox[square]
+            placed.append((bool(code & WHITE_PIECE), chess.PIECE_SYMBOLS[code & 7].upper(), square))
+        return self.probe_pieces(placed, position.turn)
+
+    def best_move(self, board):
+        """(move, value) of the tablebase-perfect move for `board`, or (None, None)."""
+        if self.probe(board) is None:
+            return None, None
+        best, best_key, best_value = None, None, None
+        for move in board.legal_moves:
+            board.push(move)
+            if board.is_checkmate():
+                value = -1
+            elif board.is_stalemate() or board.is_insufficient_material():
+                value = 0
+            else:
+                value = self.probe(board)
+            board.pop()
+            if value is None:
+                continue
+            # The opponent's value: mate them fastest, else draw, else lose slowest
+            key = (2, value) if value < 0 else (1, 0) if value == 0 else (0, value)
+            if best_key is None or key > best_key:
+                best, best_key, best_value = move, key, value
+        if best is None:
+            return None, None
+        if best_value < 0:
+            return best, -best_value
+        return best, -(best_value + 2) if best_value > 0 else 0
+
+
+def generate(signature, tablebases, directory=None, log=print):
+    """Build one table, add it to `tablebases` and write it to `directory`."""
+    start = time.perf_counter()
+    pieces = parse_signature(signature)
+    n = len(pieces)
+    side_shift = 6 * n
+    size = 2 << side_shift
+    kings = [pieces.index((chess.BLACK, 'K')), pieces.index((chess.WHITE, 'K'))]
+
+    values = array('b', bytes(size))
+    # 0 impossible, 1 unresolved, 2 resolved
+    state = bytearray(size)
+    # Moves of an unresolved position that are not yet known to lose
+    counter = bytearray(size)
+    # The position has a move out of the table that holds the draw
+    drawn = bytearray(size)
+    # Moves out of the table that win / lose, by distance
+    win_exits = {}
+    loss_exits = {}
+    frontier = []
+
+    for index in range(size):
+        side = bool(index >> side_shift)
+        squares = [(index >> 6 * i) & 63 for i in range(n)]
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        if occupied.bit_count() != n:
+            continue
+        if any(letter == 'P' and not 8 <= square < 56 for (_, letter), square in zip(pieces, squares)):
+            continue
+        if _attacked(squares[kings[not side]], pieces, squares, side, occupied):
+            continue
+        state[index] = 1
+
+        moves = 0
+        legal = 0
+        for i, (color, letter) in enumerate(pieces):
+            if color != side:
+                continue
+            origin = squares[i]
+            if letter == 'P':
+                forward = 8 if side else -8
+                targets = PAWN_ATTACKS[side][origin] & occupied
+                if not occupied >> (origin + forward) & 1:
+                    targets |= 1 << (origin + forward)
+                    if origin >> 3 == (1 if side else 6) and not occupied >> (origin + 2 * forward) & 1:
+                        targets |= 1 << (origin + 2 * forward)
+            else:
+                targets = _attacks(letter, color, origin, occupied)
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                target = bit.bit_length() - 1
+                captured = -1
+                if occupied & bit:
+                    captured = squares.index(target)
+                    if pieces[captured][0] == side:
+                        continue
+                after = list(squares)
+                after[i] = target
+                king = target if letter == 'K' else squares[kings[side]]
+                if _attacked(king, pieces, after, not side, occupied ^ (1 << origin) | bit, captured):
+                    continue
+                legal += 1
+                promotions = ('Q', 'R', 'B', 'N') if letter == 'P' and not 8 <= target < 56 else ()
+                if captured < 0 and not promotions:
+                    moves += 1
+                    continue
+                for promoted in promotions or (letter,):
+                    placed = [(c, promoted if j == i else l, after[j])
+                              for j, (c, l) in enumerate(pieces) if j != captured]
+                    value = tablebases.probe_pieces(placed, not side)
+                    if value is None:
+                        missing, _ = signature_of([l for c, l, _ in placed if c],
+                                                  [l for c, l, _ in placed if not c])
+                        raise ValueError(f"{signature} needs the {missing} table, generate it first")
+                    if value == 0:
+                        drawn[index] = 1
+                    elif value < 0:
+                        # The opponent gets mated in -value - 1 plies
+                        win_exits.setdefault(-value, []).append(index)
+                    else:
+                        moves += 1
+                        loss_exits.setdefault(value + 1, []).append(index)
+        if not legal:
+            state[index] = 2
+            if _attacked(squares[kings[side]], pieces, squares, not side, occupied):
+                values[index] = -1
+                frontier.append(index)
+            continue
+        counter[index] = moves
+
+    # Walk backwards from the mates, one ply of distance per round
+    level = 0
+    resolved = len(frontier)
+    while frontier or win_exits or loss_exits:
+        level += 1
+        if level > MAX_DISTANCE:
+            raise ValueError(f"{signature}: distance to mate does not fit in a byte")
+        found = []
+        for index in frontier:
+            lost = values[index] < 0
+            mover = not index >> side_shift
+            squares = [(index >> 6 * i) & 63 for i in range(n)]
+            occupied = 0
+            for square in squares:
+                occupied |= 1 << square
+            for i, (color, letter) in enumerate(pieces):
+                if color != mover:
+                    continue
+                square = squares[i]
+                if letter == 'P':
+                    back = -8 if mover else 8
+                    origin = square + back
+                    origins = 0
+                    if 8 <= origin < 56 and not occupied >> origin & 1:
+                        origins |= 1 << origin
+                        if square >> 3 == (3 if mover else 4) and not occupied >> (origin + back) & 1:
+                            origins |= 1 << (origin + back)
+                else:
+                    origins = _attacks(letter, color, square, occupied) & ~occupied
+                while origins:
+                    bit = origins & -origins
+                    origins ^= bit
+                    previous = index ^ (square ^ (bit.bit_length() - 1)) << 6 * i ^ 1 << side_shift
+                    if state[previous] != 1:
+                        continue
+                    if lost:
+                        state[previous] = 2
+                        values[previous] = level
+                        found.append(previous)
+                    else:
+                        counter[previous] -= 1
+                        if not counter[previous] and not drawn[previous]:
+                            state[previous] = 2
+                            values[previous] = -level - 1
+                            found.append(previous)
+        for index in win_exits.pop(level, ()):
+            if state[index] == 1:
+                state[index] = 2
+                values[index] = level
+                found.append(index)
+        for index in loss_exits.pop(level, ()):
+            if state[index] == 1:
+                counter[index] -= 1
+                if not counter[index] and not drawn[index]:
+                    state[index] = 2
+                    values[index] = -level - 1
+                    found.append(index)
+        resolved += len(found)
+        frontier = found
+
+    data = bytearray(MAGIC + signature.encode().ljust(HEADER - len(MAGIC), b'\0')) + values.tobytes()
+    tablebases.add(Table(signature, data, HEADER))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'{signature}.tb'), 'wb') as file:
+            file.write(data)
+    if log:
+        log(f"{signature:6} {size - state.count(0):10} positions, {resolved:10} decisive, "
+            f"longest mate {max(level - 1, 0):3} plies, {time.perf_counter() - start:7.1f}s")
+    return tablebases.tables[signature]
+
+
+def check(tablebases, signature, samples, rng):
+    """Play random positions of a table out perfectly and compare the mate distances."""
+    table = tablebases.tables[signature]
+    checked = 0
+    while checked < samples:
+        board = chess.Board(None)
+        for (color, letter), square in zip(table.pieces, rng.sample(range(64), table.n)):
+            board.set_piece_at(square, chess.Piece.from_symbol(letter if color else letter.lower()))
+        board.turn = rng.choice([chess.WHITE, chess.BLACK])
+        if not board.is_valid() or board.is_game_over():
+            continue
+        value = tablebases.probe(board)
+        plies = 0
+        while not board.is_game_over() and plies <= MAX_DISTANCE:
+            move, _ = tablebases.best_move(board)
+            board.push(move)
+            plies += 1
+        if board.is_checkmate():
+            expected = plies if plies % 2 else -(plies + 1)
+        else:
+            expected = 0
+        assert value == expected, (board.root().fen(), value, expected)
+        checked += 1
+
+
+if __name__ == "__main__":
+    import random
+
+    args = sys.argv[1:]
+    directory = DIRECTORY
+    samples = 0
+    if '--dir' in args:
+        option = args.index('--dir')
+        directory = args[option + 1]
+        del args[option:option + 2]
+    if '--check' in args:
+        option = args.index('--check')
+        samples = int(args[option + 1])
+        del args[option:option + 2]
+    signatures = ALL_3 + ALL_4 if '--four' in args else ALL_3
+    requested = [arg for arg in args if not arg.startswith('--')]
+    if requested:
+        signatures = [signature_of(*arg.split('v'))[0] for arg in requested]
+
+    tablebases = Tablebases(directory)
+    for signature in generation_order(signatures):
+        if signature not in TRIVIAL_DRAWS:
+            generate(signature, tablebases, directory)
+    if samples:
+        rng = random.Random(0)
+        for signature in generation_order(signatures):
+            if signature in tablebases.tables:
+                check(tablebases, signature, samples, rng)
+                print(f"{signature:6} {samples} perfect playouts agree")
+    tablebases.close()
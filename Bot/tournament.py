@@ -0,0 +1,419 @@
+"""
+Headless matches between two bot players.
+
+    python Bot/tournament.py hard medium --games 200
+    python Bot/tournament.py hard "hard:movetime=0.5" --tc 20+0.2 --sprt 0 10
+    python Bot/tournament.py --report tournament.jsonl
+
+A player is a difficulty level (see levels.py), optionally followed by
+settings that replace the level's own or configure its engine:
+"hard:movetime=0.5,nodes=20000,hash=32,ordering=0,see=0,tb=0,book=0".
+
+Games run in parallel in a process pool (see parallel.py), one game per
+task, with an engine per player kept in every worker process. Each opening
+(random moves from the start position or a FEN/EPD line of `--openings`)
+is played twice with colours swapped. The time control is either fixed
+per move (`--movetime`, `--nodes`) or a clock (`--tc base+increment`,
+seconds) from which every move of a searching player gets a share; a
+player whose clock runs out loses.
+
+Games end naturally, by threefold repetition or the fifty-move rule, or by
+adjudication: a tablebase result once the material is covered, a loss for
+a side whose search has scored the position below -`--resign` centipawns
+for `--resign-moves` moves in a row, a draw once both sides' scores stayed
+within `--draw` centipawns for `--draw-moves` plies after move
+`--draw-after`, and a draw at `--max-plies`.
+
+Every finished game is appended to a JSON lines file as it comes in. The
+summary gives the first player's score, the Elo difference with a 95%
+error margin, the SPRT log-likelihood ratio for H0: elo0 against H1: elo1,
+and the throughput in games per hour. With `--sprt-stop` no more games
+are started once the SPRT has decided.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import chess
+
+from book import DEFAULT_PATH as BOOK_PATH, OpeningBook
+from engine import Engine
+from evaluation import evaluate_board
+from levels import LEVELS, choose_move
+from parallel import process_pool, worker_state
+from tablebase import DIRECTORY as TABLEBASE_DIR, Tablebases
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.game import GameBoard, outcome  # noqa: E402
+
+# Settings of a player that configure its engine rather than its level
+ENGINE_SETTINGS = {'hash': 16, 'ordering': 1, 'qs': 1, 'see': 1, 'tb': 1}
+
+
+def parse_value(text):
+    if text.lower() in ('none', 'null'):
+        return None
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_player(spec):
+    """'hard:movetime=0.5,hash=32' -> {'name', 'level', 'settings', 'engine'}."""
+    level, _, options = spec.partition(':')
+    if level not in LEVELS:
+        raise ValueError(f"unknown level {level!r} in {spec!r}, expected one of {', '.join(LEVELS)}")
+    settings = {}
+    engine = dict(ENGINE_SETTINGS)
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key in engine:
+            engine[key] = parse_value(value)
+        else:
+            settings[key] = parse_value(value)
+    return {'name': spec, 'level': level, 'settings': settings, 'engine': engine}
+
+
+def random_opening(rng, plies, fen=None):
+    """`plies` random legal moves (UCI) from `fen`, avoiding positions where the game is over."""
+    while True:
+        board = chess.Board(fen) if fen else chess.Board()
+        moves = []
+        for _ in range(plies):
+            legal = list(board.legal_moves)
+            if not legal:
+                break
+            move = rng.choice(legal)
+            board.push(move)
+            moves.append(move.uci())
+        if not board.is_game_over():
+            return moves
+
+
+def read_openings(path):
+    """Start positions of an EPD or FEN file, one per line."""
+    openings = []
+    with open(path) as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) >= 4:
+                fen = ' '.join(fields[:4])
+                if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+                    fen = ' '.join(fields[:6])
+                openings.append(chess.Board(fen).fen())
+    return openings
+
+
+def _init_worker(book_path, tablebase_dir):
+    worker_state['book'] = OpeningBook(book_path) if book_path else None
+    worker_state['tablebases'] = Tablebases(tablebase_dir) if tablebase_dir else None
+    worker_state['engines'] = {}
+
+
+def _engine(player, color):
+    # Each side gets its own engine, also when a player meets itself
+    key = (player['name'], color)
+    engine = worker_state['engines'].get(key)
+    if engine is None:
+        options = player['engine']
+        engine = Engine(hash_mb=options['hash'], ordering=bool(options['ordering']),
+                        quiescence=bool(options['qs']), see_pruning=bool(options['see']),
+                        tablebases=worker_state['tablebases'] if options['tb'] else None)
+        worker_state['engines'][key] = engine
+    engine.tt.clear()
+    engine.orderer.clear()
+    return engine
+
+
+def _natural_end(board):
+    """(result, reason) if the game is over by the rules, else None."""
+    result = outcome(board)
+    if result is not None:
+        return result.result(), result.termination.name.lower().replace('_', ' ')
+    if board.halfmove_clock >= 100:
+        return '1/2-1/2', 'fifty moves'
+    if board.repetitions.count() >= 3:
+        return '1/2-1/2', 'threefold repetition'
+    return None
+
+
+def _win_for(color):
+    return '1-0' if color == chess.WHITE else '0-1'
+
+
+def play_game(game):
+    """Play one game described by a task dict; returns its record."""
+    random.seed(game['seed'])
+    settings = game['settings']
+    tablebases = worker_state['tablebases']
+    board = GameBoard(game['fen']) if game['fen'] else GameBoard()
+    for uci in game['opening']:
+        board.push_uci(uci)
+    players = {chess.WHITE: game['white'], chess.BLACK: game['black']}
+    engines = {color: _engine(player, color) for color, player in players.items()}
+    clocks = {chess.WHITE: settings['tc'][0], chess.BLACK: settings['tc'][0]} if settings['tc'] else None
+    used = {chess.WHITE: 0.0, chess.BLACK: 0.0}
+    nodes = {chess.WHITE: 0, chess.BLACK: 0}
+    resigning = {chess.WHITE: 0, chess.BLACK: 0}
+    drawish = 0
+    moves, scores = [], []
+    start = time.time()
+
+    while True:
+        end = _natural_end(board)
+        if end is not None:
+            result, reason = end
+            break
+        if tablebases is not None and len(tablebases):
+            value = tablebases.probe(board)
+            if value is not None:
+                result = '1/2-1/2' if value == 0 else _win_for(board.turn if value > 0 else not board.turn)
+                reason = 'adjudication: tablebase'
+                break
+        if len(moves) >= settings['max_plies']:
+            result, reason = '1/2-1/2', 'adjudication: max plies'
+            break
+
+        color = board.turn
+        player = players[color]
+        overrides = dict(player['settings'])
+        if settings['movetime'] is not None:
+            overrides['movetime'] = settings['movetime']
+        if settings['nodes'] is not None:
+            overrides['nodes'] = settings['nodes']
+        if clocks is not None:
+            base, increment = settings['tc']
+            overrides['movetime'] = max(0.01, min(clocks[color] / 30 + increment, clocks[color] * 0.5))
+
+        engine = engines[color]
+        started = time.perf_counter()
+        move, source = choose_move(engine, board, player['level'], book=worker_state['book'], overrides=overrides)
+        elapsed = time.perf_counter() - started
+        used[color] += elapsed
+        if clocks is not None:
+            clocks[color] += settings['tc'][1] - elapsed
+            if clocks[color] < 0:
+                result, reason = _win_for(not color), 'time forfeit'
+                break
+
+        score = None
+        if source == 'search':
+            nodes[color] += engine.nodes
+            score = engine.score
+        moves.append(move.uci())
+        scores.append(score)
+
+        # Adjudication by the searching players' own scores
+        if score is not None and score <= -settings['resign']:
+            resigning[color] += 1
+            if resigning[color] >= settings['resign_moves']:
+                result, reason = _win_for(not color), 'adjudication: resign'
+                break
+        else:
+            resigning[color] = 0
+        if score is not None and abs(score) <= settings['draw'] and board.ply() >= 2 * settings['draw_after']:
+            drawish += 1
+            if drawish >= settings['draw_moves']:
+                result, reason = '1/2-1/2', 'adjudication: draw'
+                break
+        else:
+            drawish = 0
+        board.push(move)
+
+    return {
+        'game': game['game'], 'players': game['players'], 'white': game['white']['name'],
+        'black': game['black']['name'], 'result': result, 'reason': reason, 'fen': game['fen'],
+        'opening': game['opening'], 'moves': moves, 'scores': scores, 'plies': len(moves),
+        'final_eval': evaluate_board(board) if board.turn else -evaluate_board(board),
+        'time': {'white': round(used[chess.WHITE], 3), 'black': round(used[chess.BLACK], 3)},
+        'nodes': {'white': nodes[chess.WHITE], 'black': nodes[chess.BLACK]},
+        'start': start, 'end': time.time(),
+    }
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def summarize(records, player, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05):
+    """Score, Elo difference and SPRT state of `player` over the game records."""
+    wins = draws = losses = 0
+    for record in records:
+        if record['result'] == '1/2-1/2':
+            draws += 1
+        elif (record['result'] == '1-0') == (record['white'] == player):
+            wins += 1
+        else:
+            losses += 1
+    games = wins + draws + losses
+    summary = {'player': player, 'games': games, 'wins': wins, 'draws': draws, 'losses': losses}
+    if not games:
+        return summary
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.959964 * math.sqrt(variance / games)
+    summary.update(score=score, elo=elo_difference(score),
+                   elo_low=elo_difference(score - margin), elo_high=elo_difference(score + margin))
+
+    # Generalized SPRT with the normal approximation of the trinomial results
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    llr = (s1 - s0) * (2 * score - s0 - s1) * games / (2 * variance) if variance > 0 else 0.0
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    verdict = 'H1 accepted' if llr >= upper else 'H0 accepted' if llr <= lower else 'continue'
+    summary.update(llr=llr, llr_bounds=(lower, upper), elo0=elo0, elo1=elo1, sprt=verdict)
+
+    start = min(record['start'] for record in records)
+    end = max(record['end'] for record in records)
+    summary['games_per_hour'] = games / (end - start) * 3600 if end > start else 0.0
+    return summary
+
+
+def format_summary(summary):
+    if not summary['games']:
+        return f"{summary['player']}: no games"
+    elo, low, high = summary['elo'], summary['elo_low'], summary['elo_high']
+    if math.isfinite(low) and math.isfinite(high):
+        elo_text = f"{elo:+.1f} +/- {(high - low) / 2:.1f}"
+    else:
+        elo_text = f"{elo:+.1f} [{low:+.1f}, {high:+.1f}]"
+    return (f"{summary['player']}: {summary['wins']}W {summary['draws']}D {summary['losses']}L "
+            f"of {summary['games']}, score {summary['score'] * 100:.1f}%, Elo {elo_text}, "
+            f"LLR {summary['llr']:.2f} [{summary['llr_bounds'][0]:.2f}, {summary['llr_bounds'][1]:.2f}] "
+            f"({summary['elo0']:g}, {summary['elo1']:g}) {summary['sprt']}, "
+            f"{summary['games_per_hour']:.0f} games/hour")
+
+
+def schedule(args, players):
+    """Task dicts of the tournament's games, in order: each opening twice, colours swapped."""
+    rng = random.Random(args.seed)
+    starts = read_openings(args.openings) if args.openings else [None]
+    settings = {
+        'movetime': args.movetime, 'nodes': args.nodes, 'tc': args.tc, 'max_plies': args.max_plies,
+        'resign': args.resign, 'resign_moves': args.resign_moves, 'draw': args.draw,
+        'draw_moves': args.draw_moves, 'draw_after': args.draw_after,
+    }
+    names = [player['name'] for player in players]
+    for game in range(args.games):
+        if game % 2 == 0:
+            fen = starts[game // 2 % len(starts)]
+            opening = random_opening(rng, args.random_plies, fen)
+        first, second = players if game % 2 == 0 else players[::-1]
+        yield {'game': game, 'players': names, 'white': first, 'black': second, 'fen': fen,
+               'opening': opening, 'seed': args.seed * 1000003 + game, 'settings': settings}
+
+
+def run(args):
+    players = [parse_player(spec) for spec in args.players]
+    if players[0]['name'] == players[1]['name']:
+        players[0]['name'] += '#1'
+        players[1]['name'] += '#2'
+    book_path = args.book if args.book and os.path.exists(args.book) else None
+    tablebase_dir = args.tablebases if args.tablebases and os.path.isdir(args.tablebases) else None
+    tasks = schedule(args, players)
+    records = []
+    started = time.perf_counter()
+    print(f"{players[0]['name']} vs {players[1]['name']}: {args.games} games on {args.workers} processes, "
+          f"book {'on' if book_path else 'off'}, tablebases {'on' if tablebase_dir else 'off'}")
+
+    with open(args.out, 'w') as out, process_pool(args.workers, _init_worker, (book_path, tablebase_dir)) as pool:
+        running = set()
+        stopping = False
+        while True:
+            # Keep every process busy with one game queued behind it
+            while not stopping and len(running) < 2 * args.workers:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                running.add(pool.submit(play_game, task))
+            if not running:
+                break
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                records.append(record)
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                summary = summarize(records, players[0]['name'], *args.sprt)
+                print(f"game {record['game'] + 1:4}: {record['white']} - {record['black']} {record['result']:7} "
+                      f"({record['reason']}, {record['plies']} plies)  "
+                      f"{summary['wins']}-{summary['draws']}-{summary['losses']}  LLR {summary['llr']:.2f}")
+                if args.sprt_stop and summary['sprt'] != 'continue':
+                    stopping = True
+
+    elapsed = time.perf_counter() - started
+    summary = summarize(records, players[0]['name'], *args.sprt)
+    print(format_summary(summary))
+    print(f"{len(records)} games in {elapsed:.1f}s on {args.workers} processes: "
+          f"{len(records) / elapsed * 3600:.0f} games/hour, "
+          f"{len(records) / elapsed * 3600 / args.workers:.0f} per process")
+    return summary
+
+
+def report(path, player=None, sprt=(0.0, 5.0)):
+    with open(path) as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    if not records:
+        print(f"{path}: no games")
+        return None
+    summary = summarize(records, player or records[0]['players'][0], *sprt)
+    print(format_summary(summary))
+    reasons = {}
+    for record in records:
+        reasons[record['reason']] = reasons.get(record['reason'], 0) + 1
+    print(', '.join(f"{reason} {count}" for reason, count in sorted(reasons.items(), key=lambda item: -item[1])))
+    return summary
+
+
+def parse_tc(text):
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play matches between two bot players.")
+    parser.add_argument('players', nargs='*', help="two players, e.g. hard 'hard:movetime=0.2'")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes (default: all cores)")
+    parser.add_argument('--out', default='tournament.jsonl', help="JSON lines file of the games")
+    parser.add_argument('--report', metavar='FILE', help="summarize a finished JSON lines file instead of playing")
+    parser.add_argument('--openings', metavar='FILE', help="EPD/FEN start positions, used in turn")
+    parser.add_argument('--random-plies', type=int, default=8, help="random moves played from each start")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--movetime', type=float, help="seconds per move for searching players")
+    parser.add_argument('--nodes', type=int, help="node limit per move for searching players")
+    parser.add_argument('--tc', type=parse_tc, help="clock per game as base+increment in seconds")
+    parser.add_argument('--max-plies', type=int, default=400)
+    parser.add_argument('--resign', type=int, default=800, help="centipawns")
+    parser.add_argument('--resign-moves', type=int, default=4)
+    parser.add_argument('--draw', type=int, default=10, help="centipawns")
+    parser.add_argument('--draw-moves', type=int, default=10, help="plies")
+    parser.add_argument('--draw-after', type=int, default=40, help="full moves")
+    parser.add_argument('--sprt', type=float, nargs=2, default=(0.0, 5.0), metavar=('ELO0', 'ELO1'))
+    parser.add_argument('--sprt-stop', action='store_true', help="stop once the SPRT has decided")
+    parser.add_argument('--book', default=BOOK_PATH)
+    parser.add_argument('--tablebases', default=TABLEBASE_DIR)
+    args = parser.parse_args()
+
+    if args.report:
+        report(args.report, args.players[0] if args.players else None, args.sprt)
+    elif len(args.players) != 2:
+        parser.error("give two players, e.g. hard medium")
+    else:
+        run(args)
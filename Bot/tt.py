@@ -0,0 +1,149 @@
+"""
+Fixed-size transposition table for the search engine.
+
+Entries live in one flat buffer of unsigned 64-bit words instead of a dict of
+Python objects, so memory use is exactly what was asked for. Every entry is
+two words: the full Zobrist key and a packed data word
+
+    bits  0-15  best move, 16-bit as in position.py
+    bits 16-47  score, offset by 2**31
+    bits 48-55  depth
+    bits 56-57  bound (EXACT, LOWER or UPPER, 0 for an empty slot)
+    bits 58-63  age of the search that stored it
+
+The key word is stored xor-ed with the data word, so an entry torn by two
+processes writing the same slot at once (see parallel.py, where the buffer
+is shared memory) fails the key check instead of returning garbage.
+
+Entries are grouped in buckets of BUCKET_SIZE slots. On a store the slot
+already holding the same key is reused; otherwise the victim is a slot left
+over from an older search, or failing that the shallowest one.
+"""
+
+EXACT, LOWER, UPPER = 1, 2, 3
+
+ENTRY_BYTES = 16
+BUCKET_SIZE = 2
+MIN_SIZE_MB = 1
+MAX_SIZE_MB = 4096
+AGE_MASK = 63
+
+SCORE_OFFSET = 1 << 31
+
+
+def table_bytes(size_mb):
+    """Buffer size for a table of `size_mb` megabytes (clamped to the allowed range)."""
+    size_mb = max(MIN_SIZE_MB, min(MAX_SIZE_MB, int(size_mb)))
+    return size_mb * 1024 * 1024 // (ENTRY_BYTES * BUCKET_SIZE) * ENTRY_BYTES * BUCKET_SIZE
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, buffer=None):
+        """A table of `size_mb` megabytes, or one living in an existing
+        writable `buffer` (e.g. shared memory) of `table_bytes()` size."""
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.age = 0
+        if buffer is None:
+            self.resize(size_mb)
+        else:
+            self._attach(buffer)
+
+    def resize(self, size_mb):
+        """Reallocate the table for `size_mb` megabytes, dropping all entries."""
+        self._attach(bytearray(table_bytes(size_mb)))
+
+    def _attach(self, buffer):
+        self.buffer = buffer
+        self.table = memoryview(buffer).cast('Q')
+        self.entries = len(self.table) // 2
+        self.buckets = self.entries // BUCKET_SIZE
+        self.size_mb = len(self.table) * 8 >> 20
+
+    def release(self):
+        """Drop the view on the buffer, needed before shared memory is closed."""
+        self.table.release()
+
+    def clear(self):
+        """Forget every entry and reset the counters."""
+        self.buffer[:] = bytes(len(self.buffer))
+        self.hits = self.misses = self.stores = self.overwrites = 0
+        self.age = 0
+
+    def new_search(self):
+        """Start a new search; entries from earlier searches become preferred victims."""
+        self.age = (self.age + 1) & AGE_MASK
+
+    def probe(self, key):
+        """Return (move, score, depth, bound) for `key`, or None."""
+        table = self.table
+        slot = (key % self.buckets) * BUCKET_SIZE * 2
+        for i in range(slot, slot + BUCKET_SIZE * 2, 2):
+            data = table[i + 1]
+            if table[i] ^ data == key:
+                if data >> 56 & 3:
+                    self.hits += 1
+                    return (data & 0xFFFF, (data >> 16 & 0xFFFFFFFF) - SCORE_OFFSET,
+                            data >> 48 & 0xFF, data >> 56 & 3)
+        self.misses += 1
+        return None
+
+    def store(self, key, move, score, depth, bound):
+        """Store a search result; `move` is a 16-bit move, 0 if unknown."""
+        table = self.table
+        age = self.age
+        slot = (key % self.buckets) * BUCKET_SIZE * 2
+        for i in range(slot, slot + BUCKET_SIZE * 2, 2):
+            data = table[i + 1]
+            if table[i] ^ data == key:
+                # Keep a deeper result for the same position unless it is stale
+                if depth < (data >> 48 & 0xFF) and bound != EXACT and data >> 58 == age:
+                    return
+                if not move:
+                    move = data & 0xFFFF
+                victim = i
+                break
+        else:
+            victim = None
+            victim_value = None
+            for i in range(slot, slot + BUCKET_SIZE * 2, 2):
+                data = table[i + 1]
+                if not data >> 56 & 3:
+                    victim = i
+                    break
+                # Older entries go first, then the shallowest of the current search
+                value = (data >> 48 & 0xFF) - (256 if data >> 58 != age else 0)
+                if victim is None or value < victim_value:
+                    victim, victim_value = i, value
+            else:
+                self.overwrites += 1
+
+        self.stores += 1
+        data = (move | (score + SCORE_OFFSET) << 16 | max(0, min(depth, 255)) << 48 |
+                bound << 56 | age << 58)
+        table[victim] = key ^ data
+        table[victim + 1] = data
+
+    def hashfull(self, sample=1000):
+        """Permille of sampled slots holding an entry from the current search."""
+        table = self.table
+        sample = min(sample, self.entries)
+        used = sum(1 for i in range(sample)
+                   if table[2 * i + 1] >> 56 & 3 and table[2 * i + 1] >> 58 == self.age)
+        return used * 1000 // sample if sample else 0
+
+    def stats(self):
+        """Counters used to size the table for a deployment."""
+        probes = self.hits + self.misses
+        return {
+            'size_mb': self.size_mb,
+            'entries': self.entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'hashfull': self.hashfull(),
+        }
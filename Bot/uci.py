@@ -0,0 +1,320 @@
+"""
+UCI (Universal Chess Interface) frontend, so the bot runs headless as an
+engine process under a GUI or a tournament manager.
+
+    python Bot/uci.py
+
+Commands are read from stdin, one per line, and answered on stdout:
+
+- uci, isready, ucinewgame, quit (debug and register are ignored)
+- setoption name Hash | Threads | Difficulty | Move Overhead | Ponder | OwnBook [value X]
+- position startpos | fen FEN [moves ...]
+- go [wtime T] [btime T] [winc T] [binc T] [movestogo N] [movetime T] [depth N] [nodes N]
+  [infinite] [ponder]
+- stop, ponderhit
+
+`go` searches on a background thread, so `isready`, `stop` and `ponderhit`
+are answered while it runs, and `stop` makes the search return the best
+move found so far right away. With a clock each move gets the remaining
+time divided by the moves still to go (MOVES_TO_GO when the GUI doesn't
+say) plus most of the increment, never more than half of what is left,
+less `Move Overhead` for the GUI's lag. A `go` without any limit uses the
+difficulty's own budget (see levels.py).
+
+While pondering (`go ponder`) and with `go infinite` the search has no time
+limit, and the best move is held back until `ponderhit` or `stop` as the
+protocol requires; on a ponder hit the move's time budget starts counting
+from then. Only the 'hard' difficulty searches and reports `info` lines,
+'easy' and 'medium' answer at once.
+
+Threads > 1 searches with a pool of processes (see parallel.py), which
+reports one `info` line at the end instead of one per iteration.
+"""
+
+import os
+import sys
+import threading
+
+from book import DEFAULT_PATH as BOOK_PATH, OpeningBook
+from engine import Engine, mate_in
+from levels import LEVELS, choose_move
+from tablebase import DIRECTORY as TABLEBASE_DIR, Tablebases
+from tt import MAX_SIZE_MB, MIN_SIZE_MB
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chesscore.game import GameBoard  # noqa: E402
+
+ENGINE_NAME = "Chess Bot"
+ENGINE_AUTHOR = "Muneer Alam"
+
+# Moves the remaining clock time is shared over when `go` has no movestogo
+MOVES_TO_GO = 30
+# Never plan less than this for a move, in milliseconds
+MIN_MOVETIME_MS = 10
+
+OPTIONS = {
+    'Hash': {'type': 'spin', 'default': 64, 'min': MIN_SIZE_MB, 'max': MAX_SIZE_MB},
+    'Threads': {'type': 'spin', 'default': 1, 'min': 1, 'max': os.cpu_count() or 1},
+    'Difficulty': {'type': 'combo', 'default': 'hard', 'var': list(LEVELS)},
+    'Move Overhead': {'type': 'spin', 'default': 100, 'min': 0, 'max': 5000},
+    'Ponder': {'type': 'check', 'default': False},
+    'OwnBook': {'type': 'check', 'default': True},
+}
+
+GO_NUMBERS = {'wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'depth', 'nodes'}
+GO_FLAGS = {'infinite', 'ponder'}
+
+
+def option_line(name, spec):
+    line = f"option name {name} type {spec['type']} default "
+    if spec['type'] == 'check':
+        return line + ('true' if spec['default'] else 'false')
+    line += str(spec['default'])
+    if spec['type'] == 'spin':
+        line += f" min {spec['min']} max {spec['max']}"
+    elif spec['type'] == 'combo':
+        line += ''.join(f" var {value}" for value in spec['var'])
+    return line
+
+
+def parse_option(spec, text):
+    """The value of a `setoption` for the option `spec`, or None if it is invalid."""
+    if spec['type'] == 'check':
+        return {'true': True, 'false': False}.get(text.lower())
+    if spec['type'] == 'combo':
+        return text.lower() if text.lower() in spec['var'] else None
+    try:
+        value = int(text)
+    except ValueError:
+        return None
+    return max(spec['min'], min(spec['max'], value))
+
+
+def parse_go(tokens):
+    """The limits of a `go` command as a dict, e.g. {'wtime': 60000, 'ponder': True}."""
+    limits = {}
+    tokens = iter(tokens)
+    for token in tokens:
+        if token in GO_FLAGS:
+            limits[token] = True
+        elif token in GO_NUMBERS:
+            try:
+                limits[token] = int(next(tokens))
+            except (StopIteration, ValueError):
+                break
+    return limits
+
+
+def time_budget(limits, white, overhead):
+    """Seconds to spend on a move under the `go` limits, None without a time limit."""
+    if 'movetime' in limits:
+        return max(limits['movetime'] - overhead, MIN_MOVETIME_MS) / 1000
+    remaining = limits.get('wtime' if white else 'btime')
+    if remaining is None:
+        return None
+    increment = limits.get('winc' if white else 'binc', 0)
+    budget = remaining / (limits.get('movestogo') or MOVES_TO_GO) + increment * 0.75
+    budget = min(budget, remaining * 0.5) - overhead
+    return max(budget, MIN_MOVETIME_MS) / 1000
+
+
+def uci_score(score):
+    """A search score as 'cp N' or 'mate N' (in moves, negative when getting mated)."""
+    mate = mate_in(score)
+    return f"mate {mate}" if mate is not None else f"cp {score}"
+
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.options = {name.lower(): spec['default'] for name, spec in OPTIONS.items()}
+        self.board = GameBoard()
+        self.engine = None
+        self.engine_settings = None
+        self.book = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+        self.tablebases = Tablebases(TABLEBASE_DIR)
+        self.stop = threading.Event()
+        # Set by `stop` and `ponderhit`; a pondering or infinite search holds its move until then
+        self.release = threading.Event()
+        self.thread = None
+        self.timer = None
+        self.pondering = False
+        self.budget = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, lines=sys.stdin):
+        for line in lines:
+            if not self.handle(line):
+                return
+        self.quit()
+
+    def handle(self, line):
+        """Execute one command; returns False on `quit`."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            for name, spec in OPTIONS.items():
+                self.send(option_line(name, spec))
+            self.send("uciok")
+        elif command == 'isready':
+            if not self.searching():
+                self.get_engine()
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.finish_search()
+            engine = self.get_engine()
+            engine.tt.clear()
+            engine.orderer.clear()
+        elif command == 'position':
+            self.set_position(args)
+        elif command == 'go':
+            self.go(args)
+        elif command == 'stop':
+            self.release.set()
+            self.stop.set()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            self.quit()
+            return False
+        elif command not in ('debug', 'register'):
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def set_option(self, args):
+        if 'name' not in args:
+            return
+        name_end = args.index('value') if 'value' in args else len(args)
+        name = ' '.join(args[args.index('name') + 1:name_end])
+        spec = next((spec for option, spec in OPTIONS.items() if option.lower() == name.lower()), None)
+        if spec is None:
+            self.send(f"info string unknown option {name}")
+            return
+        value = parse_option(spec, ' '.join(args[name_end + 1:]))
+        if value is None:
+            self.send(f"info string invalid value for {name}")
+            return
+        self.options[name.lower()] = value
+
+    def get_engine(self):
+        """The engine for the current Hash and Threads, made anew when they changed."""
+        settings = (self.options['hash'], self.options['threads'])
+        if settings != self.engine_settings:
+            self.close_engine()
+            hash_mb, threads = settings
+            if threads > 1:
+                # Imported here so a single-threaded engine doesn't load multiprocessing
+                from parallel import ParallelSearch
+                self.engine = ParallelSearch(workers=threads, hash_mb=hash_mb, tablebase_dir=TABLEBASE_DIR)
+            else:
+                self.engine = Engine(hash_mb=hash_mb, tablebases=self.tablebases)
+            self.engine_settings = settings
+        return self.engine
+
+    def close_engine(self):
+        if self.engine is not None and hasattr(self.engine, 'close'):
+            self.engine.close()
+        self.engine = None
+        self.engine_settings = None
+
+    def set_position(self, args):
+        if not args:
+            return
+        moves = args.index('moves') if 'moves' in args else len(args)
+        try:
+            board = GameBoard(' '.join(args[1:moves])) if args[0] == 'fen' else GameBoard()
+        except ValueError:
+            self.send(f"info string invalid fen {' '.join(args[1:moves])}")
+            return
+        for uci in args[moves + 1:]:
+            try:
+                board.push_uci(uci)
+            except ValueError:
+                self.send(f"info string illegal move {uci}")
+                break
+        self.board = board
+
+    def searching(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def finish_search(self):
+        """Stop a running search and wait for its `bestmove`."""
+        self.release.set()
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def go(self, args):
+        self.finish_search()
+        engine = self.get_engine()
+        limits = parse_go(args)
+        level = self.options['difficulty']
+        self.pondering = limits.get('ponder', False)
+        hold = self.pondering or limits.get('infinite', False)
+        self.budget = time_budget(limits, self.board.turn, self.options['move overhead'])
+        if self.budget is None and 'depth' not in limits and 'nodes' not in limits:
+            self.budget = LEVELS[level].get('movetime')
+        overrides = {'movetime': None if hold else self.budget, 'nodes': limits.get('nodes'),
+                     'depth': limits.get('depth')}
+        self.stop.clear()
+        self.release.clear()
+        self.thread = threading.Thread(target=self._search, args=(engine, self.board.copy(), level, overrides, hold),
+                                       name="uci-search", daemon=True)
+        self.thread.start()
+
+    def _search(self, engine, board, level, overrides, hold):
+        book = self.book if self.options['ownbook'] else None
+        move, source = choose_move(engine, board, level, stop=self.stop, book=book, overrides=overrides,
+                                   on_iteration=self.info)
+        if source == 'search' and engine.depth == 0 and engine.pv:
+            self.info(engine)  # answered by the tablebases without searching
+        elif source is not None and source != 'search':
+            self.send(f"info string {source} move")
+        if hold:
+            self.release.wait()
+        line = f"bestmove {move.uci() if move else '0000'}"
+        if source == 'search' and len(engine.pv) > 1 and engine.pv[0] == move:
+            line += f" ponder {engine.pv[1].uci()}"
+        self.send(line)
+
+    def info(self, engine):
+        self.send(f"info depth {engine.depth} score {uci_score(engine.score)} nodes {engine.nodes} "
+                  f"nps {engine.nps} time {int(engine.elapsed * 1000)} hashfull {engine.tt.hashfull()} "
+                  f"pv {' '.join(move.uci() for move in engine.pv)}")
+
+    def ponderhit(self):
+        """The opponent played the expected move: the ponder search becomes the real one."""
+        if not self.pondering:
+            return
+        self.pondering = False
+        self.release.set()
+        if self.budget is not None and self.searching():
+            self.timer = threading.Timer(self.budget, self.stop.set)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def quit(self):
+        self.finish_search()
+        self.close_engine()
+        if self.book is not None:
+            self.book.close()
+        self.tablebases.close()
+
+
+if __name__ == "__main__":
+    UciEngine().run()
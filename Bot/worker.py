@@ -0,0 +1,246 @@
+"""
+Runs the bot on a background thread so the pygame loop never blocks on it.
+
+The frontend puts a request (board + difficulty) on a queue and polls for the
+answer every frame, so the window keeps rendering and handling events while
+the bot thinks. The optional `on_result` callback runs on the worker thread
+as soon as an answer is ready, e.g. to wake a loop that blocks on input. A
+stop event lets `cancel()` end an in-flight search right away, and request
+ids make sure a late answer for a cancelled request is dropped.
+
+The search is pure Python, so it shares the GIL with the UI thread; the
+interpreter switches threads every few milliseconds, which is plenty for
+the UI's light per-frame work. With `workers` > 1 the thread only
+coordinates and the search runs in a pool of processes (see parallel.py).
+
+With `ponder` on, the worker keeps searching while the human thinks: after
+a searched move it assumes the reply the search expects (the second move
+of the principal variation) and searches the position after it, without a
+time limit. If the human plays that move the ponder search becomes the
+answer; it gets the level's move time counted from when pondering started,
+so after a long think the move comes back at once. Any other move stops
+it and the new search starts with the transposition table the ponder
+search filled. `ponder_report()` gives the hit rate and the waiting time
+the hits saved.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from book import OpeningBook
+from engine import Engine
+from levels import LEVELS, choose_move
+from position import Position, decode_move
+from tablebase import Tablebases
+
+
+class BotWorker:
+    def __init__(self, hash_mb=64, workers=1, book_path=None, tablebase_dir=None, on_result=None, ponder=False):
+        self.on_result = on_result
+        self.ponder = ponder
+        self.book = OpeningBook(book_path) if book_path and os.path.exists(book_path) else None
+        self.tablebases = Tablebases(tablebase_dir) if tablebase_dir else None
+        self.parallel = workers > 1
+        if self.parallel:
+            # Imported here so a single-threaded bot doesn't load multiprocessing
+            from parallel import ParallelSearch
+            self.engine = ParallelSearch(workers=workers, hash_mb=hash_mb, tablebase_dir=tablebase_dir)
+        else:
+            self.engine = Engine(hash_mb=hash_mb, tablebases=self.tablebases)
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.stop = threading.Event()
+        self.request_id = 0
+        self.pending = False
+        # The running ponder search's state, guarded by the lock as the UI
+        # thread resolves it while the worker thread searches
+        self.lock = threading.Lock()
+        self.pondering = None
+        self.ponder_stats = {'hits': 0, 'misses': 0, 'saved': 0.0}
+        self.thread = threading.Thread(target=self._serve, name="bot-worker", daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        engine = self.engine
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            if request[0] == 'new_game':
+                engine.tt.clear()
+                engine.orderer.clear()
+                continue
+            if request[0] == 'ponder':
+                state = request[1]
+            else:
+                _, request_id, board, level, ponder = request
+                if request_id != self.request_id:
+                    continue  # cancelled before it was picked up
+                self.stop.clear()
+                move, source = choose_move(engine, board, level, stop=self.stop, book=self.book)
+                if request_id != self.request_id:
+                    continue  # cancelled while searching, the answer is dropped
+                stats = None
+                if source == 'search':
+                    stats = self._stats()
+                    stats['ponder'] = ponder
+                with self.lock:
+                    state = self._answer(request_id, board, level, move, stats, engine.pv)
+            while state is not None:
+                state = self._ponder(state)
+
+    def _stats(self):
+        engine = self.engine
+        return {'depth': engine.depth, 'score': engine.score, 'nodes': engine.nodes,
+                'elapsed': engine.elapsed, 'nps': engine.nps, 'tt': engine.tt.stats(),
+                'tb_hits': engine.tb_hits}
+
+    def _answer(self, request_id, board, level, move, stats, pv):
+        """Hand over a move and set up pondering on the reply `pv` expects; the lock must be held.
+
+        Returns the ponder state, or None when there is nothing to ponder on.
+        """
+        if request_id != self.request_id:
+            return None  # cancelled meanwhile; `stop` stays set for the next request to clear
+        state = None
+        if self.ponder and stats is not None:
+            reply = self._expected_reply(board, move, pv)
+            if reply is not None:
+                state = self._ponder_state(board, move, reply, level)
+        self.stop.clear()
+        self.pondering = state
+        self.results.put((request_id, move, stats))
+        if self.on_result is not None:
+            self.on_result()
+        return state
+
+    def _expected_reply(self, board, move, pv):
+        if len(pv) > 1 and pv[0] == move:
+            return pv[1]
+        # The move came from an unfinished iteration, the table has the reply it was searched with
+        board = board.copy()
+        board.push(move)
+        position = Position.from_board(board)
+        entry = self.engine.tt.probe(position.key)
+        if entry is not None and entry[0] and position.is_legal(entry[0]):
+            return decode_move(entry[0])
+        return None
+
+    def _ponder_state(self, board, move, reply, level):
+        board = board.copy()
+        board.push(move)
+        board.push(reply)
+        settings = LEVELS[level]
+        if self.book is not None and settings.get('book') and board.ply() < settings.get('book_depth', 0):
+            return None  # the answer may come from the book
+        if board.is_game_over():
+            return None
+        return {'board': board, 'level': level, 'budget': settings.get('movetime') or 0.0,
+                'started': time.perf_counter(), 'hit': None, 'asked': None, 'timer': None, 'result': None}
+
+    def _ponder(self, state):
+        """Search the expected position until the human moves; returns the next state to ponder on."""
+        if self.pondering is not state:
+            return None
+        move = self.engine.search(state['board'], stop=self.stop)
+        stats = self._stats()
+        with self.lock:
+            if self.pondering is not state:
+                return None  # missed or cancelled
+            if state['timer'] is not None:
+                state['timer'].cancel()
+            if state['hit'] is None:
+                # Finished (a mate, or the maximum depth) before the human moved
+                state['result'] = (move, stats, self.engine.pv)
+                return None
+            return self._answer_hit(state, move, stats, self.engine.pv)
+
+    def _answer_hit(self, state, move, stats, pv):
+        latency = time.perf_counter() - state['asked']
+        # A search of its own would have taken the move time, or less if it finished early
+        saved = max(0.0, min(stats['elapsed'], state['budget']) - latency)
+        self.ponder_stats['hits'] += 1
+        self.ponder_stats['saved'] += saved
+        stats['ponder'] = 'hit'
+        stats['saved'] = saved
+        return self._answer(state['hit'], state['board'], state['level'], move, stats, pv)
+
+    def request(self, board, level):
+        """Ask for a move in `board`'s position; the answer arrives via `poll()`."""
+        self.request_id += 1
+        self.pending = True
+        ponder = None
+        with self.lock:
+            state = self.pondering
+            if state is not None and state['level'] == level and state['board'].move_stack == board.move_stack:
+                state['hit'] = self.request_id
+                state['asked'] = time.perf_counter()
+                if state['result'] is not None:
+                    # The worker is idle, it is handed the next position to ponder on
+                    self.requests.put(('ponder', self._answer_hit(state, *state['result'])))
+                    return
+                remaining = state['budget'] - (state['asked'] - state['started'])
+                if remaining > 0:
+                    state['timer'] = threading.Timer(remaining, self.stop.set)
+                    state['timer'].start()
+                else:
+                    self.stop.set()
+                return
+            if state is not None:
+                self.pondering = None
+                self.stop.set()
+                self.ponder_stats['misses'] += 1
+                ponder = 'miss'
+        self.requests.put(('move', self.request_id, board.copy(), level, ponder))
+
+    def poll(self):
+        """Return (move, stats) once the current request is answered, else None."""
+        while self.pending:
+            try:
+                request_id, move, stats = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if request_id == self.request_id:
+                self.pending = False
+                return move, stats
+        return None
+
+    def cancel(self):
+        """Abort the in-flight request, its answer will be ignored."""
+        with self.lock:
+            state = self.pondering
+            self.pondering = None
+            if state is not None:
+                if state['timer'] is not None:
+                    state['timer'].cancel()
+                self.stop.set()
+            # Under the lock, so `_answer` sees the request is cancelled
+            if self.pending:
+                self.stop.set()
+                self.request_id += 1
+                self.pending = False
+
+    def ponder_report(self):
+        hits, misses = self.ponder_stats['hits'], self.ponder_stats['misses']
+        if not hits + misses:
+            return "ponder: no predictions resolved"
+        return (f"ponder hits {hits}/{hits + misses} ({hits / (hits + misses):.0%}), "
+                f"saved {self.ponder_stats['saved']:.2f}s of waiting")
+
+    def new_game(self):
+        """Cancel any search and forget what was learned in the previous game."""
+        self.cancel()
+        self.requests.put(('new_game',))
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.thread.join(timeout=1)
+        if self.parallel:
+            self.engine.close()
+        if self.book is not None:
+            self.book.close()
+        if self.tablebases is not None:
+            self.tablebases.close()
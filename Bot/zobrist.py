@@ -0,0 +1,54 @@
+"""
+64-bit Zobrist hashing of chess positions.
+
+The keys are the Polyglot random numbers, so `hash_board(board)` is equal to
+`chess.polyglot.zobrist_hash(board)` and can be used to look up opening books.
+The engine's `Position` (position.py) updates its key incrementally in
+make/unmake from the same tables instead of rehashing all pieces.
+"""
+
+import chess
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY
+
+CASTLING_OFFSET = 768
+EP_OFFSET = 772
+TURN_KEY = POLYGLOT_RANDOM_ARRAY[780]
+
+# PIECE_KEYS[color][piece_type][square]
+PIECE_KEYS = [[[0] * 64] + [[POLYGLOT_RANDOM_ARRAY[64 * (2 * (piece_type - 1) + color) + square]
+                             for square in chess.SQUARES]
+                            for piece_type in chess.PIECE_TYPES]
+              for color in (chess.BLACK, chess.WHITE)]
+
+CASTLING_SQUARES = [chess.H1, chess.A1, chess.H8, chess.A8]
+EP_KEYS = [POLYGLOT_RANDOM_ARRAY[EP_OFFSET + file] for file in range(8)]
+
+
+def castling_key(castling_rights):
+    """Key of a castling rights bitmask (as in `board.castling_rights`)."""
+    key = 0
+    for i, square in enumerate(CASTLING_SQUARES):
+        if castling_rights & chess.BB_SQUARES[square]:
+            key ^= POLYGLOT_RANDOM_ARRAY[CASTLING_OFFSET + i]
+    return key
+
+
+def ep_key(board):
+    """En passant key, only set when the side to move can actually capture."""
+    ep_square = board.ep_square
+    if ep_square is None:
+        return 0
+    if board.pawns & board.occupied_co[board.turn] & chess.BB_PAWN_ATTACKS[not board.turn][ep_square]:
+        return EP_KEYS[chess.square_file(ep_square)]
+    return 0
+
+
+def hash_board(board):
+    """Hash a position from scratch."""
+    key = 0
+    for square, piece in board.piece_map().items():
+        key ^= PIECE_KEYS[piece.color][piece.piece_type][square]
+    key ^= castling_key(board.castling_rights) ^ ep_key(board)
+    if board.turn == chess.WHITE:
+        key ^= TURN_KEY
+    return key
@@ -0,0 +1,6 @@
+"""
+Code shared by the pygame frontends (Bot/Bot.py, Algebraic Notations/Chess.py).
+
+The scripts are run from the repository root and put it on `sys.path`
+before importing from here.
+"""
@@ -0,0 +1,60 @@
+"""
+Caches of pre-rendered surfaces for the pygame frontends.
+
+`TextCache` keeps the surfaces returned by `font.render` in a least recently
+used cache keyed by (font, text, colour), so labels, menu entries and
+messages are rendered once and then only blitted. `render_empty_board`
+paints the checkerboard once; squares are repainted by blitting their part
+of it.
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+TEXT_CACHE_SIZE = 256
+
+
+class TextCache:
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def render(self, font, text, colour):
+        """The antialiased surface of `text` in `font` and `colour`."""
+        key = (font, text, colour)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, colour)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = self.misses = 0
+
+
+def render_empty_board(square_size, light, dark):
+    """The 8x8 checkerboard, a1 dark, as a display-format surface."""
+    surface = pygame.Surface((8 * square_size, 8 * square_size)).convert()
+    for row in range(8):
+        for col in range(8):
+            colour = light if (row + col) % 2 == 0 else dark
+            surface.fill(colour, (col * square_size, row * square_size, square_size, square_size))
+    return surface
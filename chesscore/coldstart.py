@@ -0,0 +1,104 @@
+"""
+Cold-start time of each entry point.
+
+Every entry point is started in a fresh interpreter, several times, and
+timed until its first frame is on screen (the first display update for the
+pygame frontends, the first idle update of the Tk main loop), at which
+point it exits. The pygame windows use SDL's dummy video driver, so no
+display is needed for them; the Tk frontend needs one and PIL.
+
+"headless bot" imports what a tool needs to play moves without a window
+(Bot/worker.py and everything behind it, and chesscore.game) and also
+checks that this loads neither pygame nor PIL.
+
+Run `python -m chesscore.coldstart` from the repository root.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PYGAME_SCRIPT = '''
+import os, runpy, sys
+import pygame
+def first_frame(*args):
+    os._exit(0)
+pygame.display.update = pygame.display.flip = first_frame
+sys.argv = [{path!r}]
+sys.path.insert(0, os.path.dirname({path!r}))
+runpy.run_path({path!r}, run_name='__main__')
+'''
+
+TK_SCRIPT = '''
+import os, runpy, sys, tkinter
+def first_frame(self, n=0):
+    self.update()
+    os._exit(0)
+tkinter.Tk.mainloop = first_frame
+sys.argv = [{path!r}]
+runpy.run_path({path!r}, run_name='__main__')
+'''
+
+HEADLESS_SCRIPT = '''
+import sys
+sys.path[:0] = [{root!r}, {bot!r}]
+import worker, levels, chesscore.game
+loaded = [name for name in ('pygame', 'PIL') if name in sys.modules]
+if loaded:
+    sys.exit('loaded ' + ', '.join(loaded))
+'''
+
+ENTRY_POINTS = [
+    ('python (baseline)', 'pass'),
+    ('headless bot', HEADLESS_SCRIPT.format(root=ROOT, bot=os.path.join(ROOT, 'Bot'))),
+    ('Bot/Bot.py', PYGAME_SCRIPT.format(path=os.path.join(ROOT, 'Bot', 'Bot.py'))),
+    ('Chess.py', PYGAME_SCRIPT.format(path=os.path.join(ROOT, 'Algebraic Notations', 'Chess.py'))),
+    ('Chess_notation.py', PYGAME_SCRIPT.format(path=os.path.join(ROOT, 'Algebraic Notations', 'Chess_notation.py'))),
+    ('Chess_tkinter.py', TK_SCRIPT.format(path=os.path.join(ROOT, 'Algebraic Notations', 'Chess_tkinter.py'))),
+]
+
+
+def time_start(code, env):
+    """Seconds until `code` exits in a new interpreter, or the error it printed."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=env, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        lines = result.stderr.strip().splitlines()
+        return lines[-1] if lines else f'exit status {result.returncode}'
+    return elapsed
+
+
+def measure(runs=5):
+    """{entry point: [seconds per run] or error message}."""
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    results = {}
+    for name, code in ENTRY_POINTS:
+        times = []
+        for _ in range(runs):
+            elapsed = time_start(code, env)
+            if isinstance(elapsed, str):
+                times = elapsed
+                break
+            times.append(elapsed)
+        results[name] = times
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time how long each entry point takes to start.")
+    parser.add_argument('-n', '--runs', type=int, default=5, help="starts per entry point (default 5)")
+    args = parser.parse_args()
+
+    for name, times in measure(args.runs).items():
+        if isinstance(times, str):
+            print(f"{name:20} failed: {times}")
+        else:
+            print(f"{name:20} median {statistics.median(times) * 1000:7.1f} ms   "
+                  f"min {min(times) * 1000:7.1f} ms")
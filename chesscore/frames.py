@@ -0,0 +1,91 @@
+"""
+Frame pacing for the pygame loops.
+
+`FrameScheduler.wait` replaces the bare `pygame.event.get()` at the top of a
+main loop. It never starts frames faster than the FPS cap, and when nothing
+on screen is animating it blocks in `pygame.event.wait` until input arrives,
+so an idle window costs no CPU. A loop that animates something passes the
+time until its next change as `timeout`; anything happening in another
+thread (a bot move) wakes the loop by posting an event, see `post_wakeup`.
+
+The scheduler also measures the process's CPU use separately for idle
+waits and for active frames; `report()` summarises it, and the games print
+it when they exit if the CHESS_PROFILE environment variable is set.
+"""
+
+import os
+import time
+
+import pygame
+
+DEFAULT_FPS = 60
+PROFILE = bool(os.environ.get('CHESS_PROFILE'))
+
+# Posted from other threads to end a blocking wait
+WAKEUP = pygame.USEREVENT + 1
+
+
+def post_wakeup(**attributes):
+    """Wake a loop blocked in `FrameScheduler.wait`; safe to call from any thread."""
+    pygame.event.post(pygame.event.Event(WAKEUP, attributes))
+
+
+class FrameScheduler:
+    def __init__(self, fps=DEFAULT_FPS):
+        self.fps = fps
+        self.frame_time = 1 / fps if fps else 0
+        self.frame_start = time.perf_counter()
+        self.frames = 0
+        # [wall seconds, CPU seconds] while idle and while active
+        self.usage = {'idle': [0.0, 0.0], 'active': [0.0, 0.0]}
+        self.state = 'active'
+        self.mark = (time.perf_counter(), time.process_time())
+
+    def _account(self, state):
+        now = (time.perf_counter(), time.process_time())
+        usage = self.usage[self.state]
+        usage[0] += now[0] - self.mark[0]
+        usage[1] += now[1] - self.mark[1]
+        self.mark = now
+        self.state = state
+
+    def wait(self, timeout=None):
+        """Wait for the next frame and return its events.
+
+        `timeout` is how many seconds may pass before the screen has to
+        change on its own (0 to render as fast as the cap allows); None
+        means nothing is animating and only input can change the frame.
+        """
+        self._account('active')
+        remaining = self.frame_start + self.frame_time - time.perf_counter()
+        if remaining > 0:
+            pygame.time.wait(int(remaining * 1000))
+
+        events = pygame.event.get()
+        if not events and timeout != 0:
+            self._account('idle' if timeout is None else 'active')
+            if timeout is None:
+                event = pygame.event.wait()
+            else:
+                event = pygame.event.wait(max(1, int(timeout * 1000)))
+            self._account('active')
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+
+        self.frame_start = time.perf_counter()
+        self.frames += 1
+        return events
+
+    def cpu(self, state):
+        """Share of one core used while `state` ('idle' or 'active'), 0..1."""
+        wall, cpu = self.usage[state]
+        return cpu / wall if wall > 0 else 0.0
+
+    def report(self):
+        self._account(self.state)
+        idle_wall = self.usage['idle'][0]
+        active_wall = self.usage['active'][0]
+        total = idle_wall + active_wall
+        return (f"{self.frames} frames in {total:.1f}s ({self.frames / total if total else 0:.1f} fps, "
+                f"cap {self.fps}); idle {idle_wall:.1f}s at {self.cpu('idle') * 100:.1f}% CPU, "
+                f"active {active_wall:.1f}s at {self.cpu('active') * 100:.1f}% CPU")
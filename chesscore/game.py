@@ -0,0 +1,157 @@
+"""
+Game-over detection for the frontends.
+
+`GameBoard` is a `chess.Board` that keeps a table of how often every
+position (by Polyglot Zobrist key) has occurred, updated on each push and
+pop, so the fivefold repetition check is a dict lookup instead of a replay
+of the move stack. The bot's search seeds its own counts from the same
+table (see `Position.from_board` in Bot/position.py), since both use the
+same keys.
+
+It also indexes the legal moves by origin square the first time they are
+asked for in a position, so selecting a piece, highlighting its targets
+and validating a move are dict lookups; the index is dropped on every
+push, pop or other change of position.
+
+`outcome` decides whether the game is over while generating legal moves at
+most once, where `is_checkmate()`, `is_stalemate()`, `is_seventyfive_moves()`
+and `is_fivefold_repetition()` in a row would each generate them again;
+`result_message` words it for the frontends.
+
+Nothing here imports pygame, so headless tools can use it too.
+"""
+
+import chess
+import chess.polyglot
+
+# The winner by game mode: player vs player, player (White) vs bot
+CHECKMATE_MESSAGES = {
+    'pvp': {chess.WHITE: "Checkmate! White Wins!", chess.BLACK: "Checkmate! Black Wins!"},
+    'pvb': {chess.WHITE: "Checkmate! You Win!", chess.BLACK: "Checkmate! Bot Wins!"},
+}
+DRAW_MESSAGES = {
+    chess.Termination.STALEMATE: "Stalemate! It's a Draw!",
+    chess.Termination.INSUFFICIENT_MATERIAL: "Draw due to Insufficient Material!",
+    chess.Termination.SEVENTYFIVE_MOVES: "Draw by 75-move Rule!",
+    chess.Termination.FIVEFOLD_REPETITION: "Draw by Repetition!",
+}
+
+
+class RepetitionTable:
+    """Zobrist keys of a game's positions, in order, and how often each occurred."""
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self.counts = {}
+        for key in keys:
+            self.push(key)
+
+    def push(self, key):
+        self.keys.append(key)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def pop(self):
+        key = self.keys.pop()
+        count = self.counts[key] - 1
+        if count:
+            self.counts[key] = count
+        else:
+            del self.counts[key]
+
+    def count(self):
+        """Occurrences of the current (last pushed) position."""
+        return self.counts[self.keys[-1]]
+
+    def in_sync(self, board):
+        """Does the table describe `board`'s game (one key per position)?"""
+        return len(self.keys) == len(board.move_stack) + 1
+
+
+class GameBoard(chess.Board):
+    def __init__(self, *args, **kwargs):
+        self.repetitions = RepetitionTable()
+        self.move_index = None
+        super().__init__(*args, **kwargs)
+
+    def clear_stack(self):
+        super().clear_stack()
+        self.repetitions = RepetitionTable([chess.polyglot.zobrist_hash(self)])
+        self.move_index = None
+
+    def push(self, move):
+        super().push(move)
+        self.move_index = None
+        if len(self.repetitions.keys) == len(self.move_stack):
+            self.repetitions.push(chess.polyglot.zobrist_hash(self))
+
+    def pop(self):
+        move = super().pop()
+        self.move_index = None
+        if len(self.repetitions.keys) == len(self.move_stack) + 2:
+            self.repetitions.pop()
+        return move
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        if self.repetitions.in_sync(self):
+            board.repetitions = RepetitionTable(self.repetitions.keys[-len(board.move_stack) - 1:])
+        return board
+
+    def root(self):
+        board = super().root()
+        board.repetitions = RepetitionTable([chess.polyglot.zobrist_hash(board)])
+        return board
+
+    def _move_index(self):
+        # origin square -> {(target square, promotion): move}
+        if self.move_index is None:
+            self.move_index = {}
+            for move in self.generate_legal_moves():
+                self.move_index.setdefault(move.from_square, {})[move.to_square, move.promotion] = move
+        return self.move_index
+
+    def legal_moves_from(self, square):
+        """The legal moves of the piece on `square`, one per promotion choice."""
+        targets = self._move_index().get(square)
+        return list(targets.values()) if targets else []
+
+    def legal_move(self, from_square, to_square, promotion=None):
+        """The legal move from `from_square` to `to_square`, or None."""
+        targets = self._move_index().get(from_square)
+        return targets.get((to_square, promotion)) if targets else None
+
+    def is_fivefold_repetition(self):
+        if self.repetitions.in_sync(self):
+            return self.repetitions.count() >= 5
+        return super().is_fivefold_repetition()
+
+
+def outcome(board):
+    """A `chess.Outcome` if the game is over, else None."""
+    if not any(board.generate_legal_moves()):
+        if board.is_check():
+            return chess.Outcome(chess.Termination.CHECKMATE, not board.turn)
+        return chess.Outcome(chess.Termination.STALEMATE, None)
+    if board.is_insufficient_material():
+        return chess.Outcome(chess.Termination.INSUFFICIENT_MATERIAL, None)
+    if board.halfmove_clock >= 150:
+        return chess.Outcome(chess.Termination.SEVENTYFIVE_MOVES, None)
+    if board.is_fivefold_repetition():
+        return chess.Outcome(chess.Termination.FIVEFOLD_REPETITION, None)
+    return None
+
+
+def result_message(board, mode='pvp'):
+    """The message announcing the result, or None while the game goes on."""
+    result = outcome(board)
+    if result is None:
+        return None
+    if result.termination == chess.Termination.CHECKMATE:
+        return CHECKMATE_MESSAGES[mode][result.winner]
+    return DRAW_MESSAGES[result.termination]
+
+
+def is_pawn_promotion(board, move):
+    """Does `move` take a pawn to the last rank?"""
+    return (board.piece_type_at(move.from_square) == chess.PAWN
+            and chess.square_rank(move.to_square) in (0, 7))
@@ -0,0 +1,83 @@
+"""
+The scrolling move list of Algebraic Notations/Chess.py.
+
+Moves are only ever appended, one row per ply, so a row's content never
+changes once it exists. Each row is rendered to its own surface the first
+time it is shown and kept in a small LRU cache. A frame only looks at the
+rows in the visible window: its overlay key is the window's bounds, so
+while the window stays put the renderer paints nothing, and when it moves
+the cost is a handful of blits however long the game has been.
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+ROW_CACHE_SIZE = 64
+
+
+class MoveHistory:
+    def __init__(self, rect, row_height, number_font, move_font, backgrounds, colours,
+                 cache_size=ROW_CACHE_SIZE):
+        """`backgrounds` and `colours` are the (white move, black move) row colours."""
+        self.rect = pygame.Rect(rect)
+        self.row_height = row_height
+        self.visible_rows = self.rect.height // row_height
+        self.number_font = number_font
+        self.move_font = move_font
+        self.backgrounds = backgrounds
+        self.colours = colours
+        self.cache_size = cache_size
+        self.moves = []
+        self.rows = OrderedDict()
+        self.scroll_offset = 0
+
+    def __len__(self):
+        return len(self.moves)
+
+    def max_offset(self):
+        return max(0, len(self.moves) - self.visible_rows)
+
+    def append(self, san):
+        """Add the next move; if the last move was in view, keep following the game."""
+        following = self.scroll_offset >= self.max_offset()
+        self.moves.append(san)
+        if following:
+            self.scroll_offset = self.max_offset()
+
+    def scroll(self, rows):
+        """Move the window by `rows` (negative is up, towards the first move)."""
+        self.scroll_offset = min(max(self.scroll_offset + rows, 0), self.max_offset())
+
+    def clear(self):
+        self.moves.clear()
+        self.rows.clear()
+        self.scroll_offset = 0
+
+    def row(self, index):
+        """The rendered row of move `index` (0 is White's first move)."""
+        surface = self.rows.get(index)
+        if surface is not None:
+            self.rows.move_to_end(index)
+            return surface
+        side = index % 2
+        surface = pygame.Surface((self.rect.width, self.row_height)).convert()
+        surface.fill(self.backgrounds[side])
+        if side == 0:
+            number = self.number_font.render(f"{index // 2 + 1}.", True, self.colours[side])
+            surface.blit(number, (10, 5))
+        surface.blit(self.move_font.render(self.moves[index], True, self.colours[side]), (50, 5))
+        self.rows[index] = surface
+        if len(self.rows) > self.cache_size:
+            self.rows.popitem(last=False)
+        return surface
+
+    def draw(self, renderer):
+        """Show the visible window of the list this frame."""
+        first = self.scroll_offset
+        end = min(first + self.visible_rows, len(self.moves))
+        renderer.overlay(('moves', first, end), self.rect, lambda screen: self.paint(screen, first, end))
+
+    def paint(self, screen, first, end):
+        for index in range(first, end):
+            screen.blit(self.row(index), (self.rect.x, self.rect.y + (index - first) * self.row_height))
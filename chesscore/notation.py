@@ -0,0 +1,92 @@
+"""
+Index of the ways to write each legal move of a position.
+
+`SanIndex(board)` is built once per position. Besides the SAN of every
+legal move it accepts the usual variants: the check or mate suffix left
+out, long algebraic ("Ng1-f3", "Bc4xf7+"), UCI ("g1f3", "e7e8q", "e1g1"),
+promotions without "=" and zeros for castling ("0-0"). All of them go into
+a prefix trie whose nodes know which moves can still be reached, so
+checking or completing what has been typed so far walks `len(text)` nodes
+and never calls the SAN parser.
+"""
+
+import chess
+
+
+class _Node:
+    __slots__ = ('children', 'move', 'moves')
+
+    def __init__(self):
+        self.children = {}
+        self.move = None     # the move written exactly like this, if any
+        self.moves = set()   # every move written with this prefix
+
+
+def notations(board, move, san):
+    """The strings accepted for `move`, whose SAN is `san`, in `board`."""
+    suffix = san[-1] if san[-1] in '+#' else ''
+    plain = san[:len(san) - len(suffix)]
+    written = {san, plain}
+    uci = move.uci()
+    written.add(uci)
+    if board.is_castling(move):
+        zeros = plain.replace('O', '0')
+        written.update((zeros, zeros + suffix))
+    else:
+        piece = board.piece_type_at(move.from_square)
+        letter = chess.piece_symbol(piece).upper() if piece != chess.PAWN else ''
+        separator = 'x' if board.is_capture(move) else '-'
+        promotion = '=' + chess.piece_symbol(move.promotion).upper() if move.promotion else ''
+        lan = f"{letter}{uci[:2]}{separator}{uci[2:4]}{promotion}"
+        written.update((lan, lan + suffix))
+        if move.promotion:
+            written.update(text.replace('=', '') for text in list(written))
+    return written
+
+
+class SanIndex:
+    def __init__(self, board):
+        self.root = _Node()
+        self.san = {}
+        for move in board.legal_moves:
+            san = board.san(move)
+            self.san[move] = san
+            for text in notations(board, move, san):
+                self._insert(text, move)
+
+    def _insert(self, text, move):
+        node = self.root
+        node.moves.add(move)
+        for char in text:
+            node = node.children.setdefault(char, _Node())
+            node.moves.add(move)
+        node.move = move
+
+    def _walk(self, text):
+        node = self.root
+        for char in text:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, text):
+        """The legal move written as `text`, or None."""
+        node = self._walk(text)
+        return node.move if node is not None else None
+
+    def is_prefix(self, text):
+        """Can `text` still be completed to a legal move?"""
+        return self._walk(text) is not None
+
+    def completions(self, text):
+        """SAN of the legal moves that `text` can be completed to, sorted."""
+        node = self._walk(text)
+        return sorted(self.san[move] for move in node.moves) if node is not None else []
+
+    def complete(self, text):
+        """The SAN of the only move `text` can still become, or None."""
+        node = self._walk(text)
+        if node is not None and len(node.moves) == 1:
+            return self.san[next(iter(node.moves))]
+        return None
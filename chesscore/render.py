@@ -0,0 +1,291 @@
+"""
+Dirty-rectangle rendering for the pygame frontends.
+
+Every frame the frontend describes what should be on screen: the board with
+its highlighted squares (`set_board`) and the overlays above it, i.e. text
+(`text`) and anything else that paints itself (`overlay`). `flush` compares
+that with what it painted last time, repaints only the squares and overlays
+that changed and returns their rectangles for `pygame.display.update`, so a
+frame in which nothing changed touches no pixels at all.
+
+Changed squares are found by xor-ing the board's piece bitboards with the
+previous frame's. Repainting only blits pre-rendered surfaces (see
+cache.py): the empty board drawn once, the piece sprites converted to the
+display format, and text from an LRU cache. When an overlay appears,
+changes or goes away, the background and squares underneath it are
+repainted and every overlay on that area is drawn again on top, so text is
+never blended twice.
+
+Run `python -m chesscore.render` from the repository root to compare frame
+times with a full redraw.
+"""
+
+import chess
+import pygame
+
+from chesscore.cache import TextCache, render_empty_board
+from chesscore.sprites import piece_images
+
+
+def _squares(bitboard):
+    while bitboard:
+        lsb = bitboard & -bitboard
+        bitboard ^= lsb
+        yield lsb.bit_length() - 1
+
+
+class BoardRenderer:
+    def __init__(self, screen, origin, square_size, light, dark, background, pieces=None, outline_width=4,
+                 text_cache=None):
+        self.screen = screen
+        if pieces is None:
+            pieces = piece_images()
+        self.pieces = {name: image.convert_alpha() for name, image in pieces.items()}
+        self.origin = origin
+        self.square_size = square_size
+        self.light = light
+        self.dark = dark
+        self.background = background
+        self.outline_width = outline_width
+        self.board_rect = pygame.Rect(origin, (8 * square_size, 8 * square_size))
+        self.empty_board = render_empty_board(square_size, light, dark)
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+
+        # What is on screen: per square (piece symbol, fill, outline), overlays by key
+        self.painted = [None] * 64
+        self.bitboards = None
+        self.shown = {}
+        self.full = True
+
+        # What the current frame asks for
+        self.board = None
+        self.fills = {}
+        self.outlines = {}
+        self.overlays = []
+
+    def invalidate(self):
+        """Repaint the whole window on the next flush."""
+        self.full = True
+
+    def square_rect(self, square):
+        size = self.square_size
+        return pygame.Rect(self.origin[0] + chess.square_file(square) * size,
+                           self.origin[1] + (7 - chess.square_rank(square)) * size, size, size)
+
+    def square_at(self, pos):
+        """The square under the window point `pos`, or None off the board."""
+        if not self.board_rect.collidepoint(pos):
+            return None
+        col = (pos[0] - self.origin[0]) // self.square_size
+        row = (pos[1] - self.origin[1]) // self.square_size
+        return chess.square(col, 7 - row)
+
+    def set_board(self, board, fills=None, outlines=None):
+        """Show `board` this frame, `fills`/`outlines` map squares to colours."""
+        self.board = board
+        self.fills = fills or {}
+        self.outlines = outlines or {}
+
+    def overlay(self, key, rect, draw):
+        """Show something drawn by `draw(screen)` inside `rect`; `key` identifies its content."""
+        self.overlays.append(((key, tuple(rect)), rect, draw))
+        return rect
+
+    def text(self, font, string, colour, **anchor):
+        """Show a line of text placed by Rect attributes (e.g. center=(x, y)); returns its rect."""
+        surface = self.text_cache.render(font, string, colour)
+        rect = surface.get_rect(**anchor)
+        return self.overlay((id(font), string, colour), rect, lambda screen: screen.blit(surface, rect))
+
+    def _state(self, square):
+        piece = self.board.piece_at(square)
+        return (piece.symbol() if piece else None, self.fills.get(square), self.outlines.get(square))
+
+    def _paint_square(self, square, state):
+        symbol, fill, outline = state
+        rect = self.square_rect(square)
+        if fill is None:
+            self.screen.blit(self.empty_board, rect, rect.move(-self.origin[0], -self.origin[1]))
+        else:
+            self.screen.fill(fill, rect)
+        if outline is not None:
+            pygame.draw.rect(self.screen, outline, rect, self.outline_width)
+        if symbol is not None:
+            image = self.pieces[f'{"w" if symbol.isupper() else "b"}_{symbol.lower()}']
+            self.screen.blit(image, image.get_rect(center=rect.center))
+
+    def _squares_in(self, rect):
+        clipped = rect.clip(self.board_rect)
+        if not clipped.width or not clipped.height:
+            return []
+        size = self.square_size
+        left = (clipped.left - self.origin[0]) // size
+        right = (clipped.right - 1 - self.origin[0]) // size
+        top = (clipped.top - self.origin[1]) // size
+        bottom = (clipped.bottom - 1 - self.origin[1]) // size
+        return [chess.square(col, 7 - row) for row in range(top, bottom + 1) for col in range(left, right + 1)]
+
+    def flush(self):
+        """Paint this frame's changes and return the rectangles to update."""
+        board, overlays = self.board, self.overlays
+        screen = self.screen
+        states = {}
+
+        if self.full:
+            self.full = False
+            screen.fill(self.background)
+            if board is not None:
+                screen.blit(self.empty_board, self.board_rect)
+                for square in chess.SQUARES:
+                    state = self._state(square)
+                    if state == (None, None, None):
+                        self.painted[square] = state
+                    else:
+                        states[square] = state
+            dirty = [screen.get_rect()]
+            cleared = []
+            redraw = set(range(len(overlays)))
+        else:
+            cleared = []
+            redraw = set()
+            queue = []
+            if board is not None:
+                bitboards = (board.occupied_co[chess.WHITE], board.pawns, board.knights,
+                             board.bishops, board.rooks, board.queens, board.kings)
+                if self.bitboards is None:
+                    changed = chess.BB_ALL
+                else:
+                    changed = 0
+                    for old, new in zip(self.bitboards, bitboards):
+                        changed |= old ^ new
+                candidates = set(_squares(changed))
+                candidates.update(self.fills, self.outlines)
+                candidates.update(square for square, state in enumerate(self.painted)
+                                  if state is not None and (state[1] is not None or state[2] is not None))
+                for square in candidates:
+                    state = self._state(square)
+                    if state != self.painted[square]:
+                        states[square] = state
+                        queue.append(self.square_rect(square))
+            elif self.bitboards is not None:
+                # The board went away (e.g. back to a menu)
+                cleared.append(self.board_rect)
+                queue.append(self.board_rect)
+
+            keys = set()
+            for index, (key, rect, _) in enumerate(overlays):
+                keys.add(key)
+                if key not in self.shown:
+                    redraw.add(index)
+                    cleared.append(rect)
+                    queue.append(rect)
+            for key, rect in self.shown.items():
+                if key not in keys:
+                    cleared.append(rect)
+                    queue.append(rect)
+
+            # Whatever touches a damaged area has to be painted again, which
+            # damages its own area in turn.
+            while queue:
+                area = queue.pop()
+                if board is not None:
+                    for square in self._squares_in(area):
+                        if square not in states:
+                            states[square] = self._state(square)
+                            queue.append(self.square_rect(square))
+                for index, (_, rect, _) in enumerate(overlays):
+                    if index not in redraw and rect.colliderect(area):
+                        redraw.add(index)
+                        cleared.append(rect)
+                        queue.append(rect)
+            dirty = cleared + [self.square_rect(square) for square in states]
+
+        for rect in cleared:
+            screen.fill(self.background, rect)
+        for square, state in states.items():
+            self._paint_square(square, state)
+            self.painted[square] = state
+        for index, (_, _, draw) in enumerate(overlays):
+            if index in redraw:
+                draw(screen)
+
+        if board is None:
+            self.painted = [None] * 64
+            self.bitboards = None
+        else:
+            self.bitboards = (board.occupied_co[chess.WHITE], board.pawns, board.knights,
+                              board.bishops, board.rooks, board.queens, board.kings)
+        self.shown = {key: rect for key, rect, _ in overlays}
+        self.board = None
+        self.fills = {}
+        self.outlines = {}
+        self.overlays = []
+        return dirty
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from chesscore.sprites import piece_name
+
+    pygame.init()
+    WIDTH, HEIGHT = 600, 750
+    MARGIN, TITLE_HEIGHT, SQ_SIZE = 44, 50, 64
+    LIGHT, DARK, HIGHLIGHT, BACKGROUND = (235, 236, 208), (115, 149, 82), (245, 246, 130), (48, 46, 43)
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pieces = piece_images()
+    font = pygame.font.Font(None, 48)
+
+    def full_redraw(board, selected):
+        # What the frontends did before: everything, every frame
+        screen.fill(BACKGROUND)
+        title = font.render("Chess Bot", True, (255, 255, 255))
+        screen.blit(title, title.get_rect(center=(WIDTH // 2, TITLE_HEIGHT // 2)))
+        for row in range(8):
+            for col in range(8):
+                color = LIGHT if (row + col) % 2 == 0 else DARK
+                if selected == chess.square(col, 7 - row):
+                    color = HIGHLIGHT
+                pygame.draw.rect(screen, color, (MARGIN + col * SQ_SIZE, TITLE_HEIGHT + row * SQ_SIZE,
+                                                 SQ_SIZE, SQ_SIZE))
+        for square in chess.SQUARES:
+            piece = board.piece_at(square)
+            if piece:
+                image = pieces[piece_name(piece)]
+                x = MARGIN + chess.square_file(square) * SQ_SIZE + (SQ_SIZE - image.get_width()) // 2
+                y = TITLE_HEIGHT + (7 - chess.square_rank(square)) * SQ_SIZE + (SQ_SIZE - image.get_height()) // 2
+                screen.blit(image, (x, y))
+        pygame.display.flip()
+
+    renderer = BoardRenderer(screen, (MARGIN, TITLE_HEIGHT), SQ_SIZE, LIGHT, DARK, BACKGROUND, pieces)
+
+    def dirty_redraw(board, selected):
+        renderer.text(font, "Chess Bot", (255, 255, 255), center=(WIDTH // 2, TITLE_HEIGHT // 2))
+        renderer.set_board(board, {selected: HIGHLIGHT} if selected is not None else None)
+        pygame.display.update(renderer.flush())
+
+    # A random game, each move preceded by a selection and followed by idle frames
+    random.seed(0)
+    frames = []
+    board = chess.Board()
+    while not board.is_game_over() and len(board.move_stack) < 80:
+        move = random.choice(list(board.legal_moves))
+        frames.append(('select', board.copy(), move.from_square))
+        board.push(move)
+        after = board.copy()
+        frames.append(('move', after, None))
+        frames.extend(('idle', after, None) for _ in range(20))
+
+    for name, draw in (('full redraw', full_redraw), ('dirty rects', dirty_redraw)):
+        totals = {}
+        for kind, frame_board, selected in frames:
+            start = time.perf_counter()
+            draw(frame_board, selected)
+            elapsed = time.perf_counter() - start
+            total, count = totals.get(kind, (0.0, 0))
+            totals[kind] = (total + elapsed, count + 1)
+        report = ', '.join(f"{kind} {total / count * 1000:6.3f} ms" for kind, (total, count) in totals.items())
+        overall = sum(total for total, _ in totals.values()) / len(frames)
+        print(f"{name:12}: {report}, mean {overall * 1000:6.3f} ms/frame")
+    pygame.quit()
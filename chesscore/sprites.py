@@ -0,0 +1,40 @@
+"""
+The piece images, shared by all frontends.
+
+They are found in pieces/ next to this package, not in the working
+directory, so the frontends can be started from anywhere. Nothing is
+loaded when the module is imported: pygame or PIL is imported the first
+time its images are asked for, and each set is loaded once per process.
+"""
+
+import os
+
+PIECES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pieces')
+PIECE_NAMES = [f'{color}_{piece}' for color in ['w', 'b'] for piece in ['p', 'r', 'n', 'b', 'q', 'k']]
+
+_loaded = {}
+
+
+def piece_name(piece):
+    """The image name of a `chess.Piece`, e.g. 'w_n' for a white knight."""
+    return f"{'w' if piece.color else 'b'}_{piece.symbol().lower()}"
+
+
+def piece_path(name):
+    return os.path.join(PIECES_DIR, f'{name}.png')
+
+
+def piece_images():
+    """The pieces as pygame surfaces, by name."""
+    if 'pygame' not in _loaded:
+        import pygame
+        _loaded['pygame'] = {name: pygame.image.load(piece_path(name)) for name in PIECE_NAMES}
+    return _loaded['pygame']
+
+
+def piece_photos():
+    """The pieces as Tk photo images, by name; a Tk root has to exist."""
+    if 'tk' not in _loaded:
+        from PIL import Image, ImageTk
+        _loaded['tk'] = {name: ImageTk.PhotoImage(Image.open(piece_path(name))) for name in PIECE_NAMES}
+    return _loaded['tk']